@@ -9,6 +9,13 @@ from app.core.database import Base
 from app.models import direccion
 from app.models import cliente
 from app.models import agente
+from app.models import imagen
+from app.models import propiedad
+from app.models import importacion
+from app.models import version_tabla
+from app.models import contador
+from app.models import cambio
+from app.models import users
 from sqlalchemy import pool
 
 from alembic import context
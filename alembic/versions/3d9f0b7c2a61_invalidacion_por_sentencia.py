@@ -0,0 +1,186 @@
+"""Notificaciones de invalidación por sentencia
+
+Revision ID: 3d9f0b7c2a61
+Revises: b2f7c4e81d39
+Create Date: 2026-10-20 11:02:13.448120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9f0b7c2a61'
+down_revision: Union[str, None] = 'b2f7c4e81d39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Las mismas de e7a2c9f14b38
+TABLAS = {
+    'propiedades': (
+        'tipo_propiedad', 'tipo_operacion', 'precio_venta', 'precio_alquiler', 'dormitorios', 'banios',
+        'superficie_cubierta', 'superficie_descubierta', 'estado', 'propietario_id', 'agente_id',
+    ),
+    'clientes': (),
+    'agentes': (),
+    'direcciones': (),
+    'imagenes_propiedad': ('propiedad_id',),
+}
+# Una sentencia que toca más filas publica un único mensaje {"masivo": true}
+FILAS_POR_SENTENCIA = 100
+# Transición que necesita cada evento
+REFERENCIAS = {
+    'INSERT': 'NEW TABLE AS nuevas',
+    'UPDATE': 'OLD TABLE AS viejas NEW TABLE AS nuevas',
+    'DELETE': 'OLD TABLE AS viejas',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for tabla in TABLAS:
+        op.execute(f"DROP TRIGGER {tabla}_invalidacion ON {tabla}")
+    op.execute("DROP FUNCTION notificar_invalidacion()")
+
+    # Mismo formato de mensaje que el trigger por fila (ver app.core.invalidacion)
+    op.execute("""
+        CREATE FUNCTION mensaje_invalidacion(tabla text, operacion text, nueva jsonb, vieja jsonb, columnas text[])
+        RETURNS text AS $$
+        DECLARE
+            mensaje jsonb;
+        BEGIN
+            mensaje := jsonb_build_object(
+                'tabla', tabla,
+                'op', operacion,
+                'id', coalesce(nueva, vieja) -> 'id',
+                'version', coalesce(nueva, vieja) -> 'version'
+            );
+            IF operacion = 'UPDATE' THEN
+                mensaje := mensaje || jsonb_build_object('cambiadas', (
+                    SELECT coalesce(jsonb_agg(n.key), '[]'::jsonb)
+                    FROM jsonb_each(nueva) n
+                    WHERE n.value IS DISTINCT FROM vieja -> n.key
+                ));
+            END IF;
+            IF coalesce(cardinality(columnas), 0) > 0 THEN
+                IF nueva IS NOT NULL THEN
+                    mensaje := mensaje || jsonb_build_object('fila', (
+                        SELECT jsonb_object_agg(c, nueva -> c) FROM unnest(columnas) c
+                    ));
+                END IF;
+                IF vieja IS NOT NULL THEN
+                    mensaje := mensaje || jsonb_build_object('anterior', (
+                        SELECT jsonb_object_agg(c, vieja -> c) FROM unnest(columnas) c
+                    ));
+                END IF;
+            END IF;
+            RETURN mensaje::text;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    # El canal debe coincidir con app.core.invalidacion.CANAL y el GUC con
+    # app.core.invalidacion.GUC_SIN_NOTIFICACIONES
+    op.execute(f"""
+        CREATE FUNCTION notificar_invalidacion() RETURNS trigger AS $$
+        DECLARE
+            filas bigint;
+        BEGIN
+            -- Cargas masivas (importaciones, seed): avisan ellas una sola vez
+            IF current_setting('app.sin_notificaciones', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                SELECT count(*) INTO filas FROM viejas;
+            ELSE
+                SELECT count(*) INTO filas FROM nuevas;
+            END IF;
+            IF filas = 0 THEN
+                RETURN NULL;
+            END IF;
+            IF filas > {FILAS_POR_SENTENCIA} THEN
+                -- Con el mismo payload, NOTIFY entrega uno solo por transacción
+                PERFORM pg_notify('invalidaciones', jsonb_build_object(
+                    'tabla', TG_TABLE_NAME, 'op', TG_OP, 'masivo', true
+                )::text);
+            ELSIF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('invalidaciones', mensaje_invalidacion(TG_TABLE_NAME, TG_OP, to_jsonb(n), NULL, TG_ARGV))
+                FROM nuevas n;
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM pg_notify('invalidaciones', mensaje_invalidacion(TG_TABLE_NAME, TG_OP, to_jsonb(n), to_jsonb(v), TG_ARGV))
+                FROM nuevas n JOIN viejas v ON v.id = n.id;
+            ELSE
+                PERFORM pg_notify('invalidaciones', mensaje_invalidacion(TG_TABLE_NAME, TG_OP, NULL, to_jsonb(v), TG_ARGV))
+                FROM viejas v;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Las tablas de transición exigen un trigger por evento
+    for tabla, columnas in TABLAS.items():
+        argumentos = ", ".join(f"'{c}'" for c in columnas)
+        for evento, referencias in REFERENCIAS.items():
+            op.execute(
+                f"CREATE TRIGGER {tabla}_invalidacion_{evento.lower()} AFTER {evento} ON {tabla} "
+                f"REFERENCING {referencias} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion({argumentos})"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in TABLAS:
+        for evento in REFERENCIAS:
+            op.execute(f"DROP TRIGGER {tabla}_invalidacion_{evento.lower()} ON {tabla}")
+    op.execute("DROP FUNCTION notificar_invalidacion()")
+    op.execute("DROP FUNCTION mensaje_invalidacion(text, text, jsonb, jsonb, text[])")
+    # Función y triggers por fila de e7a2c9f14b38
+    op.execute("""
+        CREATE FUNCTION notificar_invalidacion() RETURNS trigger AS $$
+        DECLARE
+            nueva jsonb;
+            vieja jsonb;
+            mensaje jsonb;
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                nueva := to_jsonb(NEW);
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                vieja := to_jsonb(OLD);
+            END IF;
+            mensaje := jsonb_build_object(
+                'tabla', TG_TABLE_NAME,
+                'op', TG_OP,
+                'id', coalesce(nueva, vieja) -> 'id',
+                'version', coalesce(nueva, vieja) -> 'version'
+            );
+            IF TG_OP = 'UPDATE' THEN
+                mensaje := mensaje || jsonb_build_object('cambiadas', (
+                    SELECT coalesce(jsonb_agg(n.key), '[]'::jsonb)
+                    FROM jsonb_each(nueva) n
+                    WHERE n.value IS DISTINCT FROM vieja -> n.key
+                ));
+            END IF;
+            IF TG_NARGS > 0 THEN
+                IF nueva IS NOT NULL THEN
+                    mensaje := mensaje || jsonb_build_object('fila', (
+                        SELECT jsonb_object_agg(c, nueva -> c) FROM unnest(TG_ARGV) c
+                    ));
+                END IF;
+                IF vieja IS NOT NULL THEN
+                    mensaje := mensaje || jsonb_build_object('anterior', (
+                        SELECT jsonb_object_agg(c, vieja -> c) FROM unnest(TG_ARGV) c
+                    ));
+                END IF;
+            END IF;
+            PERFORM pg_notify('invalidaciones', mensaje::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for tabla, columnas in TABLAS.items():
+        argumentos = ", ".join(f"'{c}'" for c in columnas)
+        op.execute(
+            f"CREATE TRIGGER {tabla}_invalidacion AFTER INSERT OR UPDATE OR DELETE ON {tabla} "
+            f"FOR EACH ROW EXECUTE FUNCTION notificar_invalidacion({argumentos})"
+        )
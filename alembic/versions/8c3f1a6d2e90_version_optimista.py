@@ -0,0 +1,32 @@
+"""Columna version para concurrencia optimista
+
+Revision ID: 8c3f1a6d2e90
+Revises: 5b2e8c1f9d47
+Create Date: 2026-10-19 21:05:47.102384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3f1a6d2e90'
+down_revision: Union[str, None] = '5b2e8c1f9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLAS = ('propiedades', 'clientes', 'agentes', 'direcciones')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Con server_default constante PostgreSQL no reescribe las tablas existentes
+    for tabla in TABLAS:
+        op.add_column(tabla, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in reversed(TABLAS):
+        op.drop_column(tabla, 'version')
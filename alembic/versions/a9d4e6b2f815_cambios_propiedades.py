@@ -0,0 +1,104 @@
+"""Registro de cambios de propiedades para sincronización incremental
+
+Revision ID: a9d4e6b2f815
+Revises: f3b8d2a61c07
+Create Date: 2026-10-20 02:07:45.912370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e6b2f815'
+down_revision: Union[str, None] = 'f3b8d2a61c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = {
+    'propiedades': 'AFTER INSERT OR UPDATE OR DELETE',
+    'imagenes_propiedad': 'AFTER INSERT OR UPDATE OR DELETE',
+    'direcciones': 'AFTER UPDATE',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cambios_propiedades',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('propiedad_id', sa.Integer(), nullable=False),
+    sa.Column('operacion', sa.String(length=6), nullable=False),
+    sa.Column('xid', sa.BigInteger(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cambios_propiedades_propiedad_id'), 'cambios_propiedades', ['propiedad_id'], unique=False)
+    # Orden de lectura de los clientes
+    op.create_index('ix_cambios_propiedades_xid_id', 'cambios_propiedades', ['xid', 'id'], unique=False)
+    op.create_table('compactaciones_cambios',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('xid', sa.BigInteger(), nullable=False),
+    sa.Column('cambio_id', sa.BigInteger(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        CREATE FUNCTION registrar_cambio_propiedad() RETURNS trigger AS $$
+        DECLARE
+            transaccion bigint := pg_current_xact_id()::text::bigint;
+            ahora timestamp := timezone('utc', now());
+        BEGIN
+            IF TG_TABLE_NAME = 'propiedades' THEN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                    VALUES (OLD.id, 'delete', transaccion, ahora);
+                ELSE
+                    INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                    VALUES (NEW.id, 'upsert', transaccion, ahora);
+                END IF;
+            ELSIF TG_TABLE_NAME = 'imagenes_propiedad' THEN
+                IF TG_OP <> 'INSERT' THEN
+                    INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                    VALUES (OLD.propiedad_id, 'upsert', transaccion, ahora);
+                END IF;
+                -- Una imagen que pasa a otra propiedad modifica las dos
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                    VALUES (NEW.propiedad_id, 'upsert', transaccion, ahora);
+                ELSIF TG_OP = 'UPDATE' THEN
+                    IF NEW.propiedad_id <> OLD.propiedad_id THEN
+                        INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                        VALUES (NEW.propiedad_id, 'upsert', transaccion, ahora);
+                    END IF;
+                END IF;
+            ELSE
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                SELECT p.id, 'upsert', transaccion, ahora FROM propiedades p WHERE p.direccion_id = NEW.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for tabla, eventos in TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER {tabla}_cambios {eventos} ON {tabla} "
+            f"FOR EACH ROW EXECUTE FUNCTION registrar_cambio_propiedad()"
+        )
+    # Punto de partida: una entrada por cada propiedad existente
+    op.execute("""
+        INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+        SELECT id, 'upsert', pg_current_xact_id()::text::bigint, timezone('utc', now())
+        FROM propiedades ORDER BY id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in TRIGGERS:
+        op.execute(f"DROP TRIGGER {tabla}_cambios ON {tabla}")
+    op.execute("DROP FUNCTION registrar_cambio_propiedad()")
+    op.drop_table('compactaciones_cambios')
+    op.drop_index('ix_cambios_propiedades_xid_id', table_name='cambios_propiedades')
+    op.drop_index(op.f('ix_cambios_propiedades_propiedad_id'), table_name='cambios_propiedades')
+    op.drop_table('cambios_propiedades')
@@ -0,0 +1,44 @@
+"""Usuarios de la API (autenticación por token)
+
+Revision ID: b2f7c4e81d39
+Revises: c5e1f7a3d926
+Create Date: 2026-10-20 09:26:51.603117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2f7c4e81d39'
+down_revision: Union[str, None] = 'c5e1f7a3d926'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('usuarios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('is_admin', sa.Boolean(), nullable=False),
+    sa.Column('is_agente', sa.Boolean(), nullable=False),
+    sa.Column('agente_id', sa.Integer(), nullable=True),
+    sa.Column('cliente_id', sa.Integer(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('fecha_alta', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['agente_id'], ['agentes.id'], ),
+    sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('token_hash')
+    )
+    op.create_index(op.f('ix_usuarios_id'), 'usuarios', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_usuarios_id'), table_name='usuarios')
+    op.drop_table('usuarios')
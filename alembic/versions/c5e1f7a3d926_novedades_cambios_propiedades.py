@@ -0,0 +1,152 @@
+"""Motivo e interesados en el registro de cambios (novedades en vivo)
+
+Revision ID: c5e1f7a3d926
+Revises: a9d4e6b2f815
+Create Date: 2026-10-20 04:12:09.518274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1f7a3d926'
+down_revision: Union[str, None] = 'a9d4e6b2f815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Igual que en a9d4e6b2f815, más el motivo y a quiénes les interesa cada
+# entrada. Al reasignar una propiedad se avisa también al agente/propietario
+# anterior; los de una imagen o dirección se leen de la propiedad.
+FUNCION = """
+    CREATE OR REPLACE FUNCTION registrar_cambio_propiedad() RETURNS trigger AS $$
+    DECLARE
+        transaccion bigint := pg_current_xact_id()::text::bigint;
+        ahora timestamp := timezone('utc', now());
+        agente integer;
+        propietario integer;
+    BEGIN
+        IF TG_TABLE_NAME = 'propiedades' THEN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+                VALUES (
+                    OLD.id, 'delete', 'baja',
+                    array_remove(ARRAY[OLD.agente_id], NULL), array_remove(ARRAY[OLD.propietario_id], NULL),
+                    transaccion, ahora
+                );
+            ELSIF TG_OP = 'INSERT' THEN
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+                VALUES (
+                    NEW.id, 'upsert', 'alta',
+                    array_remove(ARRAY[NEW.agente_id], NULL), array_remove(ARRAY[NEW.propietario_id], NULL),
+                    transaccion, ahora
+                );
+            ELSE
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+                VALUES (
+                    NEW.id, 'upsert',
+                    CASE WHEN NEW.estado IS DISTINCT FROM OLD.estado THEN 'estado' ELSE 'edicion' END,
+                    array_remove(ARRAY[NEW.agente_id, nullif(OLD.agente_id, NEW.agente_id)], NULL),
+                    array_remove(ARRAY[NEW.propietario_id, nullif(OLD.propietario_id, NEW.propietario_id)], NULL),
+                    transaccion, ahora
+                );
+            END IF;
+        ELSIF TG_TABLE_NAME = 'imagenes_propiedad' THEN
+            IF TG_OP <> 'INSERT' THEN
+                SELECT agente_id, propietario_id INTO agente, propietario FROM propiedades WHERE id = OLD.propiedad_id;
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+                VALUES (
+                    OLD.propiedad_id, 'upsert', 'imagenes',
+                    array_remove(ARRAY[agente], NULL), array_remove(ARRAY[propietario], NULL),
+                    transaccion, ahora
+                );
+            END IF;
+            -- Una imagen que pasa a otra propiedad modifica las dos
+            IF TG_OP = 'INSERT' THEN
+                SELECT agente_id, propietario_id INTO agente, propietario FROM propiedades WHERE id = NEW.propiedad_id;
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+                VALUES (
+                    NEW.propiedad_id, 'upsert', 'imagenes',
+                    array_remove(ARRAY[agente], NULL), array_remove(ARRAY[propietario], NULL),
+                    transaccion, ahora
+                );
+            ELSIF TG_OP = 'UPDATE' THEN
+                IF NEW.propiedad_id <> OLD.propiedad_id THEN
+                    SELECT agente_id, propietario_id INTO agente, propietario FROM propiedades WHERE id = NEW.propiedad_id;
+                    INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+                    VALUES (
+                        NEW.propiedad_id, 'upsert', 'imagenes',
+                        array_remove(ARRAY[agente], NULL), array_remove(ARRAY[propietario], NULL),
+                        transaccion, ahora
+                    );
+                END IF;
+            END IF;
+        ELSE
+            INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+            SELECT
+                p.id, 'upsert', 'direccion',
+                array_remove(ARRAY[p.agente_id], NULL), array_remove(ARRAY[p.propietario_id], NULL),
+                transaccion, ahora
+            FROM propiedades p WHERE p.direccion_id = NEW.id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Versión de a9d4e6b2f815, para el downgrade
+FUNCION_ANTERIOR = """
+    CREATE OR REPLACE FUNCTION registrar_cambio_propiedad() RETURNS trigger AS $$
+    DECLARE
+        transaccion bigint := pg_current_xact_id()::text::bigint;
+        ahora timestamp := timezone('utc', now());
+    BEGIN
+        IF TG_TABLE_NAME = 'propiedades' THEN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                VALUES (OLD.id, 'delete', transaccion, ahora);
+            ELSE
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                VALUES (NEW.id, 'upsert', transaccion, ahora);
+            END IF;
+        ELSIF TG_TABLE_NAME = 'imagenes_propiedad' THEN
+            IF TG_OP <> 'INSERT' THEN
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                VALUES (OLD.propiedad_id, 'upsert', transaccion, ahora);
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                VALUES (NEW.propiedad_id, 'upsert', transaccion, ahora);
+            ELSIF TG_OP = 'UPDATE' THEN
+                IF NEW.propiedad_id <> OLD.propiedad_id THEN
+                    INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+                    VALUES (NEW.propiedad_id, 'upsert', transaccion, ahora);
+                END IF;
+            END IF;
+        ELSE
+            INSERT INTO cambios_propiedades (propiedad_id, operacion, xid, fecha)
+            SELECT p.id, 'upsert', transaccion, ahora FROM propiedades p WHERE p.direccion_id = NEW.id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cambios_propiedades', sa.Column('motivo', sa.String(length=9), nullable=True))
+    op.add_column('cambios_propiedades', sa.Column('agentes', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.add_column('cambios_propiedades', sa.Column('propietarios', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.execute(FUNCION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(FUNCION_ANTERIOR)
+    op.drop_column('cambios_propiedades', 'propietarios')
+    op.drop_column('cambios_propiedades', 'agentes')
+    op.drop_column('cambios_propiedades', 'motivo')
@@ -0,0 +1,58 @@
+"""Contador de versiones por tabla para GET condicionales
+
+Revision ID: d41e7b9a0c53
+Revises: 8c3f1a6d2e90
+Create Date: 2026-10-19 22:18:03.655120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41e7b9a0c53'
+down_revision: Union[str, None] = '8c3f1a6d2e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLAS = ('paises', 'provincias', 'localidades')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('versiones_tablas',
+    sa.Column('tabla', sa.String(length=63), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('fecha_modificacion', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('tabla')
+    )
+    op.execute("""
+        CREATE FUNCTION incrementar_version_tabla() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO versiones_tablas (tabla, version, fecha_modificacion)
+            VALUES (TG_TABLE_NAME, 1, timezone('utc', clock_timestamp()))
+            ON CONFLICT (tabla) DO UPDATE
+            SET version = versiones_tablas.version + 1,
+                fecha_modificacion = EXCLUDED.fecha_modificacion;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for tabla in TABLAS:
+        op.execute(
+            f"INSERT INTO versiones_tablas (tabla, version, fecha_modificacion) "
+            f"VALUES ('{tabla}', 1, timezone('utc', now()))"
+        )
+        op.execute(
+            f"CREATE TRIGGER {tabla}_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabla} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_tabla()"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in TABLAS:
+        op.execute(f"DROP TRIGGER {tabla}_version ON {tabla}")
+    op.execute("DROP FUNCTION incrementar_version_tabla()")
+    op.drop_table('versiones_tablas')
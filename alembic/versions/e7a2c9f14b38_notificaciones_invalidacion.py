@@ -0,0 +1,90 @@
+"""Notificaciones de invalidación de cachés (LISTEN/NOTIFY)
+
+Revision ID: e7a2c9f14b38
+Revises: d41e7b9a0c53
+Create Date: 2026-10-19 23:41:27.204815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c9f14b38'
+down_revision: Union[str, None] = 'd41e7b9a0c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabla -> columnas que viajan en `fila`/`anterior` (las que leen los filtros de
+# la caché de búsquedas, o la propiedad a la que pertenece una imagen)
+TABLAS = {
+    'propiedades': (
+        'tipo_propiedad', 'tipo_operacion', 'precio_venta', 'precio_alquiler', 'dormitorios', 'banios',
+        'superficie_cubierta', 'superficie_descubierta', 'estado', 'propietario_id', 'agente_id',
+    ),
+    'clientes': (),
+    'agentes': (),
+    'direcciones': (),
+    'imagenes_propiedad': ('propiedad_id',),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # El canal debe coincidir con app.core.invalidacion.CANAL
+    op.execute("""
+        CREATE FUNCTION notificar_invalidacion() RETURNS trigger AS $$
+        DECLARE
+            nueva jsonb;
+            vieja jsonb;
+            mensaje jsonb;
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                nueva := to_jsonb(NEW);
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                vieja := to_jsonb(OLD);
+            END IF;
+            mensaje := jsonb_build_object(
+                'tabla', TG_TABLE_NAME,
+                'op', TG_OP,
+                'id', coalesce(nueva, vieja) -> 'id',
+                'version', coalesce(nueva, vieja) -> 'version'
+            );
+            IF TG_OP = 'UPDATE' THEN
+                mensaje := mensaje || jsonb_build_object('cambiadas', (
+                    SELECT coalesce(jsonb_agg(n.key), '[]'::jsonb)
+                    FROM jsonb_each(nueva) n
+                    WHERE n.value IS DISTINCT FROM vieja -> n.key
+                ));
+            END IF;
+            IF TG_NARGS > 0 THEN
+                IF nueva IS NOT NULL THEN
+                    mensaje := mensaje || jsonb_build_object('fila', (
+                        SELECT jsonb_object_agg(c, nueva -> c) FROM unnest(TG_ARGV) c
+                    ));
+                END IF;
+                IF vieja IS NOT NULL THEN
+                    mensaje := mensaje || jsonb_build_object('anterior', (
+                        SELECT jsonb_object_agg(c, vieja -> c) FROM unnest(TG_ARGV) c
+                    ));
+                END IF;
+            END IF;
+            PERFORM pg_notify('invalidaciones', mensaje::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for tabla, columnas in TABLAS.items():
+        argumentos = ", ".join(f"'{c}'" for c in columnas)
+        op.execute(
+            f"CREATE TRIGGER {tabla}_invalidacion AFTER INSERT OR UPDATE OR DELETE ON {tabla} "
+            f"FOR EACH ROW EXECUTE FUNCTION notificar_invalidacion({argumentos})"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in TABLAS:
+        op.execute(f"DROP TRIGGER {tabla}_invalidacion ON {tabla}")
+    op.execute("DROP FUNCTION notificar_invalidacion()")
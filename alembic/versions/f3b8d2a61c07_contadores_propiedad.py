@@ -0,0 +1,37 @@
+"""Contadores de vistas y contactos por propiedad
+
+Revision ID: f3b8d2a61c07
+Revises: e7a2c9f14b38
+Create Date: 2026-10-20 00:52:11.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a61c07'
+down_revision: Union[str, None] = 'e7a2c9f14b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('contadores_propiedad',
+    sa.Column('propiedad_id', sa.Integer(), nullable=False),
+    sa.Column('granularidad', sa.String(length=4), nullable=False),
+    sa.Column('inicio', sa.DateTime(), nullable=False),
+    sa.Column('vistas', sa.BigInteger(), nullable=False),
+    sa.Column('contactos', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('propiedad_id', 'granularidad', 'inicio')
+    )
+    # Rankings por período ("más vistas de los últimos 7 días")
+    op.create_index('ix_contadores_propiedad_granularidad_inicio', 'contadores_propiedad', ['granularidad', 'inicio'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contadores_propiedad_granularidad_inicio', table_name='contadores_propiedad')
+    op.drop_table('contadores_propiedad')
@@ -1,59 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import FrozenSet, List, Optional
 import app.models.agente as models
 import app.schemas.agente as schemas
-from app.core.database import get_db
+from app.core.cache_entidades import cache_agentes, cache_propiedades, desempaquetar, empaquetar
+from app.core.condicional import Validador, etag_de
+from app.core.concurrencia import ConflictoVersion, actualizar_con_version, etag, raise_precondicion_fallida, version_esperada
+from app.core.database import get_async_db, get_read_db, sesion_de_carga
+from app.core.presupuestos import presupuesto_sql
+from app.core.serializacion import parametros_campos, proyeccion_parcial, respuesta_json
 
 router = APIRouter(
     prefix="/agente",
     tags=["Agente"]
 )
 
+# Parámetros fields de los endpoints de lectura
+campos_agente = parametros_campos(schemas.AgenteOut)
+
+async def invalidar_agente(agente_id: int) -> None:
+    """El agente aparece anidado en el detalle de sus propiedades: se invalidan también."""
+    await cache_agentes.invalidar(agente_id)
+    await cache_propiedades.invalidar_todo()
+
 # TODO Agente-Routers
 @router.post("/agente", response_model=schemas.AgenteOut, response_model_exclude_unset=True)
-def crear_agente(agente: schemas.AgenteCreate, db: Session = Depends(get_db)):
+@presupuesto_sql(2)
+async def crear_agente(agente: schemas.AgenteCreate, db: AsyncSession = Depends(get_async_db)):
     db_agente = models.Agente(**agente.model_dump())
     db.add(db_agente)
-    db.commit()
-    db.refresh(db_agente)
+    await db.commit()
+    await db.refresh(db_agente)
+    # Puede haber un 404 cacheado para este ID
+    await cache_agentes.invalidar(db_agente.id)
     return db_agente
 
 @router.get("/agentes", response_model=List[schemas.AgenteOut], response_model_exclude_unset=True)
-def obtener_agentes(db: Session = Depends(get_db)):
-    return db.query(models.Agente).all()
+@presupuesto_sql(1)
+async def obtener_agentes(
+    campos: Optional[FrozenSet[str]] = Depends(campos_agente),
+    db: AsyncSession = Depends(get_read_db)
+):
+    proyeccion = proyeccion_parcial(schemas.AgenteOut, models.Agente, campos)
+    result = await db.execute(proyeccion.select())
+    return proyeccion.respuesta(result.all())
 
 @router.get("/agente/{agente_id}", response_model=schemas.AgenteOut, response_model_exclude_unset=True)
-def obtener_agente(agente_id: int, db: Session = Depends(get_db)):
-    db_agente = db.query(models.Agente).filter(models.Agente.id == agente_id).first()
-    if not db_agente:
+@presupuesto_sql(1)
+async def obtener_agente(
+    agente_id: int,
+    request: Request,
+    campos: Optional[FrozenSet[str]] = Depends(campos_agente),
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def cargar(primario: bool = False) -> Optional[bytes]:
+        async with sesion_de_carga(db, primario) as sesion:
+            proyeccion = proyeccion_parcial(schemas.AgenteOut, models.Agente, campos)
+            result = await sesion.execute(
+                proyeccion.select()
+                .add_columns(models.Agente.version, func.coalesce(models.Agente.fecha_modificacion, models.Agente.fecha_alta))
+                .filter(models.Agente.id == agente_id)
+            )
+            fila = result.first()
+            if not fila:
+                return None
+            return empaquetar({"version": fila[-2], "ultima_modificacion": fila[-1]}, proyeccion.serializar_uno(fila))
+
+    # Sólo la representación completa pasa por la caché de entidades
+    valor = await (cache_agentes.obtener(agente_id, cargar) if campos is None else cargar())
+    if valor is None:
         raise HTTPException(status_code=404, detail="Agente no encontrado")
-    return db_agente
+    meta, cuerpo = desempaquetar(valor)
+    ultima_modificacion = meta["ultima_modificacion"]
+    validador = Validador(
+        etag_de(meta["version"], campos=campos),
+        datetime.fromisoformat(ultima_modificacion) if ultima_modificacion else None
+    )
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    return validador.aplicar(respuesta_json(cuerpo))
 
 @router.put("/agente/{agente_id}", response_model=schemas.AgenteOut, response_model_exclude_unset=True)
-def actualizar_agente(agente_id: int, agente: schemas.AgenteCreate, db: Session = Depends(get_db)):
-    db_agente = db.query(models.Agente).filter(models.Agente.id == agente_id).first()
+@presupuesto_sql(1)
+async def actualizar_agente(
+    agente_id: int,
+    agente: schemas.AgenteCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    valores = agente.model_dump(exclude={"direccion"})
+    valores["fecha_modificacion"] = datetime.utcnow()
+    try:
+        db_agente = await actualizar_con_version(
+            db, models.Agente, agente_id, valores,
+            version=version_esperada(if_match)
+        )
+    except ConflictoVersion as e:
+        raise_precondicion_fallida(e.version_actual)
     if not db_agente:
         raise HTTPException(status_code=404, detail="Agente no encontrado")
     
-    for key, value in agente.model_dump().items():
-        setattr(db_agente, key, value)
-    
-    db.commit()
-    db.refresh(db_agente)
+    await invalidar_agente(agente_id)
+    response.headers["ETag"] = etag(db_agente.version)
     return db_agente
 
 @router.delete("/agente/{agente_id}", status_code=204)
-def eliminar_agente(agente_id: int, db: Session = Depends(get_db)):
-    db_agente = db.query(models.Agente).filter(models.Agente.id == agente_id).first()
+@presupuesto_sql(4)
+async def eliminar_agente(agente_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_agente = await db.get(models.Agente, agente_id)
     if not db_agente:
         raise HTTPException(status_code=404, detail="Agente no encontrado")
     
-    db.delete(db_agente)
-    db.commit()
+    await db.delete(db_agente)
+    await db.commit()
+    await invalidar_agente(agente_id)
     return None
 
 @router.get("/agente/activos", response_model=List[schemas.AgenteOut], response_model_exclude_unset=True)
-def obtener_agentes_activos(db: Session = Depends(get_db)):
-    return db.query(models.Agente).filter(models.Agente.activo is True).all()
+@presupuesto_sql(1)
+async def obtener_agentes_activos(
+    campos: Optional[FrozenSet[str]] = Depends(campos_agente),
+    db: AsyncSession = Depends(get_read_db)
+):
+    proyeccion = proyeccion_parcial(schemas.AgenteOut, models.Agente, campos)
+    result = await db.execute(proyeccion.select().filter(models.Agente.activo.is_(True)))
+    return proyeccion.respuesta(result.all())
 
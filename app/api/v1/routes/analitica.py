@@ -0,0 +1,60 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.presupuestos import presupuesto_sql
+from app.snapshots import DIMENSIONES, METRICAS, LectorSnapshot
+
+router = APIRouter(
+    prefix="/analitica",
+    tags=["Analítica"]
+)
+
+# Un lector por worker; relee el snapshot cuando termina una nueva corrida del job
+lector = LectorSnapshot()
+
+@router.get("/snapshot")
+@presupuesto_sql(0)
+async def obtener_estado_snapshot():
+    estado = lector.estado()
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Todavía no se generó ningún snapshot")
+    return estado
+
+@router.get("/propiedades/resumen")
+@presupuesto_sql(0)
+async def resumen_propiedades(
+    agrupar_por: List[str] = Query([], description=f"Columnas de agrupación: {', '.join(sorted(DIMENSIONES))}"),
+    metrica: str = Query("precio_venta", description=f"Métrica: {', '.join(sorted(METRICAS))}"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado (p. ej. activo)"),
+    tipo_propiedad: Optional[str] = Query(None, description="Filtrar por tipo de propiedad (p. ej. casa)"),
+    tipo_operacion: Optional[str] = Query(None, description="Filtrar por tipo de operación (p. ej. venta)"),
+    provincia: Optional[str] = Query(None, description="Filtrar por provincia"),
+    localidad: Optional[str] = Query(None, description="Filtrar por localidad"),
+):
+    """
+    Cantidad de propiedades y estadísticas de una métrica por grupo, calculadas
+    sobre el último snapshot Parquet en lugar de la base de producción.
+    """
+    invalidas = set(agrupar_por) - DIMENSIONES
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"No se puede agrupar por: {', '.join(sorted(invalidas))}")
+    if metrica not in METRICAS:
+        raise HTTPException(status_code=400, detail=f"Métrica inválida: {metrica}")
+    if lector.estado() is None:
+        raise HTTPException(status_code=404, detail="Todavía no se generó ningún snapshot")
+
+    filtros = {
+        columna: valor
+        for columna, valor in {
+            "estado": estado,
+            "tipo_propiedad": tipo_propiedad,
+            "tipo_operacion": tipo_operacion,
+            "provincia": provincia,
+            "localidad": localidad,
+        }.items()
+        if valor is not None
+    }
+    # Lectura de Parquet y agregación en Arrow: fuera del event loop
+    grupos = await run_in_threadpool(lector.resumen, agrupar_por, metrica, filtros)
+    return {"snapshot": lector.estado(), "grupos": grupos}
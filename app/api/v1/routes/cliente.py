@@ -1,56 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import FrozenSet, List, Optional
 import app.schemas.cliente as schemas
 import app.models.cliente as models
-from app.core.database import get_db
+from app.core.cache_entidades import cache_clientes, cache_propiedades, desempaquetar, empaquetar
+from app.core.condicional import Validador, etag_de
+from app.core.concurrencia import ConflictoVersion, actualizar_con_version, etag, raise_precondicion_fallida, version_esperada
+from app.core.database import get_async_db, get_read_db, sesion_de_carga
+from app.core.presupuestos import presupuesto_sql
+from app.core.serializacion import parametros_campos, proyeccion_parcial, respuesta_json
 
 router = APIRouter(
     prefix="/cliente",
     tags=["Cliente"]
 )
 
+# Parámetros fields de los endpoints de lectura
+campos_cliente = parametros_campos(schemas.ClienteOut)
+
+async def invalidar_cliente(cliente_id: int) -> None:
+    """El cliente aparece anidado (propietario) en el detalle de sus propiedades: se invalidan también."""
+    await cache_clientes.invalidar(cliente_id)
+    await cache_propiedades.invalidar_todo()
+
 # TODO Cliente-Routers
 @router.post("/cliente", response_model=schemas.ClienteOut, response_model_exclude_unset=True)
-def crear_cliente(cliente: schemas.ClienteCreate, db: Session = Depends(get_db)):
+@presupuesto_sql(2)
+async def crear_cliente(cliente: schemas.ClienteCreate, db: AsyncSession = Depends(get_async_db)):
     db_cliente = models.Cliente(**cliente.model_dump())
     db.add(db_cliente)
-    db.commit()
-    db.refresh(db_cliente)
+    await db.commit()
+    await db.refresh(db_cliente)
+    # Puede haber un 404 cacheado para este ID
+    await cache_clientes.invalidar(db_cliente.id)
     return db_cliente
 
 @router.get("/clientes", response_model=List[schemas.ClienteOut])
-def obtener_clientes(db: Session = Depends(get_db)):
-    return db.query(models.Cliente).all()
+@presupuesto_sql(1)
+async def obtener_clientes(
+    campos: Optional[FrozenSet[str]] = Depends(campos_cliente),
+    db: AsyncSession = Depends(get_read_db)
+):
+    proyeccion = proyeccion_parcial(schemas.ClienteOut, models.Cliente, campos)
+    result = await db.execute(proyeccion.select())
+    return proyeccion.respuesta(result.all())
 
 @router.get("/cliente/{cliente_id}", response_model=schemas.ClienteOut)
-def obtener_cliente(cliente_id: int, db: Session = Depends(get_db)):
-    db_cliente = db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
-    if not db_cliente:
+@presupuesto_sql(1)
+async def obtener_cliente(
+    cliente_id: int,
+    request: Request,
+    campos: Optional[FrozenSet[str]] = Depends(campos_cliente),
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def cargar(primario: bool = False) -> Optional[bytes]:
+        async with sesion_de_carga(db, primario) as sesion:
+            proyeccion = proyeccion_parcial(schemas.ClienteOut, models.Cliente, campos)
+            result = await sesion.execute(
+                proyeccion.select().add_columns(models.Cliente.version).filter(models.Cliente.id == cliente_id)
+            )
+            fila = result.first()
+            if not fila:
+                return None
+            return empaquetar({"version": fila[-1]}, proyeccion.serializar_uno(fila))
+
+    # Sólo la representación completa pasa por la caché de entidades
+    valor = await (cache_clientes.obtener(cliente_id, cargar) if campos is None else cargar())
+    if valor is None:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    return db_cliente
+    meta, cuerpo = desempaquetar(valor)
+    validador = Validador(etag_de(meta["version"], campos=campos))
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    return validador.aplicar(respuesta_json(cuerpo))
 
 @router.put("/cliente/{cliente_id}", response_model=schemas.ClienteOut, response_model_exclude_unset=True)
-def actualizar_cliente(cliente_id: int, cliente: schemas.ClienteCreate, db: Session = Depends(get_db)):
-    db_cliente = db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
+@presupuesto_sql(1)
+async def actualizar_cliente(
+    cliente_id: int,
+    cliente: schemas.ClienteCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        db_cliente = await actualizar_con_version(
+            db, models.Cliente, cliente_id, cliente.model_dump(exclude={"direccion"}),
+            version=version_esperada(if_match)
+        )
+    except ConflictoVersion as e:
+        raise_precondicion_fallida(e.version_actual)
     if not db_cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
-    for key, value in cliente.model_dump().items():
-        setattr(db_cliente, key, value)
-    
-    db.commit()
-    db.refresh(db_cliente)
+    await invalidar_cliente(cliente_id)
+    response.headers["ETag"] = etag(db_cliente.version)
     return db_cliente
 
 @router.delete("/cliente/{cliente_id}", status_code=204)
-def eliminar_cliente(cliente_id: int, db: Session = Depends(get_db)):
-    db_cliente = db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
+@presupuesto_sql(3)
+async def eliminar_cliente(cliente_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_cliente = await db.get(models.Cliente, cliente_id)
     if not db_cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
-    db.delete(db_cliente)
-    db.commit()
+    await db.delete(db_cliente)
+    await db.commit()
+    await invalidar_cliente(cliente_id)
     return None
 
 
@@ -1,190 +1,258 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from sqlalchemy.orm import joinedload
 from app.models.direccion import Provincia, Localidad
 import app.schemas.direccion as schemas
 import app.models.direccion as models
-from app.core.database import get_db
+from app.core.cache_entidades import cache_propiedades
+from app.core.condicional import validador_tablas
+from app.core.concurrencia import ConflictoVersion, actualizar_con_version, etag, raise_precondicion_fallida, version_esperada
+from app.core.database import get_async_db, get_read_db
+from app.core.presupuestos import presupuesto_sql
+from app.core.serializacion import Proyeccion
 
 router = APIRouter(
     prefix="/direccion",
     tags=["Dirección"]
 )
 
+# Relaciones anidadas que serializan ProvinciaOut y LocalidadOut
+PROVINCIA_RELACIONES = (joinedload(Provincia.pais),)
+LOCALIDAD_RELACIONES = (joinedload(Localidad.provincia).joinedload(Provincia.pais),)
+
+# Listados serializados directamente desde columnas
+PAISES_JSON = Proyeccion(schemas.PaisOut, models.Pais)
+PROVINCIAS_JSON = Proyeccion(schemas.ProvinciaOut, Provincia)
+LOCALIDADES_JSON = Proyeccion(schemas.LocalidadOut, Localidad)
+DIRECCIONES_JSON = Proyeccion(schemas.DireccionOut, models.Direccion)
+
+async def _obtener_provincia(db: AsyncSession, provincia_id: int):
+    result = await db.execute(
+        select(Provincia).options(*PROVINCIA_RELACIONES)
+        .filter(Provincia.id == provincia_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def _obtener_localidad(db: AsyncSession, localidad_id: int):
+    result = await db.execute(
+        select(Localidad).options(*LOCALIDAD_RELACIONES)
+        .filter(Localidad.id == localidad_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
 # TODO Pais-Routers
 @router.post("/pais", response_model=schemas.PaisOut, response_model_exclude_unset=True)
-def crear_pais(pais: schemas.PaisCreate, db: Session = Depends(get_db)):
+@presupuesto_sql(2)
+async def crear_pais(pais: schemas.PaisCreate, db: AsyncSession = Depends(get_async_db)):
     db_pais = models.Pais(**pais.model_dump())
     db.add(db_pais)
-    db.commit()
-    db.refresh(db_pais)
+    await db.commit()
+    await db.refresh(db_pais)
     return db_pais
 
 @router.get("/paises", response_model=List[schemas.PaisOut])
-def obtener_paises(db: Session = Depends(get_db)):
-    return db.query(models.Pais).all()
+@presupuesto_sql(2)
+async def obtener_paises(request: Request, db: AsyncSession = Depends(get_read_db)):
+    validador = await validador_tablas(db, ("paises",))
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    result = await db.execute(PAISES_JSON.select())
+    return validador.aplicar(PAISES_JSON.respuesta(result.all()))
 
 @router.put("/pais/{pais_id}", response_model=schemas.PaisOut, response_model_exclude_unset=True)
-def actualizar_pais(pais_id: int, pais:schemas.PaisCreate, db: Session = Depends(get_db)):
-    db_pais = db.query(models.Pais).filter(models.Pais.id == pais_id).first()
+@presupuesto_sql(2)
+async def actualizar_pais(pais_id: int, pais:schemas.PaisCreate, db: AsyncSession = Depends(get_async_db)):
+    db_pais = await db.get(models.Pais, pais_id)
     if not db_pais:
         raise HTTPException(status_code=404, detail="País no encontrado")
-    
+
     for key, value in pais.model_dump().items():
         setattr(db_pais, key, value)
-    
-    db.commit()
-    db.refresh(db_pais)
+
+    await db.commit()
+    await db.refresh(db_pais)
     return db_pais
 
 @router.delete("/pais/{pais_id}", status_code=204)
-def eliminar_pais(pais_id: int, db: Session = Depends(get_db)):
-    db_pais = db.query(models.Pais).filter(models.Pais.id == pais_id).first()
+@presupuesto_sql(4)
+async def eliminar_pais(pais_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_pais = await db.get(models.Pais, pais_id)
     if not db_pais:
         raise HTTPException(status_code=404, detail="País no encontrado")
-    
-    db.delete(db_pais)
-    db.commit()
+
+    await db.delete(db_pais)
+    await db.commit()
     return None
 
 # TODO Provincia-Routers
 @router.post("/provincia", response_model=schemas.ProvinciaOut, response_model_exclude_unset=True)
-def crear_provincia(provincia: schemas.ProvinciaCreate, db: Session = Depends(get_db)):
+@presupuesto_sql(3)
+async def crear_provincia(provincia: schemas.ProvinciaCreate, db: AsyncSession = Depends(get_async_db)):
     # Verificar si el país existe
-    pais = db.query(models.Pais).filter(models.Pais.id == provincia.pais_id).first()
+    pais = await db.get(models.Pais, provincia.pais_id)
     if not pais:
         raise HTTPException(status_code=404, detail="País no encontrado")
-    
+
     db_provincia = models.Provincia(**provincia.model_dump())
     db.add(db_provincia)
-    db.commit()
-    db.refresh(db_provincia)
-    return db_provincia
+    await db.commit()
+    return await _obtener_provincia(db, db_provincia.id)
 
 @router.get("/provincias", response_model=List[schemas.ProvinciaOut])
-def obtener_provincias(db: Session = Depends(get_db)):
-    provincias = db.query(Provincia).options(joinedload(Provincia.pais)).all()
-    return provincias
+@presupuesto_sql(2)
+async def obtener_provincias(request: Request, db: AsyncSession = Depends(get_read_db)):
+    # ProvinciaOut incluye el país: cambia si cambia cualquiera de las dos tablas
+    validador = await validador_tablas(db, ("paises", "provincias"))
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    result = await db.execute(PROVINCIAS_JSON.select())
+    return validador.aplicar(PROVINCIAS_JSON.respuesta(result.all()))
 
 @router.put("/provincia/{provincia_id}", response_model=schemas.ProvinciaOut, response_model_exclude_unset=True)
-def actualizar_provincia(provincia_id: int, provincia: schemas.ProvinciaCreate, db: Session = Depends(get_db)):
-    db_provincia = db.query(models.Provincia).filter(models.Provincia.id == provincia_id).first()
+@presupuesto_sql(3)
+async def actualizar_provincia(provincia_id: int, provincia: schemas.ProvinciaCreate, db: AsyncSession = Depends(get_async_db)):
+    db_provincia = await db.get(models.Provincia, provincia_id)
     if not db_provincia:
         raise HTTPException(status_code=404, detail="Provincia no encontrada")
-    
+
     # Verificar si el país existe
-    pais = db.query(models.Pais).filter(models.Pais.id == provincia.pais_id).first()
+    pais = await db.get(models.Pais, provincia.pais_id)
     if not pais:
         raise HTTPException(status_code=404, detail="País no encontrado")
-    
+
     for key, value in provincia.model_dump().items():
         setattr(db_provincia, key, value)
 
-    db.commit()
-    db.refresh(db_provincia)
-    return db_provincia
+    await db.commit()
+    return await _obtener_provincia(db, provincia_id)
 
 @router.delete("/provincia/{provincia_id}", status_code=204)
-def eliminar_provincia(provincia_id: int, db: Session = Depends(get_db)):
-    db_provincia = db.query(models.Provincia).filter(models.Provincia.id == provincia_id).first()
+@presupuesto_sql(4)
+async def eliminar_provincia(provincia_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_provincia = await db.get(models.Provincia, provincia_id)
     if not db_provincia:
         raise HTTPException(status_code=404, detail="Provincia no encontrada")
-    db.delete(db_provincia)
-    db.commit()
+    await db.delete(db_provincia)
+    await db.commit()
     return None
 
 # TODO Localidad-Routers
 @router.post("/localidad/", response_model=schemas.LocalidadOut, response_model_exclude_unset=True)
-def crear_localidad(localidad: schemas.LocalidadCreate, db: Session = Depends(get_db)):
-    provincia = db.query(models.Provincia).filter(models.Provincia.id == localidad.provincia_id).first()
+@presupuesto_sql(3)
+async def crear_localidad(localidad: schemas.LocalidadCreate, db: AsyncSession = Depends(get_async_db)):
+    provincia = await db.get(models.Provincia, localidad.provincia_id)
     if not provincia:
         raise HTTPException(status_code=404, detail="Provincia no encontrada")
 
     db_localidad = models.Localidad(nombre=localidad.nombre, provincia_id=localidad.provincia_id)
     db.add(db_localidad)
-    db.commit()
-    db.refresh(db_localidad)
-    return db_localidad
+    await db.commit()
+    return await _obtener_localidad(db, db_localidad.id)
 
 @router.get("/localidades/", response_model=List[schemas.LocalidadOut])
-def obtener_localidades(db: Session = Depends(get_db)):
-    localidades = db.query(Localidad).options(joinedload(Localidad.provincia)).all()
-    return localidades
+@presupuesto_sql(2)
+async def obtener_localidades(request: Request, db: AsyncSession = Depends(get_read_db)):
+    validador = await validador_tablas(db, ("paises", "provincias", "localidades"))
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    result = await db.execute(LOCALIDADES_JSON.select())
+    return validador.aplicar(LOCALIDADES_JSON.respuesta(result.all()))
 
 @router.put("/localidad/{localidad_id}", response_model=schemas.LocalidadOut, response_model_exclude_unset=True)
-def actualizar_localidad(localidad_id: int, localidad: schemas.LocalidadCreate, db: Session = Depends(get_db)):
-    db_localidad = db.query(models.Localidad).filter(models.Localidad.id == localidad_id).first()
-    
+@presupuesto_sql(3)
+async def actualizar_localidad(localidad_id: int, localidad: schemas.LocalidadCreate, db: AsyncSession = Depends(get_async_db)):
+    db_localidad = await db.get(models.Localidad, localidad_id)
+
     if not db_localidad:
         raise HTTPException(status_code=404, detail="Localidad no encontrada")
-    
+
     # Verificar si la provincia asociada existe
-    if not db.query(models.Provincia).filter(models.Provincia.id == localidad.provincia_id).first():
+    if not await db.get(models.Provincia, localidad.provincia_id):
         raise HTTPException(status_code=400, detail="La provincia especificada no existe")
-    
+
     for key, value in localidad.model_dump().items():
         setattr(db_localidad, key, value)
 
-    db.commit()
-    db.refresh(db_localidad)
-    return db_localidad
+    await db.commit()
+    return await _obtener_localidad(db, localidad_id)
 
 @router.delete("/localidad/{localidad_id}", status_code=204)
-def eliminar_localidad(localidad_id: int, db: Session = Depends(get_db)):
-    db_localidad = db.query(models.Localidad).filter(models.Localidad.id == localidad_id).first()
+@presupuesto_sql(3)
+async def eliminar_localidad(localidad_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_localidad = await db.get(models.Localidad, localidad_id)
     if not db_localidad:
         raise HTTPException(status_code=404, detail="Localidad no encontrada")
-    db.delete(db_localidad)
-    db.commit()
+    await db.delete(db_localidad)
+    await db.commit()
     return None
 
 # TODO: Direccion-Routers
 @router.post("/direccion", response_model=schemas.DireccionOut, response_model_exclude_unset=True)
-def crear_direccion(direccion: schemas.DireccionCreate, db: Session = Depends(get_db)):
+@presupuesto_sql(5)
+async def crear_direccion(direccion: schemas.DireccionCreate, db: AsyncSession = Depends(get_async_db)):
     # Verificar si la localidad existe
-    localidad = db.query(models.Localidad).filter(models.Localidad.id == direccion.localidad_id).first()
+    localidad = await db.get(models.Localidad, direccion.localidad_id)
     if not localidad:
         raise HTTPException(status_code=404, detail="Localidad no encontrada")
-    
+
     # Verificar si la provincia existe
-    provincia = db.query(models.Provincia).filter(models.Provincia.id == direccion.provincia_id).first()
+    provincia = await db.get(models.Provincia, direccion.provincia_id)
     if not provincia:
         raise HTTPException(status_code=404, detail="Provincia no encontrada")
-    
+
     # Verificar si el país existe
-    pais = db.query(models.Pais).filter(models.Pais.id == direccion.pais_id).first()
+    pais = await db.get(models.Pais, direccion.pais_id)
     if not pais:
         raise HTTPException(status_code=404, detail="País no encontrado")
-    
+
     db_direccion = models.Direccion(**direccion.model_dump())
     db.add(db_direccion)
-    db.commit()
-    db.refresh(db_direccion)
+    await db.commit()
+    await db.refresh(db_direccion)
     return db_direccion
 
 @router.get("/direcciones", response_model=List[schemas.DireccionOut])
-def obtener_direcciones(db: Session = Depends(get_db)):
-    direcciones = db.query(models.Direccion).options(joinedload(models.Direccion.localidad)).all()
-    return direcciones
+@presupuesto_sql(1)
+async def obtener_direcciones(db: AsyncSession = Depends(get_read_db)):
+    # DireccionOut no incluye la localidad anidada, no hace falta el JOIN
+    result = await db.execute(DIRECCIONES_JSON.select())
+    return DIRECCIONES_JSON.respuesta(result.all())
 
 @router.put("/direccion/{direccion_id}", response_model=schemas.DireccionOut, response_model_exclude_unset=True)
-def actualizar_direccion(direccion_id: int, direccion: schemas.DireccionCreate, db: Session = Depends(get_db)):
-    db_direccion = db.query(models.Direccion).filter(models.Direccion.id == direccion_id).first()
+@presupuesto_sql(1)
+async def actualizar_direccion(
+    direccion_id: int,
+    direccion: schemas.DireccionCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        db_direccion = await actualizar_con_version(
+            db, models.Direccion, direccion_id, direccion.model_dump(),
+            version=version_esperada(if_match)
+        )
+    except ConflictoVersion as e:
+        raise_precondicion_fallida(e.version_actual)
     if not db_direccion:
-        raise HTTPException(status_code=404, detail="Localidad no encontrada")
-    for key, value in direccion.model_dump().items():
-        setattr(db_direccion, key, value)
+        raise HTTPException(status_code=404, detail="Direccion no encontrada")
 
-    db.commit()
-    db.refresh(db_direccion)
+    # La dirección aparece anidada en el detalle de la propiedad
+    await cache_propiedades.invalidar_todo()
+    response.headers["ETag"] = etag(db_direccion.version)
     return db_direccion
 
 @router.delete("/direccion/{direccion_id}", status_code=204)
-def eliminar_direccion(direccion_id: int, db: Session = Depends(get_db)):
-    db_direccion = db.query(models.Direccion).filter(models.Direccion.id == direccion_id).first()
+@presupuesto_sql(5)
+async def eliminar_direccion(direccion_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_direccion = await db.get(models.Direccion, direccion_id)
     if not db_direccion:
         raise HTTPException(status_code=404, detail="Direccion no encontrada")
-    db.delete(db_direccion)
-    db.commit()
-    return None
\ No newline at end of file
+    await db.delete(db_direccion)
+    await db.commit()
+    await cache_propiedades.invalidar_todo()
+    return None
@@ -1,9 +1,11 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Path
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.core.database import get_db
-from schemas import (
+from app.core.database import get_async_db, get_read_db
+from app.core.presupuestos import presupuesto_sql
+from app.schemas.imagen import (
     ImagenPropiedadCreate, 
     ImagenAgenteCreate, 
     ImagenPropiedadOut, 
@@ -11,7 +13,7 @@ from schemas import (
     ImagenUploadResponse,
     EstablecerImagenPrincipalRequest
 )
-import crud.imagenes as crud_imagenes  # Importamos el módulo de CRUD que acabamos de crear
+import app.crud.imagen_crud as crud_imagenes
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -26,11 +28,12 @@ router = APIRouter(
 # Rutas para imágenes de propiedades
 
 @router.post("/propiedades/", response_model=ImagenUploadResponse)
+@presupuesto_sql(3)
 async def upload_imagen_propiedad(
     propiedad_id: int = Form(..., description="ID de la propiedad"),
     tipo: str = Form("secundaria", description="Tipo de imagen (ej. 'principal', 'secundaria')"),
     file: UploadFile = File(..., description="Archivo de imagen a subir"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Sube una nueva imagen para una propiedad.
@@ -56,7 +59,7 @@ async def upload_imagen_propiedad(
         )
         
         # Guardar la imagen
-        result = crud_imagenes.create_imagen_propiedad(db, imagen_create, file)
+        result = await crud_imagenes.create_imagen_propiedad(db, imagen_create, file)
         return result
     except HTTPException as e:
         # Re-lanzar excepciones HTTP
@@ -69,16 +72,17 @@ async def upload_imagen_propiedad(
         )
 
 @router.get("/propiedades/{imagen_id}", response_model=ImagenPropiedadOut)
-def get_imagen_propiedad(
+@presupuesto_sql(1)
+async def get_imagen_propiedad(
     imagen_id: int = Path(..., description="ID de la imagen a obtener"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtiene una imagen de propiedad por su ID.
     
     - **imagen_id**: ID de la imagen a obtener
     """
-    imagen = crud_imagenes.get_imagen_propiedad(db, imagen_id)
+    imagen = await crud_imagenes.get_imagen_propiedad(db, imagen_id)
     if not imagen:
         raise HTTPException(
             status_code=404, 
@@ -87,22 +91,24 @@ def get_imagen_propiedad(
     return imagen
 
 @router.get("/propiedades/by-propiedad/{propiedad_id}", response_model=List[ImagenPropiedadOut])
-def get_imagenes_propiedad(
+@presupuesto_sql(1)
+async def get_imagenes_propiedad(
     propiedad_id: int = Path(..., description="ID de la propiedad"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtiene todas las imágenes asociadas a una propiedad.
     
     - **propiedad_id**: ID de la propiedad
     """
-    return crud_imagenes.get_imagenes_by_propiedad(db, propiedad_id)
+    return await crud_imagenes.get_imagenes_by_propiedad(db, propiedad_id)
 
 @router.put("/propiedades/{propiedad_id}/set-principal", response_model=dict)
-def establecer_imagen_principal_propiedad(
+@presupuesto_sql(2)
+async def establecer_imagen_principal_propiedad(
     propiedad_id: int = Path(..., description="ID de la propiedad"),
     request: EstablecerImagenPrincipalRequest = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Establece una imagen como principal/portada para una propiedad.
@@ -116,20 +122,21 @@ def establecer_imagen_principal_propiedad(
             detail="Se requiere el ID de la imagen"
         )
     
-    result = crud_imagenes.set_imagen_principal_propiedad(db, propiedad_id, request.imagen_id)
+    result = await crud_imagenes.set_imagen_principal_propiedad(db, propiedad_id, request.imagen_id)
     return {"success": result, "message": "Imagen establecida como principal correctamente"}
 
 @router.delete("/propiedades/{imagen_id}", response_model=dict)
-def delete_imagen_propiedad(
+@presupuesto_sql(3)
+async def delete_imagen_propiedad(
     imagen_id: int = Path(..., description="ID de la imagen a eliminar"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Elimina una imagen de propiedad.
     
     - **imagen_id**: ID de la imagen a eliminar
     """
-    result = crud_imagenes.delete_imagen_propiedad(db, imagen_id)
+    result = await crud_imagenes.delete_imagen_propiedad(db, imagen_id)
     if not result:
         raise HTTPException(
             status_code=404, 
@@ -140,11 +147,12 @@ def delete_imagen_propiedad(
 # Rutas para imágenes de agentes
 
 @router.post("/agentes/", response_model=ImagenUploadResponse)
+@presupuesto_sql(3)
 async def upload_imagen_agente(
     agente_id: int = Form(..., description="ID del agente"),
     tipo: str = Form("secundaria", description="Tipo de imagen (ej. 'principal', 'perfil', 'secundaria')"),
     file: UploadFile = File(..., description="Archivo de imagen a subir"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Sube una nueva imagen para un agente.
@@ -170,7 +178,7 @@ async def upload_imagen_agente(
         )
         
         # Guardar la imagen
-        result = crud_imagenes.create_imagen_agente(db, imagen_create, file)
+        result = await crud_imagenes.create_imagen_agente(db, imagen_create, file)
         return result
     except HTTPException as e:
         # Re-lanzar excepciones HTTP
@@ -183,16 +191,17 @@ async def upload_imagen_agente(
         )
 
 @router.get("/agentes/{imagen_id}", response_model=ImagenAgenteOut)
-def get_imagen_agente(
+@presupuesto_sql(1)
+async def get_imagen_agente(
     imagen_id: int = Path(..., description="ID de la imagen a obtener"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtiene una imagen de agente por su ID.
     
     - **imagen_id**: ID de la imagen a obtener
     """
-    imagen = crud_imagenes.get_imagen_agente(db, imagen_id)
+    imagen = await crud_imagenes.get_imagen_agente(db, imagen_id)
     if not imagen:
         raise HTTPException(
             status_code=404, 
@@ -201,22 +210,24 @@ def get_imagen_agente(
     return imagen
 
 @router.get("/agentes/by-agente/{agente_id}", response_model=List[ImagenAgenteOut])
-def get_imagenes_agente(
+@presupuesto_sql(1)
+async def get_imagenes_agente(
     agente_id: int = Path(..., description="ID del agente"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtiene todas las imágenes asociadas a un agente.
     
     - **agente_id**: ID del agente
     """
-    return crud_imagenes.get_imagenes_by_agente(db, agente_id)
+    return await crud_imagenes.get_imagenes_by_agente(db, agente_id)
 
 @router.put("/agentes/{agente_id}/set-principal", response_model=dict)
-def establecer_imagen_principal_agente(
+@presupuesto_sql(3)
+async def establecer_imagen_principal_agente(
     agente_id: int = Path(..., description="ID del agente"),
     request: EstablecerImagenPrincipalRequest = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Establece una imagen como principal/perfil para un agente.
@@ -230,20 +241,21 @@ def establecer_imagen_principal_agente(
             detail="Se requiere el ID de la imagen"
         )
     
-    result = crud_imagenes.set_imagen_principal_agente(db, agente_id, request.imagen_id)
+    result = await crud_imagenes.set_imagen_principal_agente(db, agente_id, request.imagen_id)
     return {"success": result, "message": "Imagen establecida como principal correctamente"}
 
 @router.delete("/agentes/{imagen_id}", response_model=dict)
-def delete_imagen_agente(
+@presupuesto_sql(3)
+async def delete_imagen_agente(
     imagen_id: int = Path(..., description="ID de la imagen a eliminar"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Elimina una imagen de agente.
     
     - **imagen_id**: ID de la imagen a eliminar
     """
-    result = crud_imagenes.delete_imagen_agente(db, imagen_id)
+    result = await crud_imagenes.delete_imagen_agente(db, imagen_id)
     if not result:
         raise HTTPException(
             status_code=404, 
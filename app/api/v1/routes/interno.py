@@ -0,0 +1,90 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core.cache_busquedas import cache_busquedas
+from app.core.database import engine, async_engine, replica_router
+from app.core.config import PROFILING_DIR, PROFILING_SECRET
+from app.core.invalidacion import bus_invalidacion
+from app.crud.destacadas_crud import feed_destacadas
+from app.crud.novedades_crud import difusion_novedades
+from app.core.pool import estadisticas_pool
+from app.core.profiling import PARAM_TOKEN, token_valido
+
+def verificar_token_interno(
+    token_header: Optional[str] = Header(None, alias="X-Profile-Token"),
+    token_param: Optional[str] = Query(None, alias=PARAM_TOKEN)
+) -> None:
+    """
+    Los endpoints internos exponen el estado de pools, réplicas y cachés, y los
+    perfiles, código y datos de requests: todos piden el token firmado del profiling.
+    """
+    if not token_valido(token_header or token_param or "", PROFILING_SECRET):
+        raise HTTPException(status_code=403, detail="Token interno inválido o vencido")
+
+router = APIRouter(
+    prefix="/interno",
+    tags=["Interno"],
+    include_in_schema=False,
+    dependencies=[Depends(verificar_token_interno)]
+)
+
+@router.get("/pool")
+def obtener_estadisticas_pool():
+    """
+    Estadísticas en vivo de los pools de conexiones de este worker.
+
+    - **en_uso**: conexiones entregadas a sesiones activas
+    - **overflow**: conexiones abiertas por encima de pool_size
+    - **esperando**: checkouts bloqueados esperando una conexión libre
+    """
+    return {
+        "async": estadisticas_pool(async_engine.sync_engine.pool),
+        "sync": estadisticas_pool(engine.pool),
+        "replicas": {
+            r.nombre: estadisticas_pool(r.engine.sync_engine.pool) for r in replica_router.replicas
+        },
+    }
+
+@router.get("/replicas")
+def obtener_estado_replicas():
+    """Salud y lag de replicación de cada réplica de lectura."""
+    return replica_router.estado()
+
+@router.get("/cache/busquedas")
+def obtener_estadisticas_cache_busquedas():
+    """Tamaño, hit ratio y desalojos de la caché de búsquedas de este worker."""
+    return cache_busquedas.estadisticas()
+
+@router.get("/invalidacion")
+def obtener_estado_invalidacion():
+    """Conexión, época y suscripciones del bus de invalidación de este worker."""
+    return bus_invalidacion.estado()
+
+@router.get("/destacadas")
+def obtener_estado_destacadas():
+    """Candidatas, top actual y cambios pendientes del feed de destacadas de este worker."""
+    return feed_destacadas.estado()
+
+@router.get("/novedades")
+def obtener_estado_novedades():
+    """Streams de novedades abiertos y cursor del registro de cambios de este worker."""
+    return difusion_novedades.estado()
+
+@router.get("/perfiles")
+def listar_perfiles():
+    """Perfiles guardados por el profiling por request, más recientes primero."""
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    return sorted(os.listdir(PROFILING_DIR), reverse=True)
+
+@router.get("/perfiles/{nombre}")
+def descargar_perfil(nombre: str):
+    """Descarga un perfil (collapsed stacks, speedscope o resumen)."""
+    if os.path.basename(nombre) != nombre:
+        raise HTTPException(status_code=400, detail="Nombre de perfil inválido")
+    ruta = os.path.join(PROFILING_DIR, nombre)
+    if not os.path.isfile(ruta):
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(ruta)
@@ -0,0 +1,56 @@
+from typing import List
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+from app.core.database import engine, async_engine, replica_router
+
+router = APIRouter(
+    tags=["Interno"],
+    include_in_schema=False
+)
+
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+def _metricas_pools() -> List[str]:
+    pools = {"primario_async": async_engine.sync_engine.pool, "primario_sync": engine.pool}
+    for replica in replica_router.replicas:
+        pools[replica.nombre] = replica.engine.sync_engine.pool
+
+    lineas = [
+        "# HELP db_pool_checked_out Conexiones del pool en uso.",
+        "# TYPE db_pool_checked_out gauge",
+    ]
+    lineas += [f'db_pool_checked_out{{pool="{nombre}"}} {pool.checkedout()}' for nombre, pool in pools.items()]
+    lineas += [
+        "# HELP db_pool_overflow Conexiones abiertas por encima de pool_size.",
+        "# TYPE db_pool_overflow gauge",
+    ]
+    lineas += [f'db_pool_overflow{{pool="{nombre}"}} {pool.overflow()}' for nombre, pool in pools.items()]
+    lineas += [
+        "# HELP db_pool_waiters Checkouts esperando una conexión libre.",
+        "# TYPE db_pool_waiters gauge",
+    ]
+    lineas += [f'db_pool_waiters{{pool="{nombre}"}} {getattr(pool, "esperando", 0)}' for nombre, pool in pools.items()]
+
+    # Sólo los pools instrumentados (app.core.pool) miden la espera y los timeouts
+    instrumentados = {nombre: pool for nombre, pool in pools.items() if hasattr(pool, "espera")}
+    lineas += [
+        "# HELP db_pool_timeouts_total Checkouts que vencieron por pool_timeout.",
+        "# TYPE db_pool_timeouts_total counter",
+    ]
+    lineas += [f'db_pool_timeouts_total{{pool="{nombre}"}} {pool.timeouts}' for nombre, pool in instrumentados.items()]
+    lineas += [
+        "# HELP db_pool_checkout_wait_seconds Espera por una conexión del pool en cada checkout.",
+        "# TYPE db_pool_checkout_wait_seconds histogram",
+    ]
+    for nombre, pool in instrumentados.items():
+        lineas += metrics.lineas_histograma("db_pool_checkout_wait_seconds", ("pool",), (nombre,), pool.espera)
+    return lineas
+
+metrics.registrar_colector(_metricas_pools)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def obtener_metricas():
+    """Métricas de este worker en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics.exportar(), media_type=CONTENT_TYPE_PROMETHEUS)
@@ -1,19 +1,52 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from typing import Any, Dict, FrozenSet, List, Literal, Optional
+from datetime import datetime, timedelta
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
 
-from app.dependencies import get_db, get_current_user
+from app.core.cache_entidades import cache_propiedades, desempaquetar
+from app.core.coalescencia import SingleFlight
+from app.core.condicional import Validador, etag_de
+from app.core.config import DESTACADAS_TAMANIO
+from app.core.concurrencia import ConflictoVersion, raise_precondicion_fallida, version_esperada
+from app.core.database import get_async_db, get_read_db, sesion_de_carga, sesion_lectura
+from app.core.presupuestos import flujo_continuo, presupuesto_sql
+from app.core.serializacion import parametros_campos, respuesta_json
+from app.dependencies import get_current_user, get_current_user_opcional
 from app.models.users import User
 from app.models.propiedad import Propiedad
-from app.schemas.propiedad import PropiedadCreate, PropiedadOut, PropiedadBase
-from app.crud.propiedad import (
+from app.models.agente import Agente
+from app.models.enums import EstadoEnum
+from app.schemas.propiedad import PropiedadCreate, PropiedadOut, PropiedadBase, PropiedadesCambioMasivo, CambioMasivoResultado, CambiosPropiedadesOut
+from app.schemas.importacion import ImportacionOut, ImportacionErrorOut
+from app.schemas.estadisticas import EstadisticasAgente, PropiedadPopularidad
+from app.crud.propiedad_crud import (
+    ESTADO_PUBLICADA,
     create_propiedad,
     get_propiedad,
-    get_propiedades,
+    get_propiedad_detalle,
     update_propiedad,
+    versiones_propiedad,
+    actualizar_propiedades_masivo,
     delete_propiedad,
-    get_propiedades_by_filters
+    exportar_propiedades,
+    buscar_propiedades_json,
+    get_propiedades_by_filters_json,
+    get_propiedades_json_por_ids
+)
+from app.crud.cambios_crud import Cursor, cursor_vencido, get_cambios_json, leer_cursor
+from app.crud.contadores_crud import acumulador_contadores, get_mas_vistas, get_serie_agente, inicio_dia
+from app.crud.destacadas_crud import feed_destacadas
+from app.crud.novedades_crud import AGENTE, PROPIETARIO, difusion_novedades
+from app.crud.importacion_crud import (
+    crear_importacion,
+    formato_de_archivo,
+    get_errores_importacion,
+    get_importacion,
+    guardar_archivo,
+    procesar_importacion
 )
 
 router = APIRouter(
@@ -22,11 +55,40 @@ router = APIRouter(
     responses={404: {"description": "Propiedad no encontrada"}},
 )
 
+# Parámetros fields/include de los endpoints de lectura
+campos_propiedad = parametros_campos(PropiedadOut)
+
+# Lecturas idénticas concurrentes comparten una única consulta
+vuelos_detalle = SingleFlight("propiedad_detalle")
+vuelos_destacadas = SingleFlight("propiedades_destacadas")
+
+
+def agente_del_usuario(current_user: Optional[User]) -> Optional[int]:
+    """
+    agente_id del usuario si es un agente con un agente asociado. Un agente sin
+    agente_id no tiene propiedades asignadas: compararlo con Propiedad.agente_id
+    (que también puede ser NULL) le daría acceso a las propiedades sin agente.
+    """
+    if current_user is None or not current_user.is_agente:
+        return None
+    return current_user.agente_id
+
+
+def cliente_del_usuario(current_user: Optional[User]) -> Optional[int]:
+    """cliente_id del usuario (None si no es propietario), con la misma salvedad."""
+    return current_user.cliente_id if current_user is not None else None
+
+FORMATOS_EXPORTACION = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
 
 @router.post("/", response_model=PropiedadOut, status_code=status.HTTP_201_CREATED)
-def create_propiedad_endpoint(
+@presupuesto_sql(2)
+async def create_propiedad_endpoint(
     propiedad: PropiedadCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -66,13 +128,10 @@ def create_propiedad_endpoint(
             detail="Los precios de venta y alquiler son obligatorios para propiedades en venta/alquiler"
         )
     
-    return create_propiedad(db=db, propiedad=propiedad, agente_id=agente_id)
+    return await create_propiedad(db=db, propiedad=propiedad, agente_id=agente_id)
 
 
-@router.get("/", response_model=List[PropiedadOut])
-def read_propiedades(
-    skip: int = 0,
-    limit: int = 100,
+def filtros_busqueda(
     tipo_propiedad: Optional[str] = Query(None, description="Filtrar por tipo de propiedad"),
     tipo_operacion: Optional[str] = Query(None, description="Filtrar por tipo de operación"),
     precio_min: Optional[int] = Query(None, description="Precio mínimo"),
@@ -83,24 +142,23 @@ def read_propiedades(
     estado: Optional[str] = Query(None, description="Estado de la propiedad"),
     propietario_id: Optional[int] = Query(None, description="ID del propietario"),
     agente_id: Optional[int] = Query(None, description="ID del agente"),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user)
-):
+    current_user: Optional[User] = Depends(get_current_user_opcional)
+) -> Dict[str, Any]:
     """
-    Obtener todas las propiedades con filtros opcionales.
+    Filtros de búsqueda de propiedades, ajustados según los permisos del usuario.
     
     Si el usuario no está autenticado, solo puede ver propiedades publicadas.
     """
-    
-    # Para usuarios no autenticados o clientes regulares, mostrar solo propiedades publicadas
-    if not current_user or (not current_user.is_admin and not current_user.is_agente):
-        estado = "PUBLICADA"
+    # Para usuarios no autenticados, clientes regulares o agentes sin agente
+    # asociado, mostrar solo propiedades publicadas
+    if not current_user or not (current_user.is_admin or agente_del_usuario(current_user) is not None):
+        estado = ESTADO_PUBLICADA
     
     # Para agentes, si no se especifica un filtro de agente_id, mostrar solo sus propiedades
-    elif current_user.is_agente and not agente_id and not current_user.is_admin:
-        agente_id = current_user.agente_id
+    elif not agente_id and not current_user.is_admin:
+        agente_id = agente_del_usuario(current_user)
     
-    filters = {
+    return {
         "tipo_propiedad": tipo_propiedad,
         "tipo_operacion": tipo_operacion,
         "precio_min": precio_min,
@@ -112,53 +170,318 @@ def read_propiedades(
         "propietario_id": propietario_id,
         "agente_id": agente_id
     }
+
+
+@router.get("/", response_model=List[PropiedadOut])
+@presupuesto_sql(1)
+async def read_propiedades(
+    skip: int = 0,
+    limit: int = 100,
+    filters: Dict[str, Any] = Depends(filtros_busqueda),
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Obtener todas las propiedades con filtros opcionales.
+    
+    Si el usuario no está autenticado, solo puede ver propiedades publicadas.
+    Con `fields`/`include` se devuelven sólo los campos pedidos.
+    El total de resultados se informa en el encabezado `X-Total-Count`.
+    """
+    contenido, total = await buscar_propiedades_json(db, skip=skip, limit=limit, filters=filters, campos=campos)
+    response = respuesta_json(contenido)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    return response
+
+
+# Declarada antes de /{propiedad_id} para que "export" no se tome como un ID
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {tipo: {} for tipo in FORMATOS_EXPORTACION.values()}}}
+)
+@presupuesto_sql(1)
+async def export_propiedades(
+    request: Request,
+    formato: Literal["ndjson", "csv"] = Query("ndjson", description="Formato de salida: ndjson o csv"),
+    filters: Dict[str, Any] = Depends(filtros_busqueda),
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad)
+):
+    """
+    Exportar el catálogo completo de propiedades que cumplen los filtros.
     
-    propiedades = get_propiedades_by_filters(db, skip=skip, limit=limit, filters=filters)
-    return propiedades
+    La respuesta se transmite a medida que se lee la base (cursor del lado del
+    servidor), sin paginar ni cargar todas las filas en memoria.
+    """
+    async def contenido():
+        # La sesión se abre acá: las de las dependencias se cierran antes de transmitir
+        async with sesion_lectura(request) as db:
+            async for bloque in exportar_propiedades(db, filters=filters, formato=formato, campos=campos):
+                yield bloque
+
+    return StreamingResponse(
+        contenido(),
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="propiedades.{formato}"'}
+    )
+
+
+def verificar_permiso_importacion(current_user: User) -> None:
+    if not (current_user.is_admin or current_user.is_agente):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para importar propiedades"
+        )
+
+
+async def importacion_del_usuario(db: AsyncSession, importacion_id: int, current_user: User):
+    """
+    La importación, si el usuario puede verla: un administrador, todas; un
+    agente, sólo las que creó (su agente_id queda en la importación).
+    """
+    verificar_permiso_importacion(current_user)
+    importacion = await get_importacion(db, importacion_id)
+    if not importacion:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    if not current_user.is_admin:
+        agente_usuario = agente_del_usuario(current_user)
+        if agente_usuario is None or importacion.agente_id != agente_usuario:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permisos para ver esta importación"
+            )
+    return importacion
+
+
+@router.post("/importaciones", response_model=ImportacionOut, status_code=status.HTTP_202_ACCEPTED)
+@presupuesto_sql(1)
+async def importar_propiedades(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(..., description="Archivo CSV o NDJSON con una propiedad por fila"),
+    formato: Optional[Literal["csv", "ndjson"]] = Form(None, description="Formato; por defecto se deduce de la extensión"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Importar propiedades en forma masiva.
+    
+    Cada fila se valida con el mismo esquema que la creación individual y puede
+    traer la dirección anidada (`direccion.calle`, ... en CSV). La importación se
+    procesa en segundo plano por lotes; las filas con error se registran sin
+    cortar el resto y su estado se consulta en /importaciones/{id}.
+    """
+    verificar_permiso_importacion(current_user)
+    
+    formato = formato or formato_de_archivo(archivo.filename)
+    if formato is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no soportado. Use un archivo .csv o .ndjson"
+        )
+    
+    ruta = await run_in_threadpool(guardar_archivo, archivo)
+    importacion = await crear_importacion(
+        db,
+        archivo=ruta,
+        formato=formato,
+        nombre_original=archivo.filename,
+        agente_id=current_user.agente_id if current_user.is_agente else None
+    )
+    background_tasks.add_task(procesar_importacion, importacion.id)
+    return importacion
+
+
+@router.get("/importaciones/{importacion_id}", response_model=ImportacionOut)
+@presupuesto_sql(1)
+async def read_importacion(
+    importacion_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Estado y avance de una importación.
+    """
+    return await importacion_del_usuario(db, importacion_id, current_user)
+
+
+@router.get("/importaciones/{importacion_id}/errores", response_model=List[ImportacionErrorOut])
+@presupuesto_sql(2)
+async def read_errores_importacion(
+    importacion_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Filas rechazadas de una importación, con el motivo de cada una.
+    """
+    await importacion_del_usuario(db, importacion_id, current_user)
+    return await get_errores_importacion(db, importacion_id, skip=skip, limit=limit)
+
+
+@router.post("/importaciones/{importacion_id}/reanudar", response_model=ImportacionOut, status_code=status.HTTP_202_ACCEPTED)
+@presupuesto_sql(1)
+async def reanudar_importacion(
+    importacion_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reanudar una importación interrumpida o fallida desde la última fila procesada.
+    """
+    importacion = await importacion_del_usuario(db, importacion_id, current_user)
+    background_tasks.add_task(procesar_importacion, importacion.id)
+    return importacion
+
+
+# Declarado antes de /{propiedad_id} para que "changes" no se tome como un ID
+@router.get("/changes", response_model=CambiosPropiedadesOut)
+@presupuesto_sql(3)
+async def get_cambios_propiedades(
+    since: Optional[str] = Query(None, description="Cursor de la respuesta anterior; vacío para empezar desde el principio"),
+    limit: int = Query(500, ge=1, le=5000, description="Entradas del registro a leer"),
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[User] = Depends(get_current_user_opcional)
+):
+    """
+    Sincronización incremental del catálogo.
+    
+    Devuelve el último estado de cada propiedad que cambió después del cursor
+    `since` ("upsert") o una lápida ("delete"), en orden, y el cursor para la
+    próxima llamada. Se repite mientras `mas` sea true.
+    
+    Para usuarios que no son administradores ni agentes, una propiedad que
+    deja de estar publicada llega como "delete". Si el cursor es anterior a la
+    última compactación del registro se responde 410: hay que descargar todo
+    de nuevo, empezando sin `since`.
+    """
+    desde = leer_cursor(since)
+    if desde is None:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if await cursor_vencido(db, desde):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="El cursor es anterior a la última compactación. Vuelva a sincronizar sin since"
+        )
+    
+    solo_publicadas = not (current_user and (current_user.is_admin or current_user.is_agente))
+    return respuesta_json(await get_cambios_json(db, desde, limit=limit, campos=campos, solo_publicadas=solo_publicadas))
+
+
+async def detalle_cacheado(db: AsyncSession, propiedad_id: int) -> Optional[bytes]:
+    """Detalle completo de la propiedad desde la caché de entidades (None si no existe)."""
+    async def cargar(primario: bool) -> Optional[bytes]:
+        async with sesion_de_carga(db, primario) as sesion:
+            return await get_propiedad_detalle(sesion, propiedad_id=propiedad_id)
+
+    return await cache_propiedades.obtener(propiedad_id, cargar)
 
 
 @router.get("/{propiedad_id}", response_model=PropiedadOut)
-def read_propiedad(
+@presupuesto_sql(1)
+async def read_propiedad(
     propiedad_id: int,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user)
+    request: Request,
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[User] = Depends(get_current_user_opcional)
 ):
     """
     Obtener una propiedad específica por su ID.
     
     Si el usuario no está autenticado, solo puede ver propiedades publicadas.
+    Con `fields`/`include` se devuelven sólo los campos pedidos.
+    
+    Admite `If-None-Match`: si la propiedad (y sus objetos anidados) no cambió
+    se responde 304 sin cuerpo. No se envía Last-Modified (ver
+    PROPIEDAD_VALIDACION).
     """
-    propiedad = get_propiedad(db, propiedad_id=propiedad_id)
-    if not propiedad:
+    # Sólo la representación completa pasa por la caché de entidades (que ya
+    # coalesce las cargas concurrentes); con fields/include se coalesce acá.
+    # La carga no depende del usuario: el acceso se verifica en cada request.
+    if campos is None:
+        valor = await detalle_cacheado(db, propiedad_id)
+    else:
+        valor = await vuelos_detalle.ejecutar(
+            (propiedad_id, campos), lambda: get_propiedad_detalle(db, propiedad_id=propiedad_id, campos=campos)
+        )
+    if valor is None:
         raise HTTPException(status_code=404, detail="Propiedad no encontrada")
     
-    # Verificar permisos
-    if propiedad.estado != "PUBLICADA":
-        if not current_user:
-            raise HTTPException(status_code=403, detail="No tienes permisos para ver esta propiedad")
-        
-        # Admin puede ver todo
-        if current_user.is_admin:
-            return propiedad
-            
-        # Agente puede ver sus propias propiedades o propiedades publicadas
-        if current_user.is_agente and propiedad.agente_id == current_user.agente_id:
-            return propiedad
-            
-        # Propietario puede ver sus propias propiedades
-        if propiedad.propietario_id == current_user.id:
-            return propiedad
-            
+    meta, cuerpo = desempaquetar(valor)
+    verificar_acceso(meta["estado"], meta["agente_id"], meta["propietario_id"], current_user)
+    acumulador_contadores.registrar_vista(propiedad_id)
+    
+    validador = Validador(etag_de(*meta["versiones"], campos=campos))
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    
+    return validador.aplicar(respuesta_json(cuerpo))
+
+
+@router.post("/{propiedad_id}/contactos", status_code=status.HTTP_204_NO_CONTENT)
+@presupuesto_sql(1)
+async def registrar_contacto(
+    propiedad_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[User] = Depends(get_current_user_opcional)
+):
+    """
+    Registrar un clic de contacto (teléfono, WhatsApp, formulario) en una propiedad.
+    
+    Sólo para propiedades que existen y el usuario puede ver: se validan con la
+    caché de entidades (la base se consulta sólo en un miss), así IDs
+    inventados no llenan los contadores. Se acumula en memoria y se escribe en
+    lote.
+    """
+    valor = await detalle_cacheado(db, propiedad_id)
+    if valor is None:
+        raise HTTPException(status_code=404, detail="Propiedad no encontrada")
+    meta, _ = desempaquetar(valor)
+    verificar_acceso(meta["estado"], meta["agente_id"], meta["propietario_id"], current_user)
+    acumulador_contadores.registrar_contacto(propiedad_id)
+    return None
+
+
+def verificar_acceso(estado, agente_id: Optional[int], propietario_id: Optional[int], current_user: Optional[User]) -> None:
+    """
+    Verificar que el usuario pueda ver una propiedad no publicada.
+    """
+    if estado == ESTADO_PUBLICADA:
+        return
+    
+    if not current_user:
         raise HTTPException(status_code=403, detail="No tienes permisos para ver esta propiedad")
     
-    return propiedad
+    # Admin puede ver todo
+    if current_user.is_admin:
+        return
+        
+    # Agente puede ver sus propias propiedades o propiedades publicadas
+    agente_usuario = agente_del_usuario(current_user)
+    if agente_usuario is not None and agente_id == agente_usuario:
+        return
+        
+    # Propietario puede ver sus propias propiedades
+    cliente_usuario = cliente_del_usuario(current_user)
+    if cliente_usuario is not None and propietario_id == cliente_usuario:
+        return
+        
+    raise HTTPException(status_code=403, detail="No tienes permisos para ver esta propiedad")
 
 
 @router.put("/{propiedad_id}", response_model=PropiedadOut)
-def update_propiedad_endpoint(
+@presupuesto_sql(1)
+async def update_propiedad_endpoint(
     propiedad_id: int,
     propiedad: PropiedadBase,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag obtenido al leer la propiedad"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -166,17 +489,11 @@ def update_propiedad_endpoint(
     
     Requiere autenticación. Solo el agente asignado, el propietario o un administrador 
     pueden actualizar la propiedad.
-    """
-    db_propiedad = get_propiedad(db, propiedad_id=propiedad_id)
-    if not db_propiedad:
-        raise HTTPException(status_code=404, detail="Propiedad no encontrada")
     
-    # Verificar permisos
-    if not current_user.is_admin:
-        if current_user.is_agente and db_propiedad.agente_id != current_user.agente_id:
-            raise HTTPException(status_code=403, detail="No tienes permisos para actualizar esta propiedad")
-        elif not current_user.is_agente and db_propiedad.propietario_id != current_user.id:
-            raise HTTPException(status_code=403, detail="No tienes permisos para actualizar esta propiedad")
+    Con `If-Match` la actualización solo se aplica si la propiedad no cambió desde
+    que se leyó; si cambió se responde 412 con el ETag actual.
+    """
+    version = version_esperada(if_match)
     
     # Validar precios según tipo de operación
     if propiedad.tipo_operacion == "Venta" and not propiedad.precio_venta:
@@ -197,13 +514,44 @@ def update_propiedad_endpoint(
             detail="Los precios de venta y alquiler son obligatorios para propiedades en venta/alquiler"
         )
     
-    return update_propiedad(db=db, propiedad_id=propiedad_id, propiedad=propiedad)
+    # Los permisos se verifican en el mismo UPDATE; un usuario sin agente ni
+    # cliente asociado no puede modificar ninguna (NULL no es "su" propiedad)
+    condiciones = []
+    if not current_user.is_admin:
+        if current_user.is_agente:
+            propio, columna = agente_del_usuario(current_user), Propiedad.agente_id
+        else:
+            propio, columna = cliente_del_usuario(current_user), Propiedad.propietario_id
+        if propio is None:
+            raise HTTPException(status_code=403, detail="No tienes permisos para actualizar esta propiedad")
+        condiciones.append(columna == propio)
+    
+    try:
+        db_propiedad = await update_propiedad(
+            db=db,
+            propiedad_id=propiedad_id,
+            propiedad=propiedad,
+            version=version,
+            condiciones=condiciones
+        )
+    except ConflictoVersion as e:
+        if version is None or e.version_actual == version:
+            raise HTTPException(status_code=403, detail="No tienes permisos para actualizar esta propiedad")
+        raise_precondicion_fallida(e.version_actual)
+    
+    if not db_propiedad:
+        raise HTTPException(status_code=404, detail="Propiedad no encontrada")
+    
+    # Mismo ETag compuesto que GET /{propiedad_id}: sirve para If-None-Match e If-Match
+    response.headers["ETag"] = etag_de(*versiones_propiedad(db_propiedad))
+    return db_propiedad
 
 
 @router.delete("/{propiedad_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_propiedad_endpoint(
+@presupuesto_sql(4)
+async def delete_propiedad_endpoint(
     propiedad_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -217,19 +565,20 @@ def delete_propiedad_endpoint(
             detail="Solo los administradores pueden eliminar propiedades"
         )
     
-    db_propiedad = get_propiedad(db, propiedad_id=propiedad_id)
+    db_propiedad = await get_propiedad(db, propiedad_id=propiedad_id)
     if not db_propiedad:
         raise HTTPException(status_code=404, detail="Propiedad no encontrada")
     
-    delete_propiedad(db=db, propiedad_id=propiedad_id)
+    await delete_propiedad(db=db, propiedad_id=propiedad_id)
     return None
 
 
 @router.patch("/{propiedad_id}/estado", response_model=PropiedadOut)
-def update_estado_propiedad(
+@presupuesto_sql(2)
+async def update_estado_propiedad(
     propiedad_id: int,
-    estado: str,
-    db: Session = Depends(get_db),
+    estado: EstadoEnum,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -243,64 +592,168 @@ def update_estado_propiedad(
             detail="No tienes permisos para actualizar el estado de propiedades"
         )
     
-    db_propiedad = get_propiedad(db, propiedad_id=propiedad_id)
+    db_propiedad = await get_propiedad(db, propiedad_id=propiedad_id)
     if not db_propiedad:
         raise HTTPException(status_code=404, detail="Propiedad no encontrada")
     
     # Si es agente, verificar que sea el asignado a la propiedad
     if current_user.is_agente and not current_user.is_admin:
-        if db_propiedad.agente_id != current_user.agente_id:
+        agente_usuario = agente_del_usuario(current_user)
+        if agente_usuario is None or db_propiedad.agente_id != agente_usuario:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Solo puedes actualizar el estado de tus propiedades asignadas"
             )
     
-    # Validar que el estado sea válido
-    valid_estados = ["BORRADOR", "REVISION", "PUBLICADA", "PAUSADA", "VENDIDA", "ALQUILADA", "CANCELADA"]
-    if estado not in valid_estados:
+    # Actualizar solo el estado
+    return await update_propiedad(db=db, propiedad_id=propiedad_id, propiedad={"estado": estado})
+
+
+@router.patch("/masivo", response_model=CambioMasivoResultado)
+@presupuesto_sql(2)
+async def update_propiedades_masivo(
+    cambio: PropiedadesCambioMasivo,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Cambiar el estado y/o reasignar el agente de muchas propiedades a la vez.
+    
+    Las propiedades se eligen por `ids` o por `filtros` (los mismos de la búsqueda).
+    Requiere autenticación con los mismos permisos que el cambio de estado
+    individual: un agente solo modifica sus propiedades asignadas; las demás se
+    informan como omitidas.
+    """
+    if not (current_user.is_admin or current_user.is_agente):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Estado inválido. Estados válidos: {', '.join(valid_estados)}"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para actualizar el estado de propiedades"
         )
     
-    # Actualizar solo el estado
-    return update_propiedad(db=db, propiedad_id=propiedad_id, propiedad={"estado": estado})
+    # Un agente sin agente asociado no tiene propiedades asignadas (y sin
+    # solo_agente_id el cambio alcanzaría a todas)
+    solo_agente_id = None
+    if not current_user.is_admin:
+        solo_agente_id = agente_del_usuario(current_user)
+        if solo_agente_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permisos para actualizar el estado de propiedades"
+            )
+    
+    valores = cambio.model_dump(include={"estado", "agente_id"}, exclude_unset=True)
+    if valores.get("agente_id") is not None and not await db.get(Agente, valores["agente_id"]):
+        raise HTTPException(status_code=400, detail="Agente no encontrado")
+    
+    actualizadas, fecha = await actualizar_propiedades_masivo(
+        db,
+        valores=valores,
+        ids=cambio.ids,
+        filters=cambio.filtros.model_dump(exclude_none=True) if cambio.filtros else None,
+        solo_agente_id=solo_agente_id
+    )
+    
+    omitidas = sorted(set(cambio.ids) - set(actualizadas)) if cambio.ids is not None else []
+    return CambioMasivoResultado(actualizadas=sorted(actualizadas), omitidas=omitidas, fecha_modificacion=fecha)
 
 
 @router.get("/destacadas/", response_model=List[PropiedadOut])
-def get_propiedades_destacadas(
-    limit: int = 6,
-    db: Session = Depends(get_db)
+@presupuesto_sql(3)
+async def get_propiedades_destacadas(
+    limit: int = Query(6, ge=1, le=DESTACADAS_TAMANIO),
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtener propiedades destacadas para mostrar en la página principal.
     
-    Devuelve propiedades publicadas, ordenadas por fecha de creación (más recientes primero).
+    Devuelve propiedades publicadas ordenadas por el ranking del feed de
+    destacadas (antigüedad, vistas, fotos y precio completo). La respuesta
+    completa sale ya serializada de memoria; con `fields`/`include` se leen
+    sólo esas filas.
     """
-    filters = {
-        "estado": "PUBLICADA"
-    }
+    # Sólo el primer request del worker, si la tarea de fondo no cargó el feed
+    await feed_destacadas.asegurar(db)
+    if campos is None:
+        return respuesta_json(feed_destacadas.cuerpo(limit))
+    
+    # Público: requests con los mismos parámetros comparten consulta y serialización
+    ids = feed_destacadas.ids(limit)
+    return respuesta_json(await vuelos_destacadas.ejecutar((tuple(ids), campos), lambda: get_propiedades_json_por_ids(
+        db, ids, campos
+    )))
+
+
+@router.get("/estadisticas/mas-vistas", response_model=List[PropiedadPopularidad])
+@presupuesto_sql(1)
+async def get_propiedades_mas_vistas(
+    dias: int = Query(7, ge=1, le=365, description="Período en días, contando hoy"),
+    limit: int = Query(10, ge=1, le=100),
+    agente_id: Optional[int] = Query(None, description="Sólo las propiedades de este agente"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Propiedades más vistas del período, con sus vistas y clics de contacto.
     
-    propiedades = get_propiedades_by_filters(
-        db, 
-        skip=0, 
-        limit=limit, 
-        filters=filters,
-        order_by="fecha_creacion",
-        order_desc=True
-    )
+    Solo disponible para administradores y agentes.
+    """
+    verificar_permiso_estadisticas(current_user)
+    desde = datetime.utcnow() - timedelta(days=dias - 1)
+    return await get_mas_vistas(db, desde, limit=limit, agente_id=agente_id)
+
+
+@router.get("/estadisticas/agente/{agente_id}", response_model=EstadisticasAgente)
+@presupuesto_sql(2)
+async def get_estadisticas_agente(
+    agente_id: int,
+    dias: int = Query(30, ge=1, le=365, description="Período en días, contando hoy"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Vistas y clics de contacto de las propiedades de un agente: totales, serie
+    por día y sus propiedades más vistas.
     
-    return propiedades
+    Un agente solo puede ver sus propias estadísticas; un administrador, las de todos.
+    """
+    verificar_permiso_estadisticas(current_user)
+    if not current_user.is_admin and current_user.agente_id != agente_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver las estadísticas de este agente"
+        )
+    
+    desde = inicio_dia(datetime.utcnow() - timedelta(days=dias - 1))
+    por_dia = await get_serie_agente(db, agente_id, desde)
+    return EstadisticasAgente(
+        agente_id=agente_id,
+        desde=desde,
+        vistas=sum(dia.vistas for dia in por_dia),
+        contactos=sum(dia.contactos for dia in por_dia),
+        por_dia=por_dia,
+        mas_vistas=await get_mas_vistas(db, desde, limit=10, agente_id=agente_id)
+    )
+
+
+def verificar_permiso_estadisticas(current_user: User) -> None:
+    if not (current_user.is_admin or current_user.is_agente):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver estadísticas de propiedades"
+        )
 
 
 @router.get("/por-agente/{agente_id}", response_model=List[PropiedadOut])
-def get_propiedades_por_agente(
+@presupuesto_sql(1)
+async def get_propiedades_por_agente(
     agente_id: int,
     estado: Optional[str] = Query(None, description="Estado de la propiedad"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user)
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[User] = Depends(get_current_user_opcional)
 ):
     """
     Obtener propiedades asignadas a un agente específico.
@@ -309,24 +762,25 @@ def get_propiedades_por_agente(
     """
     # Para usuarios no autenticados o clientes regulares, mostrar solo propiedades publicadas
     if not current_user or (not current_user.is_admin and not current_user.is_agente):
-        estado = "PUBLICADA"
+        estado = ESTADO_PUBLICADA
     
     filters = {
         "agente_id": agente_id,
         "estado": estado
     }
     
-    propiedades = get_propiedades_by_filters(db, skip=skip, limit=limit, filters=filters)
-    return propiedades
+    return respuesta_json(await get_propiedades_by_filters_json(db, skip=skip, limit=limit, filters=filters, campos=campos))
 
 
 @router.get("/por-propietario/{propietario_id}", response_model=List[PropiedadOut])
-def get_propiedades_por_propietario(
+@presupuesto_sql(2)
+async def get_propiedades_por_propietario(
     propietario_id: int,
     estado: Optional[str] = Query(None, description="Estado de la propiedad"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    campos: Optional[FrozenSet[str]] = Depends(campos_propiedad),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -337,16 +791,17 @@ def get_propiedades_por_propietario(
     """
     # Verificar permisos
     if not current_user.is_admin:
-        if current_user.id != propietario_id:
+        if current_user.cliente_id != propietario_id:
             # Si es agente, verificar si tiene acceso a las propiedades de este propietario
-            if current_user.is_agente:
+            if agente_del_usuario(current_user) is not None:
                 # Verificar si tiene alguna propiedad asignada de este propietario
-                propiedad = db.query(Propiedad).filter(
+                result = await db.execute(select(Propiedad.id).filter(
                     and_(
                         Propiedad.propietario_id == propietario_id,
                         Propiedad.agente_id == current_user.agente_id
                     )
-                ).first()
+                ).limit(1))
+                propiedad = result.first()
                 
                 if not propiedad:
                     raise HTTPException(
@@ -364,5 +819,78 @@ def get_propiedades_por_propietario(
         "estado": estado
     }
     
-    propiedades = get_propiedades_by_filters(db, skip=skip, limit=limit, filters=filters)
-    return propiedades
\ No newline at end of file
+    return respuesta_json(await get_propiedades_by_filters_json(db, skip=skip, limit=limit, filters=filters, campos=campos))
+
+
+def cursor_last_event_id(last_event_id: Optional[str]) -> Optional[Cursor]:
+    """Cursor desde el que retoma un stream de novedades (None si es nuevo)."""
+    if not last_event_id:
+        return None
+    desde = leer_cursor(last_event_id)
+    if desde is None:
+        raise HTTPException(status_code=400, detail="Last-Event-ID inválido")
+    return desde
+
+
+def stream_novedades(eventos) -> StreamingResponse:
+    return StreamingResponse(
+        eventos,
+        media_type="text/event-stream",
+        # Sin caché ni buffering de proxies: cada evento se envía apenas se genera
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/por-agente/{agente_id}/novedades", response_class=StreamingResponse)
+@presupuesto_sql(4)
+@flujo_continuo
+async def stream_novedades_agente(
+    agente_id: int,
+    last_event_id: Optional[str] = Header(None),
+    current_user: Optional[User] = Depends(get_current_user_opcional)
+):
+    """
+    Novedades en vivo (Server-Sent Events) de las propiedades de un agente,
+    para su panel: altas, cambios de estado, ediciones, imágenes y bajas.
+    
+    Cada evento trae `op` ("upsert" con la propiedad completa, o "delete" si
+    se borró o se asignó a otro agente) y `motivos`. Al conectarse llega un
+    evento "inicio"; conviene cargar la lista con /por-agente/{agente_id}
+    después de recibirlo. Al reconectarse con `Last-Event-ID` se reciben los
+    cambios perdidos; si ya no se pueden reconstruir llega "resync" y hay que
+    recargar la lista.
+    
+    Sólo el propio agente o un administrador.
+    """
+    if not current_user or not (
+        current_user.is_admin or (current_user.is_agente and current_user.agente_id == agente_id)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver las novedades de este agente"
+        )
+    desde = cursor_last_event_id(last_event_id)
+    return stream_novedades(difusion_novedades.eventos((AGENTE, agente_id), desde))
+
+
+@router.get("/por-propietario/{propietario_id}/novedades", response_class=StreamingResponse)
+@presupuesto_sql(4)
+@flujo_continuo
+async def stream_novedades_propietario(
+    propietario_id: int,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Novedades en vivo (Server-Sent Events) de las propiedades de un propietario.
+    
+    Mismo formato que /por-agente/{agente_id}/novedades. Sólo el propietario
+    o un administrador.
+    """
+    if not current_user or not (current_user.is_admin or current_user.cliente_id == propietario_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver las novedades de este propietario"
+        )
+    desde = cursor_last_event_id(last_event_id)
+    return stream_novedades(difusion_novedades.eventos((PROPIETARIO, propietario_id), desde))
@@ -0,0 +1,40 @@
+"""
+Compactación del registro de cambios de propiedades (GET /propiedades/changes).
+
+Pensado para correr periódicamente (cron), desde un solo proceso:
+
+    python -m app.compactar_cambios
+    python -m app.compactar_cambios --horas 6 --dias 60
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from app.core.config import CAMBIOS_COMPACTAR_HORAS, CAMBIOS_RETENCION_DIAS
+from app.core.database import AsyncSessionLocal
+from app.crud.cambios_crud import compactar_cambios
+
+
+async def compactar(args) -> int:
+    ahora = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        reemplazadas, lapidas = await compactar_cambios(
+            db,
+            compactar_antes=ahora - timedelta(hours=args.horas),
+            lapidas_antes=ahora - timedelta(days=args.dias)
+        )
+    print(f"{reemplazadas} entradas reemplazadas y {lapidas} lápidas borradas")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta el registro de cambios de propiedades")
+    parser.add_argument("--horas", type=int, default=CAMBIOS_COMPACTAR_HORAS, help="Antigüedad mínima de las entradas reemplazadas a borrar")
+    parser.add_argument("--dias", type=int, default=CAMBIOS_RETENCION_DIAS, help="Días que se conservan las lápidas")
+    args = parser.parse_args()
+
+    raise SystemExit(asyncio.run(compactar(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Caché de resultados de búsqueda de propiedades.
+
+Las mismas búsquedas ("departamentos en alquiler, 2 dormitorios") se repiten
+miles de veces por hora. La parte cara es filtrar, ordenar y paginar; leer
+después 20 filas por PK es barato. Por eso se guarda sólo la lista de IDs de
+la página (y el total de resultados), con clave en los filtros normalizados,
+el orden y la página, y los datos se vuelven a leer siempre de la base.
+
+- Desalojo LRU, con TTL y tope de memoria estimada.
+- Invalidación selectiva: una escritura sólo descarta las entradas cuyo filtro
+  podría haber coincidido con los valores viejos o nuevos de la propiedad (ver
+  invalidar). El resto sigue siendo válido porque guarda IDs, no datos.
+- Época: cada invalidación la incrementa. Un miss la toma antes de consultar
+  y la pasa a guardar; si mientras tanto hubo una invalidación, la lista de
+  IDs puede ser anterior a la escritura y no se guarda.
+
+La caché es por worker: las escrituras hechas por otros workers llegan por el
+bus de invalidación (app.core.invalidacion) con las columnas de filtro viejas y
+nuevas de la fila, y se aplican con la misma invalidación selectiva. Un evento
+masivo (muchas filas en una sentencia o en una pasada del bus) vacía la caché
+en vez de evaluar cada fila contra cada entrada.
+"""
+import enum
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.core import metrics
+from app.core.invalidacion import Evento, bus_invalidacion
+from app.core.config import (
+    BUSQUEDAS_CACHE_MAX_ENTRADAS,
+    BUSQUEDAS_CACHE_TTL_SECONDS,
+    BUSQUEDAS_CACHE_MAX_BYTES,
+)
+
+# Columnas de propiedades que lee cada filtro de aplicar_filtros
+COLUMNAS_FILTRO = {
+    "tipo_propiedad": {"tipo_propiedad"},
+    "tipo_operacion": {"tipo_operacion", "precio_venta", "precio_alquiler"},
+    "precio_min": {"precio_venta", "precio_alquiler"},
+    "precio_max": {"precio_venta", "precio_alquiler"},
+    "dormitorios": {"dormitorios"},
+    "banios": {"banios"},
+    "superficie_min": {"superficie_cubierta", "superficie_descubierta"},
+    "estado": {"estado"},
+    "propietario_id": {"propietario_id"},
+    "agente_id": {"agente_id"},
+}
+IGUALDAD = ("tipo_propiedad", "tipo_operacion", "estado", "propietario_id", "agente_id")
+MINIMOS = ("dormitorios", "banios")
+
+CACHE_CONSULTAS = metrics.Contador(
+    "busquedas_cache_requests_total", "Búsquedas resueltas desde la caché (hit) o la base (miss).", ("resultado",)
+)
+CACHE_DESALOJOS = metrics.Contador(
+    "busquedas_cache_evictions_total", "Entradas descartadas de la caché de búsquedas por motivo.", ("motivo",)
+)
+
+
+def _valor(valor: Any) -> Any:
+    return valor.name if isinstance(valor, enum.Enum) else valor
+
+
+def _equivalentes(valor: Any) -> set:
+    """Formas con las que puede aparecer un valor de enum: miembro, nombre o valor."""
+    if isinstance(valor, enum.Enum):
+        return {str(valor.name).lower(), str(valor.value).lower()}
+    if isinstance(valor, str):
+        return {valor.lower()}
+    return {valor}
+
+
+def _igual(filtro: Any, actual: Any) -> bool:
+    return actual is not None and bool(_equivalentes(filtro) & _equivalentes(actual))
+
+
+def coincide(filtros: Dict[str, Any], fila: Optional[Dict[str, Any]]) -> bool:
+    """
+    Si una propiedad (dict de columnas) cumple los filtros, con la misma
+    semántica que aplicar_filtros. Ante la duda responde True: una
+    invalidación de más sólo cuesta un miss.
+    """
+    if fila is None:
+        return False
+    for clave in IGUALDAD:
+        if clave in filtros and not _igual(filtros[clave], fila.get(clave)):
+            return False
+    for clave in MINIMOS:
+        if clave in filtros and (fila.get(clave) is None or fila[clave] < filtros[clave]):
+            return False
+    if "superficie_min" in filtros:
+        superficie = (fila.get("superficie_cubierta") or 0) + (fila.get("superficie_descubierta") or 0)
+        if superficie < filtros["superficie_min"]:
+            return False
+
+    precio_min, precio_max = filtros.get("precio_min"), filtros.get("precio_max")
+    if precio_min or precio_max:
+        operacion = filtros.get("tipo_operacion")
+        if not operacion or _igual(operacion, "venta"):
+            columnas = ("precio_venta",)
+        elif _igual(operacion, "alquiler"):
+            columnas = ("precio_alquiler",)
+        else:
+            columnas = ("precio_venta", "precio_alquiler")
+        if precio_min and not any(fila.get(c) is not None and fila[c] >= precio_min for c in columnas):
+            return False
+        if precio_max and not any(fila.get(c) is not None and fila[c] <= precio_max for c in columnas):
+            return False
+    return True
+
+
+class Clave(NamedTuple):
+    filtros: Tuple[Tuple[str, Any], ...]
+    order_by: str
+    order_desc: bool
+    skip: int
+    limit: int
+
+
+class Entrada(NamedTuple):
+    ids: Tuple[int, ...]
+    total: Optional[int]
+    vence: float
+    bytes: int
+    filtros: Dict[str, Any]
+    columnas: FrozenSet[str]
+
+
+class CacheBusquedas:
+    def __init__(self, max_entradas: int, ttl: float, max_bytes: int):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entradas: "OrderedDict[Clave, Entrada]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Cambia con cada invalidación (ver guardar)
+        self.epoca = 0
+        self.descartados = 0
+        self.desalojos: Dict[str, int] = {"lru": 0, "ttl": 0, "memoria": 0, "invalidacion": 0}
+
+    @property
+    def habilitada(self) -> bool:
+        return self.max_entradas > 0 and self.ttl > 0
+
+    @staticmethod
+    def clave(filters: Optional[Dict[str, Any]], order_by: str, order_desc: bool, skip: int, limit: int) -> Clave:
+        """
+        Clave normalizada: los filtros vacíos se descartan (aplicar_filtros los
+        ignora) y los enums se reemplazan por su nombre, así búsquedas
+        equivalentes comparten la entrada.
+        """
+        filtros = tuple(sorted((k, _valor(v)) for k, v in (filters or {}).items() if v))
+        return Clave(filtros, order_by, order_desc, skip, limit)
+
+    def obtener(self, clave: Clave) -> Optional[Entrada]:
+        if not self.habilitada:
+            return None
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada.vence <= time.monotonic():
+            self._quitar(clave, "ttl")
+            entrada = None
+        if entrada is None:
+            self.misses += 1
+            CACHE_CONSULTAS.inc("miss")
+            return None
+        self._entradas.move_to_end(clave)
+        self.hits += 1
+        CACHE_CONSULTAS.inc("hit")
+        return entrada
+
+    def guardar(self, clave: Clave, ids: List[int], total: Optional[int], epoca: int) -> None:
+        """
+        Guardar el resultado de un miss. `epoca` es la de la caché antes de
+        consultar la base: si cambió, una escritura pudo confirmarse durante
+        la consulta y el resultado se descarta.
+        """
+        if not self.habilitada:
+            return
+        if epoca != self.epoca:
+            self.descartados += 1
+            return
+        ids = tuple(ids)
+        tamanio = sys.getsizeof(ids) + 32 * len(ids) + sys.getsizeof(clave.filtros) + 200
+        filtros = dict(clave.filtros)
+        columnas = frozenset(
+            {clave.order_by}.union(*(COLUMNAS_FILTRO.get(k, set()) for k in filtros))
+        )
+        if clave in self._entradas:
+            self._quitar(clave, None)
+        self._entradas[clave] = Entrada(ids, total, time.monotonic() + self.ttl, tamanio, filtros, columnas)
+        self._bytes += tamanio
+
+        while len(self._entradas) > self.max_entradas:
+            self._quitar(next(iter(self._entradas)), "lru")
+        while self._bytes > self.max_bytes and self._entradas:
+            self._quitar(next(iter(self._entradas)), "memoria")
+
+    def descartar(self, clave: Clave) -> None:
+        """Descartar una entrada que resultó desactualizada (p. ej. al releer sus filas)."""
+        self.epoca += 1
+        if clave in self._entradas:
+            self._quitar(clave, "invalidacion")
+
+    def _quitar(self, clave: Clave, motivo: Optional[str]) -> None:
+        entrada = self._entradas.pop(clave)
+        self._bytes -= entrada.bytes
+        if motivo:
+            self.desalojos[motivo] += 1
+            CACHE_DESALOJOS.inc(motivo)
+
+    def invalidar(
+        self,
+        viejo: Optional[Dict[str, Any]] = None,
+        nuevo: Optional[Dict[str, Any]] = None,
+        cambiadas: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        Descartar las entradas a las que puede afectar una escritura.
+
+        - Alta: `nuevo`; baja: `viejo`. Se descartan las entradas cuyo filtro
+          cumple la fila.
+        - Modificación: `cambiadas` con las columnas escritas. Si ninguna es
+          leída por el filtro ni es la columna de orden, la página no cambia.
+          Si lo es, se descarta salvo que se conozcan `viejo` y `nuevo` y
+          ninguno de los dos cumpla el filtro.
+
+        Returns:
+            Cantidad de entradas descartadas
+        """
+        # Los misses en curso pueden no haber visto esta escritura
+        self.epoca += 1
+        cambiadas = set(cambiadas) if cambiadas is not None else None
+        afectadas = []
+        for clave, entrada in self._entradas.items():
+            if cambiadas is None:
+                afectada = coincide(entrada.filtros, viejo) or coincide(entrada.filtros, nuevo)
+            elif not entrada.columnas & cambiadas:
+                afectada = False
+            elif viejo is not None and nuevo is not None:
+                afectada = coincide(entrada.filtros, viejo) or coincide(entrada.filtros, nuevo)
+            else:
+                afectada = True
+            if afectada:
+                afectadas.append(clave)
+        for clave in afectadas:
+            self._quitar(clave, "invalidacion")
+        return len(afectadas)
+
+    def limpiar(self) -> None:
+        """Descartar todo (p. ej. después de una importación masiva)."""
+        self.epoca += 1
+        self.desalojos["invalidacion"] += len(self._entradas)
+        CACHE_DESALOJOS.inc("invalidacion", cantidad=len(self._entradas))
+        self._entradas.clear()
+        self._bytes = 0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        consultas = self.hits + self.misses
+        return {
+            "habilitada": self.habilitada,
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "max_entradas": self.max_entradas,
+            "max_bytes": self.max_bytes,
+            "ttl_segundos": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else None,
+            "guardados_descartados": self.descartados,
+            "desalojos": dict(self.desalojos),
+        }
+
+    def metricas(self) -> List[str]:
+        return [
+            "# HELP busquedas_cache_entries Entradas en la caché de búsquedas.",
+            "# TYPE busquedas_cache_entries gauge",
+            f"busquedas_cache_entries {len(self._entradas)}",
+            "# HELP busquedas_cache_bytes Memoria estimada de la caché de búsquedas.",
+            "# TYPE busquedas_cache_bytes gauge",
+            f"busquedas_cache_bytes {self._bytes}",
+        ]
+
+
+cache_busquedas = CacheBusquedas(
+    max_entradas=BUSQUEDAS_CACHE_MAX_ENTRADAS,
+    ttl=BUSQUEDAS_CACHE_TTL_SECONDS,
+    max_bytes=BUSQUEDAS_CACHE_MAX_BYTES,
+)
+metrics.registrar_colector(cache_busquedas.metricas)
+
+
+def _propiedad_modificada(evento: Evento) -> None:
+    if evento.masivo:
+        cache_busquedas.limpiar()
+    elif evento.operacion == "INSERT":
+        cache_busquedas.invalidar(nuevo=evento.fila)
+    elif evento.operacion == "DELETE":
+        cache_busquedas.invalidar(viejo=evento.anterior)
+    else:
+        cache_busquedas.invalidar(viejo=evento.anterior, nuevo=evento.fila, cambiadas=evento.cambiadas)
+
+
+bus_invalidacion.suscribir("propiedades", _propiedad_modificada)
+bus_invalidacion.al_reconectar(cache_busquedas.limpiar)
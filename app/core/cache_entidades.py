@@ -0,0 +1,334 @@
+"""
+Caché de entidades por ID en dos niveles.
+
+Los detalles de propiedades, agentes y clientes son consultas por PK que se
+repiten constantemente. CacheEntidades es una caché read-through que guarda la
+representación ya serializada (bytes) en:
+
+1. un LRU local por worker, con TTL corto;
+2. opcionalmente, un almacén compartido entre workers (AlmacenCompartido), con
+   claves versionadas `{espacio}:g{generacion}:{id}:v{version}`. Las escrituras
+   incrementan la versión de la entidad (o la generación de todo el espacio),
+   así las claves viejas dejan de leerse y vencen solas.
+
+Los 404 también se cachean (con un TTL propio) y las recargas están protegidas
+contra estampidas: dentro del worker las lecturas concurrentes de la misma
+clave comparten una única carga (SingleFlight), y entre workers sólo el que obtiene el lock
+del almacén compartido va a la base; los demás esperan el valor.
+
+Las escrituras de otros workers llegan por el bus de invalidación y descartan
+el nivel local; el compartido ya queda invalidado por la nueva versión que
+escribe quien modifica la entidad. Por eso el nivel compartido sólo se llena
+con cargas del primario (`cargar(primario=True)`): una réplica atrasada
+podría guardar la fila anterior bajo la clave de la versión nueva y servirla
+durante todo el TTL. Sin nivel compartido la carga usa la sesión de la request.
+
+El almacén compartido se elige con ENTIDADES_CACHE_ALMACEN: vacío (solo nivel
+local), "memoria" (AlmacenMemoria, para desarrollo y pruebas) o la ruta
+"modulo:Clase" de una implementación propia (p. ej. sobre Redis).
+"""
+import asyncio
+import enum
+from abc import ABC, abstractmethod
+import importlib
+import json
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core import metrics
+from app.core.coalescencia import SingleFlight
+from app.core.invalidacion import Evento, bus_invalidacion
+from app.core.config import (
+    ENTIDADES_CACHE_ALMACEN,
+    ENTIDADES_CACHE_MAX_LOCAL,
+    ENTIDADES_CACHE_TTL_LOCAL_SECONDS,
+    ENTIDADES_CACHE_TTL_SECONDS,
+    ENTIDADES_CACHE_TTL_NEGATIVO_SECONDS,
+)
+
+# Valor guardado para una entidad inexistente (404)
+NEGATIVO = b""
+
+CACHE_ENTIDADES_CONSULTAS = metrics.Contador(
+    "entidades_cache_requests_total", "Lecturas de la caché de entidades por espacio y nivel que respondió.",
+    ("espacio", "nivel")
+)
+
+
+def _a_json(valor: Any) -> Any:
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def empaquetar(meta: Dict[str, Any], cuerpo: bytes) -> bytes:
+    """
+    Un valor cacheado: metadatos (controles de acceso, validadores) en la
+    primera línea y el cuerpo JSON ya serializado a continuación.
+    """
+    return json.dumps(meta, default=_a_json).encode() + b"\n" + cuerpo
+
+
+def desempaquetar(valor: bytes) -> Tuple[Dict[str, Any], bytes]:
+    meta, _, cuerpo = valor.partition(b"\n")
+    return json.loads(meta), cuerpo
+
+
+class AlmacenCompartido(ABC):
+    """
+    Interfaz del nivel compartido. Las operaciones siguen la semántica de un
+    almacén clave-valor con vencimiento (GET/MGET, SET EX, INCR, SET NX EX, DEL).
+    Una implementación incompleta falla al instanciarla (cargar_almacen), no en
+    la primera lectura.
+    """
+
+    @abstractmethod
+    async def obtener_varios(self, claves: Sequence[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    async def guardar(self, clave: str, valor: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def incrementar(self, clave: str) -> int:
+        """Incrementa un contador (sin vencimiento) y devuelve el nuevo valor."""
+
+    @abstractmethod
+    async def adquirir(self, clave: str, ttl: float) -> bool:
+        """Crea la clave sólo si no existe; True si se creó (lock obtenido)."""
+
+    @abstractmethod
+    async def liberar(self, clave: str) -> None:
+        ...
+
+
+class AlmacenMemoria(AlmacenCompartido):
+    """
+    Almacén compartido en memoria del proceso. No comparte nada entre workers:
+    sirve como reemplazo local para desarrollo y pruebas del nivel compartido.
+    """
+
+    def __init__(self):
+        self._datos: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def _leer(self, clave: str) -> Optional[bytes]:
+        dato = self._datos.get(clave)
+        if dato is None:
+            return None
+        valor, vence = dato
+        if vence is not None and vence <= time.monotonic():
+            del self._datos[clave]
+            return None
+        return valor
+
+    async def obtener_varios(self, claves: Sequence[str]) -> List[Optional[bytes]]:
+        return [self._leer(clave) for clave in claves]
+
+    async def guardar(self, clave: str, valor: bytes, ttl: float) -> None:
+        self._datos[clave] = (valor, time.monotonic() + ttl)
+
+    async def incrementar(self, clave: str) -> int:
+        valor = int(self._leer(clave) or 0) + 1
+        self._datos[clave] = (str(valor).encode(), None)
+        return valor
+
+    async def adquirir(self, clave: str, ttl: float) -> bool:
+        if self._leer(clave) is not None:
+            return False
+        self._datos[clave] = (b"1", time.monotonic() + ttl)
+        return True
+
+    async def liberar(self, clave: str) -> None:
+        self._datos.pop(clave, None)
+
+
+def cargar_almacen(nombre: str) -> Optional[AlmacenCompartido]:
+    if not nombre:
+        return None
+    if nombre == "memoria":
+        return AlmacenMemoria()
+    modulo, _, clase = nombre.partition(":")
+    almacen = getattr(importlib.import_module(modulo), clase)()
+    if not isinstance(almacen, AlmacenCompartido):
+        raise TypeError(f"ENTIDADES_CACHE_ALMACEN: {nombre} no es un AlmacenCompartido")
+    return almacen
+
+
+class CacheEntidades:
+    # Espera máxima por el valor que está recargando otro worker antes de ir a la base
+    ESPERA_LOCK = 0.5
+    INTERVALO_ESPERA = 0.025
+
+    def __init__(
+        self,
+        espacio: str,
+        compartido: Optional[AlmacenCompartido] = None,
+        max_local: int = ENTIDADES_CACHE_MAX_LOCAL,
+        ttl_local: float = ENTIDADES_CACHE_TTL_LOCAL_SECONDS,
+        ttl: float = ENTIDADES_CACHE_TTL_SECONDS,
+        ttl_negativo: float = ENTIDADES_CACHE_TTL_NEGATIVO_SECONDS
+    ):
+        self.espacio = espacio
+        self.compartido = compartido
+        self.max_local = max_local
+        self.ttl_local = ttl_local
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._local: "OrderedDict[int, Tuple[bytes, float]]" = OrderedDict()
+        self._vuelos = SingleFlight(f"cache_{espacio}")
+        # Cambia con cada invalidación: una carga que empezó antes no se guarda localmente
+        self._epoca = 0
+
+    # Nivel local
+
+    def _leer_local(self, id_: int) -> Optional[bytes]:
+        dato = self._local.get(id_)
+        if dato is None:
+            return None
+        valor, vence = dato
+        if vence <= time.monotonic():
+            del self._local[id_]
+            return None
+        self._local.move_to_end(id_)
+        return valor
+
+    def _guardar_local(self, id_: int, valor: bytes) -> None:
+        ttl = min(self.ttl_local, self.ttl_negativo) if valor == NEGATIVO else self.ttl_local
+        self._local[id_] = (valor, time.monotonic() + ttl)
+        self._local.move_to_end(id_)
+        while len(self._local) > self.max_local:
+            self._local.popitem(last=False)
+
+    # Nivel compartido
+
+    def _clave_generacion(self) -> str:
+        return f"{self.espacio}:generacion"
+
+    def _clave_version(self, id_: int) -> str:
+        return f"{self.espacio}:{id_}:version"
+
+    async def _clave_valor(self, id_: int) -> str:
+        generacion, version = await self.compartido.obtener_varios(
+            [self._clave_generacion(), self._clave_version(id_)]
+        )
+        return f"{self.espacio}:g{int(generacion or 0)}:{id_}:v{int(version or 0)}"
+
+    async def _esperar_valor(self, clave: str) -> Optional[bytes]:
+        limite = time.monotonic() + self.ESPERA_LOCK
+        while time.monotonic() < limite:
+            await asyncio.sleep(self.INTERVALO_ESPERA)
+            (valor,) = await self.compartido.obtener_varios([clave])
+            if valor is not None:
+                return valor
+        return None
+
+    async def _cargar(self, id_: int, cargar: Callable[[bool], Awaitable[Optional[bytes]]]) -> bytes:
+        if self.compartido is None:
+            CACHE_ENTIDADES_CONSULTAS.inc(self.espacio, "base")
+            valor = await cargar(False)
+            return NEGATIVO if valor is None else valor
+
+        clave = await self._clave_valor(id_)
+        (valor,) = await self.compartido.obtener_varios([clave])
+        if valor is not None:
+            CACHE_ENTIDADES_CONSULTAS.inc(self.espacio, "compartido")
+            return valor
+
+        lock = f"{clave}:lock"
+        obtenido = await self.compartido.adquirir(lock, self.ESPERA_LOCK * 4)
+        if not obtenido:
+            valor = await self._esperar_valor(clave)
+            if valor is not None:
+                CACHE_ENTIDADES_CONSULTAS.inc(self.espacio, "compartido")
+                return valor
+        try:
+            CACHE_ENTIDADES_CONSULTAS.inc(self.espacio, "base")
+            valor = await cargar(True)
+            valor = NEGATIVO if valor is None else valor
+            await self.compartido.guardar(clave, valor, self.ttl_negativo if valor == NEGATIVO else self.ttl)
+            return valor
+        finally:
+            if obtenido:
+                await self.compartido.liberar(lock)
+
+    async def obtener(self, id_: int, cargar: Callable[[bool], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """
+        Valor cacheado de la entidad, o el que devuelva `cargar` (None si no existe).
+        `cargar(primario)` debe leer del primario cuando `primario` es True.
+        """
+        valor = self._leer_local(id_)
+        if valor is not None:
+            CACHE_ENTIDADES_CONSULTAS.inc(self.espacio, "local")
+            return valor or None
+
+        # Una sola carga por clave dentro del worker; el resto espera su resultado
+        return (await self._vuelos.ejecutar(id_, lambda: self._cargar_local(id_, cargar))) or None
+
+    async def _cargar_local(self, id_: int, cargar: Callable[[bool], Awaitable[Optional[bytes]]]) -> bytes:
+        epoca = self._epoca
+        valor = await self._cargar(id_, cargar)
+        if epoca == self._epoca:
+            self._guardar_local(id_, valor)
+        return valor
+
+    # Invalidación
+
+    def descartar_local(self, id_: Optional[int] = None) -> None:
+        """Descarta una entidad (o todas) sólo del nivel local de este worker."""
+        self._epoca += 1
+        if id_ is None:
+            self._local.clear()
+        else:
+            self._local.pop(id_, None)
+
+    async def invalidar(self, id_: int) -> None:
+        """Nueva versión de la entidad: las copias anteriores dejan de leerse."""
+        self.descartar_local(id_)
+        if self.compartido is not None:
+            await self.compartido.incrementar(self._clave_version(id_))
+
+    async def invalidar_todo(self) -> None:
+        """Nueva generación del espacio: invalida todas sus entidades de una vez."""
+        self.descartar_local()
+        if self.compartido is not None:
+            await self.compartido.incrementar(self._clave_generacion())
+
+
+almacen_compartido = cargar_almacen(ENTIDADES_CACHE_ALMACEN)
+
+cache_propiedades = CacheEntidades("propiedad", almacen_compartido)
+cache_agentes = CacheEntidades("agente", almacen_compartido)
+cache_clientes = CacheEntidades("cliente", almacen_compartido)
+
+
+def _propiedad_modificada(evento: Evento) -> None:
+    # En un evento masivo id es None: se descartan todas
+    cache_propiedades.descartar_local(evento.id)
+
+
+def _anidada_modificada(cache: Optional[CacheEntidades]) -> Callable[[Evento], None]:
+    """Agentes, clientes y direcciones aparecen anidados en el detalle de la propiedad."""
+    def manejador(evento: Evento) -> None:
+        if cache is not None:
+            cache.descartar_local(evento.id)
+        # Una fila nueva todavía no está anidada en ninguna propiedad
+        if evento.operacion != "INSERT":
+            cache_propiedades.descartar_local()
+    return manejador
+
+
+def _reiniciar() -> None:
+    for cache in (cache_propiedades, cache_agentes, cache_clientes):
+        cache.descartar_local()
+
+
+bus_invalidacion.suscribir("propiedades", _propiedad_modificada)
+bus_invalidacion.suscribir("agentes", _anidada_modificada(cache_agentes))
+bus_invalidacion.suscribir("clientes", _anidada_modificada(cache_clientes))
+bus_invalidacion.suscribir("direcciones", _anidada_modificada(None))
+bus_invalidacion.al_reconectar(_reiniciar)
@@ -0,0 +1,77 @@
+"""
+Coalescencia de lecturas idénticas concurrentes (single-flight).
+
+Cuando una propiedad se viraliza llegan cientos de requests idénticos en el
+mismo instante. Con SingleFlight sólo el primero (el líder) ejecuta la
+consulta y la serialización; los que llegan mientras tanto esperan y reciben
+los mismos bytes.
+
+    contenido = await vuelos_propiedades.ejecutar(clave, lambda: cargar(db, ...))
+
+La clave tiene que incluir todo lo que cambia el resultado: la ruta, los
+parámetros y, si depende del usuario, su alcance de autorización. Lo más
+simple es que la función compartida no dependa del usuario y que cada request
+aplique sus propios controles de acceso sobre el resultado, como hace
+read_propiedad.
+
+La función corre en la sesión del líder. Si el líder se cancela (el cliente
+cortó la conexión), los que esperaban no heredan la cancelación: uno de ellos
+pasa a ser el líder y repite la carga.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core import metrics
+
+T = TypeVar("T")
+
+COALESCENCIA_REQUESTS = metrics.Contador(
+    "coalescencia_requests_total", "Lecturas que ejecutaron la carga (lider) o esperaron la de otro (seguidor).",
+    ("nombre", "rol")
+)
+
+
+class _LiderCancelado(Exception):
+    pass
+
+
+class SingleFlight:
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._en_vuelo: Dict[Hashable, asyncio.Future] = {}
+
+    async def ejecutar(self, clave: Hashable, funcion: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            en_vuelo = self._en_vuelo.get(clave)
+            if en_vuelo is None:
+                break
+            COALESCENCIA_REQUESTS.inc(self.nombre, "seguidor")
+            try:
+                # shield: si se cancela este request no se cancela la carga compartida
+                return await asyncio.shield(en_vuelo)
+            except _LiderCancelado:
+                continue
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._en_vuelo[clave] = futuro
+        COALESCENCIA_REQUESTS.inc(self.nombre, "lider")
+        try:
+            resultado = await funcion()
+        except asyncio.CancelledError:
+            futuro.set_exception(_LiderCancelado())
+            futuro.exception()
+            raise
+        except BaseException as e:
+            futuro.set_exception(e)
+            # Que nadie quede con una excepción sin recuperar si no había otros esperando
+            futuro.exception()
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            del self._en_vuelo[clave]
+
+    def en_vuelo(self) -> int:
+        return len(self._en_vuelo)
+
@@ -0,0 +1,125 @@
+"""
+Control de concurrencia optimista.
+
+Las tablas editables (propiedades, clientes, agentes y direcciones) tienen una
+columna `version` que se incrementa en cada UPDATE. Los PUT la exponen como
+ETag y aceptan `If-Match`: si la fila cambió desde que el cliente la leyó, el
+UPDATE no encuentra la versión esperada y se responde 412 en lugar de pisar
+los cambios del otro usuario.
+
+actualizar_con_version resuelve la actualización en un solo viaje a la base:
+
+    WITH actualizada AS (
+        UPDATE propiedades SET ..., version = version + 1
+        WHERE id = :id AND version = :v
+        RETURNING *
+    )
+    SELECT ... FROM actualizada LEFT OUTER JOIN direcciones ...
+
+y devuelve la entidad ORM con sus relaciones ya cargadas. Sólo cuando no se
+actualizó nada se hace una segunda consulta para distinguir 404 de 412.
+"""
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
+
+
+class ConflictoVersion(Exception):
+    """La fila existe pero no cumple la versión esperada (o las condiciones de acceso)."""
+
+    def __init__(self, version_actual: int):
+        super().__init__(f"Versión actual: {version_actual}")
+        self.version_actual = version_actual
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def version_esperada(if_match: Optional[str]) -> Optional[int]:
+    """
+    Versión pedida en el encabezado If-Match. None si no se envió o es `*`.
+
+    Acepta también los ETag de los GET condicionales ("3-1-7-2" o "3.ab12cd34"),
+    cuyo primer componente es la versión de la fila. Un valor que no corresponde
+    a ninguna versión nunca coincide: se responde 412.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    valor = if_match.strip()
+    if valor.startswith("W/"):
+        # If-Match usa comparación fuerte: un ETag débil no coincide nunca
+        raise_precondicion_fallida(None)
+    try:
+        return int(valor.strip('"').split(".")[0].split("-")[0])
+    except ValueError:
+        raise_precondicion_fallida(None)
+
+
+def raise_precondicion_fallida(version_actual: Optional[int]) -> None:
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="El recurso fue modificado por otro usuario. Vuelva a obtenerlo y reintente",
+        headers={"ETag": etag(version_actual)} if version_actual is not None else None
+    )
+
+
+async def actualizar_con_version(
+    db: AsyncSession,
+    modelo: type,
+    id_: int,
+    valores: Dict[str, Any],
+    version: Optional[int] = None,
+    condiciones: Sequence[Any] = (),
+    relaciones: Sequence[str] = ()
+) -> Optional[Any]:
+    """
+    UPDATE ... WHERE id = :id [AND version = :v] RETURNING, con commit.
+
+    Args:
+        db: Sesión de la base de datos
+        modelo: Modelo con columnas `id` y `version`
+        id_: ID de la fila a actualizar
+        valores: Columnas a actualizar
+        version: Versión esperada (If-Match); None actualiza sin verificarla
+        condiciones: Condiciones extra sobre la tabla (p. ej. permisos)
+        relaciones: Relaciones a cargar en la entidad devuelta
+
+    Returns:
+        La entidad actualizada, o None si no existe
+
+    Raises:
+        ConflictoVersion: si existe pero no cumple la versión o las condiciones
+    """
+    tabla = modelo.__table__
+    filtro = [tabla.c.id == id_, *condiciones]
+    if version is not None:
+        filtro.append(tabla.c.version == version)
+
+    actualizada = (
+        update(tabla)
+        .where(*filtro)
+        .values(**valores, version=tabla.c.version + 1)
+        .returning(*tabla.c)
+        .cte("actualizada")
+    )
+    entidad = aliased(modelo, actualizada)
+    stmt = (
+        select(entidad)
+        .options(*(joinedload(getattr(entidad, relacion)) for relacion in relaciones))
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    objeto = result.scalars().first()
+    if objeto is not None:
+        await db.commit()
+        return objeto
+
+    await db.rollback()
+    version_actual = await db.scalar(select(tabla.c.version).where(tabla.c.id == id_))
+    if version_actual is None:
+        return None
+    raise ConflictoVersion(version_actual)
@@ -0,0 +1,94 @@
+"""
+GET condicionales (ETag / Last-Modified).
+
+Los endpoints arman el validador a partir de datos baratos de obtener (la
+columna `version` de la fila, o el contador de versiones_tablas para los
+listados de geografía) y, si coincide con `If-None-Match` o
+`If-Modified-Since`, responden 304 sin serializar el cuerpo.
+
+    validador = Validador(etag_de(fila.version), fila.fecha_modificacion)
+    if validador.no_modificado(request):
+        return validador.respuesta_304()
+    return validador.aplicar(respuesta_json(...))
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import FrozenSet, Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.version_tabla import VersionTabla
+
+
+def etag_de(*partes, campos: Optional[FrozenSet[str]] = None) -> str:
+    """
+    ETag fuerte a partir de versiones. Con `fields`/`include` la representación
+    cambia, así que el conjunto de campos también forma parte del ETag.
+    """
+    valor = "-".join(str(parte) for parte in partes)
+    if campos is not None:
+        valor += "." + hashlib.blake2s(",".join(sorted(campos)).encode(), digest_size=4).hexdigest()
+    return f'"{valor}"'
+
+
+class Validador:
+    def __init__(self, etag: str, ultima_modificacion: Optional[datetime] = None):
+        self.etag = etag
+        # Las fechas de la base son UTC sin zona; HTTP sólo tiene precisión de segundos
+        self.ultima_modificacion = ultima_modificacion.replace(microsecond=0) if ultima_modificacion else None
+
+    def no_modificado(self, request: Request) -> bool:
+        """
+        Evalúa If-None-Match y, sólo si no vino, If-Modified-Since (RFC 9110).
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            etiquetas = [etiqueta.strip() for etiqueta in if_none_match.split(",")]
+            # Comparación débil: W/"3" coincide con "3"
+            return "*" in etiquetas or self.etag in (e.removeprefix("W/") for e in etiquetas)
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.ultima_modificacion:
+            try:
+                fecha = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if fecha.tzinfo is not None:
+                fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+            return self.ultima_modificacion <= fecha
+        return False
+
+    def encabezados(self) -> dict:
+        encabezados = {"ETag": self.etag}
+        if self.ultima_modificacion:
+            encabezados["Last-Modified"] = format_datetime(
+                self.ultima_modificacion.replace(tzinfo=timezone.utc), usegmt=True
+            )
+        return encabezados
+
+    def respuesta_304(self) -> Response:
+        return Response(status_code=304, headers=self.encabezados())
+
+    def aplicar(self, response: Response) -> Response:
+        response.headers.update(self.encabezados())
+        return response
+
+
+async def validador_tablas(db: AsyncSession, tablas: Iterable[str]) -> Validador:
+    """
+    Validador de un listado que depende de `tablas`, a partir de versiones_tablas.
+    """
+    tablas = sorted(tablas)
+    result = await db.execute(
+        select(VersionTabla.tabla, VersionTabla.version, VersionTabla.fecha_modificacion)
+        .filter(VersionTabla.tabla.in_(tablas))
+    )
+    versiones = {fila.tabla: fila for fila in result.all()}
+    fechas = [fila.fecha_modificacion for fila in versiones.values()]
+    return Validador(
+        etag_de(*(versiones[t].version if t in versiones else 0 for t in tablas)),
+        max(fechas) if len(fechas) == len(tablas) else None
+    )
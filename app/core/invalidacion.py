@@ -0,0 +1,232 @@
+"""
+Bus de invalidación entre workers sobre LISTEN/NOTIFY de Postgres.
+
+Las cachés en memoria (búsquedas, nivel local de entidades) son por worker:
+una escritura atendida por otro worker no se ve hasta que vence el TTL. Los
+triggers por sentencia de la migración 3d9f0b7c2a61 publican en el canal CANAL
+un mensaje JSON por cada fila insertada, modificada o borrada:
+
+    {"tabla": "propiedades", "op": "UPDATE", "id": 12, "version": 4,
+     "cambiadas": ["estado", "version", ...], "fila": {...}, "anterior": {...}}
+
+`fila`/`anterior` sólo traen las columnas que la tabla declara en su trigger
+(las que necesitan los suscriptores para invalidar de forma selectiva). Una
+sentencia que toca muchas filas publica en cambio un único mensaje
+{"tabla": ..., "op": ..., "masivo": true}: los suscriptores descartan todo lo
+de esa tabla. Las cargas masivas (importaciones) apagan los triggers en su
+transacción con `silenciar` y avisan una vez con `notificar_masivo`. NOTIFY
+es transaccional: el mensaje se entrega al hacer commit y nunca si hay
+rollback, así que cubre también las escrituras fuera de la API (importaciones
+por CLI, SQL manual).
+
+Cada worker mantiene una única conexión LISTEN en una tarea de fondo. Las
+cachés registran manejadores por tabla con `suscribir` y un manejador de
+reinicio con `al_reconectar`: mientras la conexión estuvo caída se pudieron
+perder mensajes, así que cada (re)conexión incrementa la época y descarta
+todo lo cacheado en memoria.
+
+Los manejadores se ejecutan en el loop del worker y deben ser rápidos y
+síncronos (descartar entradas en memoria). Los mensajes que llegan juntos se
+despachan en una sola pasada del loop; si de una tabla llegan más de
+INVALIDACION_MAX_EVENTOS_LOTE, se reemplazan por un evento masivo.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import (
+    DATABASE_URL,
+    INVALIDACION_HABILITADA,
+    INVALIDACION_HEARTBEAT_SECONDS,
+    INVALIDACION_MAX_EVENTOS_LOTE,
+    INVALIDACION_REINTENTO_MAX_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Deben coincidir con notificar_invalidacion() (migración 3d9f0b7c2a61)
+CANAL = "invalidaciones"
+GUC_SIN_NOTIFICACIONES = "app.sin_notificaciones"
+
+INVALIDACION_MENSAJES = metrics.Contador(
+    "invalidacion_mensajes_total", "Mensajes recibidos por el bus de invalidación por tabla.", ("tabla",)
+)
+INVALIDACION_RECONEXIONES = metrics.Contador(
+    "invalidacion_reconexiones_total", "Conexiones del bus de invalidación (cada una descarta las cachés locales)."
+)
+
+
+class Evento(NamedTuple):
+    tabla: str
+    operacion: str
+    id: Optional[int]
+    version: Optional[int]
+    cambiadas: Optional[FrozenSet[str]] = None
+    fila: Optional[Dict[str, Any]] = None
+    anterior: Optional[Dict[str, Any]] = None
+    # Pudo cambiar cualquier fila de la tabla (id, fila y anterior vienen vacíos)
+    masivo: bool = False
+
+    @classmethod
+    def desde_json(cls, payload: str) -> "Evento":
+        datos = json.loads(payload)
+        cambiadas = datos.get("cambiadas")
+        return cls(
+            tabla=datos["tabla"],
+            operacion=datos["op"],
+            id=datos.get("id"),
+            version=datos.get("version"),
+            cambiadas=frozenset(cambiadas) if cambiadas is not None else None,
+            fila=datos.get("fila"),
+            anterior=datos.get("anterior"),
+            masivo=bool(datos.get("masivo", False)),
+        )
+
+    @classmethod
+    def de_tabla(cls, tabla: str, operacion: str = "UPDATE") -> "Evento":
+        return cls(tabla=tabla, operacion=operacion, id=None, version=None, masivo=True)
+
+
+Manejador = Callable[[Evento], None]
+
+
+class BusInvalidacion:
+    def __init__(self, dsn: str, canal: str, heartbeat: float, reintento_max: float, max_eventos_lote: int):
+        self.dsn = dsn
+        self.canal = canal
+        self.heartbeat = heartbeat
+        self.reintento_max = reintento_max
+        self.max_eventos_lote = max_eventos_lote
+        self._manejadores: Dict[str, List[Manejador]] = defaultdict(list)
+        self._pendientes: List[Evento] = []
+        self._al_reconectar: List[Callable[[], None]] = []
+        self._tarea: Optional[asyncio.Task] = None
+        self.conectado = False
+        self.epoca = 0
+        self.ultimo_error: Optional[str] = None
+
+    def suscribir(self, tabla: str, manejador: Manejador) -> None:
+        self._manejadores[tabla].append(manejador)
+
+    def al_reconectar(self, manejador: Callable[[], None]) -> None:
+        self._al_reconectar.append(manejador)
+
+    def despachar(self, evento: Evento) -> None:
+        INVALIDACION_MENSAJES.inc(evento.tabla)
+        for manejador in self._manejadores.get(evento.tabla, ()):
+            try:
+                manejador(evento)
+            except Exception:
+                logger.exception(f"Error en el manejador de invalidación de {evento.tabla}")
+
+    def reiniciar(self) -> None:
+        """Nueva época: descarta todo lo que las cachés tienen en memoria."""
+        self.epoca += 1
+        INVALIDACION_RECONEXIONES.inc()
+        for manejador in self._al_reconectar:
+            try:
+                manejador()
+            except Exception:
+                logger.exception("Error al reiniciar una caché")
+
+    def _recibir(self, conexion, pid: int, canal: str, payload: str) -> None:
+        try:
+            evento = Evento.desde_json(payload)
+        except (ValueError, KeyError):
+            logger.warning(f"Mensaje de invalidación inválido: {payload[:200]}")
+            return
+        if not self._pendientes:
+            asyncio.get_running_loop().call_soon(self._despachar_pendientes)
+        self._pendientes.append(evento)
+
+    def _despachar_pendientes(self) -> None:
+        """Despacha lo recibido desde la última pasada, agrupado por tabla."""
+        eventos, self._pendientes = self._pendientes, []
+        por_tabla: Dict[str, List[Evento]] = defaultdict(list)
+        for evento in eventos:
+            por_tabla[evento.tabla].append(evento)
+        for tabla, lote in por_tabla.items():
+            if len(lote) > self.max_eventos_lote:
+                self.despachar(Evento.de_tabla(tabla))
+            else:
+                for evento in lote:
+                    self.despachar(evento)
+
+    async def _escuchar(self) -> None:
+        espera = 1.0
+        while True:
+            conexion = None
+            try:
+                conexion = await asyncpg.connect(self.dsn)
+                await conexion.add_listener(self.canal, self._recibir)
+                # Ya escuchando: lo que cambió mientras tanto se descarta de una vez
+                self.reiniciar()
+                self.conectado = True
+                self.ultimo_error = None
+                espera = 1.0
+                while True:
+                    await asyncio.sleep(self.heartbeat)
+                    # Detecta conexiones caídas, que asyncpg no nota mientras sólo escucha
+                    await asyncio.wait_for(conexion.fetchval("SELECT 1"), timeout=self.heartbeat)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.conectado:
+                    logger.warning(f"Bus de invalidación desconectado: {e}")
+                self.ultimo_error = str(e)
+            finally:
+                self.conectado = False
+                if conexion is not None:
+                    conexion.terminate()
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, self.reintento_max)
+
+    def iniciar(self) -> None:
+        if INVALIDACION_HABILITADA and self._tarea is None:
+            self._tarea = asyncio.create_task(self._escuchar())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def estado(self) -> dict:
+        return {
+            "habilitado": INVALIDACION_HABILITADA,
+            "conectado": self.conectado,
+            "canal": self.canal,
+            "epoca": self.epoca,
+            "suscripciones": {tabla: len(m) for tabla, m in self._manejadores.items()},
+            "ultimo_error": self.ultimo_error,
+        }
+
+
+bus_invalidacion = BusInvalidacion(
+    dsn=DATABASE_URL,
+    canal=CANAL,
+    heartbeat=INVALIDACION_HEARTBEAT_SECONDS,
+    reintento_max=INVALIDACION_REINTENTO_MAX_SECONDS,
+    max_eventos_lote=INVALIDACION_MAX_EVENTOS_LOTE,
+)
+
+
+async def silenciar(db: AsyncSession) -> None:
+    """Apagar los triggers de invalidación hasta el fin de la transacción de `db`."""
+    await db.execute(select(func.set_config(GUC_SIN_NOTIFICACIONES, "on", True)))
+
+
+async def notificar_masivo(db: AsyncSession, tabla: str, operacion: str = "UPDATE") -> None:
+    """Avisar a todos los workers (al confirmar `db`) que pudo cambiar cualquier fila de `tabla`."""
+    payload = json.dumps({"tabla": tabla, "op": operacion, "masivo": True})
+    await db.execute(select(func.pg_notify(CANAL, payload)))
@@ -0,0 +1,262 @@
+"""
+Métricas en formato de texto de Prometheus.
+
+Las métricas viven en memoria de cada worker; Prometheus agrega los workers
+al hacer scrape de cada uno (o vía el multiproceso del despliegue).
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.core.pool import Histograma
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Ruta usada cuando el request no matchea ningún endpoint (evita explosión de etiquetas)
+RUTA_DESCONOCIDA = "sin_ruta"
+LE_INF = 'le="+Inf"'
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(str(v))}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatear_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        REGISTRO.append(self)
+
+    def _encabezado(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, *etiquetas: str, cantidad: float = 1.0) -> None:
+        with self._lock:
+            self._valores[etiquetas] += cantidad
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        lineas = self._encabezado()
+        for etiquetas, valor in valores:
+            lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, etiquetas)} {_formatear_numero(valor)}")
+        return lineas
+
+
+class Gauge(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, *etiquetas: str, cantidad: float = 1.0) -> None:
+        with self._lock:
+            self._valores[etiquetas] += cantidad
+
+    def dec(self, *etiquetas: str, cantidad: float = 1.0) -> None:
+        self.inc(*etiquetas, cantidad=-cantidad)
+
+    def set(self, valor: float, *etiquetas: str) -> None:
+        with self._lock:
+            self._valores[etiquetas] = valor
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        lineas = self._encabezado()
+        for etiquetas, valor in valores:
+            lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, etiquetas)} {_formatear_numero(valor)}")
+        return lineas
+
+
+class HistogramaMetrica(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+        self._hijos: Dict[Tuple, Histograma] = {}
+
+    def observar(self, valor: float, *etiquetas: str) -> None:
+        hijo = self._hijos.get(etiquetas)
+        if hijo is None:
+            with self._lock:
+                hijo = self._hijos.setdefault(etiquetas, Histograma(self.buckets))
+        hijo.observar(valor)
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            hijos = list(self._hijos.items())
+        lineas = self._encabezado()
+        for etiquetas, hijo in hijos:
+            lineas += lineas_histograma(self.nombre, self.etiquetas, etiquetas, hijo)
+        return lineas
+
+
+def lineas_histograma(nombre: str, nombres: Sequence[str], etiquetas: Sequence[str], histograma: Histograma) -> List[str]:
+    """Series _bucket/_sum/_count de un Histograma (sin HELP/TYPE), también para colectores."""
+    buckets, suma, total = histograma.acumulados()
+    lineas = []
+    for limite, conteo in buckets:
+        le = f'le="{_formatear_numero(limite)}"'
+        lineas.append(f"{nombre}_bucket{_formatear_etiquetas(nombres, etiquetas, le)} {conteo}")
+    lineas.append(f"{nombre}_bucket{_formatear_etiquetas(nombres, etiquetas, LE_INF)} {total}")
+    lineas.append(f"{nombre}_sum{_formatear_etiquetas(nombres, etiquetas)} {_formatear_numero(suma)}")
+    lineas.append(f"{nombre}_count{_formatear_etiquetas(nombres, etiquetas)} {total}")
+    return lineas
+
+
+REGISTRO: List[_Metrica] = []
+# Funciones que generan líneas adicionales al momento del scrape (p. ej. estado de pools)
+COLECTORES: List[Callable[[], List[str]]] = []
+
+
+def registrar_colector(colector: Callable[[], List[str]]) -> None:
+    COLECTORES.append(colector)
+
+
+def exportar() -> str:
+    lineas: List[str] = []
+    for metrica in REGISTRO:
+        lineas.extend(metrica.exportar())
+    for colector in COLECTORES:
+        lineas.extend(colector())
+    return "\n".join(lineas) + "\n"
+
+
+# Métricas HTTP
+HTTP_PETICIONES = Contador(
+    "http_requests_total", "Cantidad de requests por ruta, método y código de estado.",
+    ("method", "route", "status")
+)
+HTTP_LATENCIA = HistogramaMetrica(
+    "http_request_duration_seconds", "Latencia de los requests por ruta.",
+    ("method", "route")
+)
+HTTP_EN_CURSO = Gauge("http_requests_in_flight", "Requests en curso en este worker.")
+
+# Métricas de base de datos
+DB_DURACION_CONSULTA = HistogramaMetrica(
+    "db_query_duration_seconds", "Duración de cada consulta SQL."
+)
+DB_CONSULTAS_POR_REQUEST = HistogramaMetrica(
+    "db_queries_per_request", "Cantidad de consultas SQL por request.",
+    ("method", "route"), buckets=BUCKETS_CONSULTAS
+)
+DB_TIEMPO_POR_REQUEST = HistogramaMetrica(
+    "db_time_per_request_seconds", "Tiempo acumulado en la base de datos por request.",
+    ("method", "route")
+)
+
+
+class EstadisticasDB:
+    __slots__ = ("consultas", "tiempo")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+
+
+# Estadísticas de la base de datos del request en curso
+estadisticas_request: contextvars.ContextVar[Optional[EstadisticasDB]] = contextvars.ContextVar(
+    "estadisticas_db_request", default=None
+)
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_metricas = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_inicio_metricas", None)
+    if inicio is None:
+        return
+    duracion = time.perf_counter() - inicio
+    DB_DURACION_CONSULTA.observar(duracion)
+    stats = estadisticas_request.get()
+    if stats is not None:
+        stats.consultas += 1
+        stats.tiempo += duracion
+
+
+def instrumentar_engine(engine) -> None:
+    """Registra los hooks de tiempo de consultas en un Engine síncrono (o el sync_engine de uno asíncrono)."""
+    event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+def plantilla_ruta(scope) -> str:
+    """Ruta con parámetros sin resolver (p. ej. /agente/agente/{agente_id})."""
+    ruta = scope.get("route")
+    if ruta is None:
+        return RUTA_DESCONOCIDA
+    return getattr(ruta, "path_format", None) or getattr(ruta, "path", RUTA_DESCONOCIDA)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que registra latencia, códigos de estado y uso de la base por ruta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = [500]
+        stats = EstadisticasDB()
+        token = estadisticas_request.set(stats)
+        HTTP_EN_CURSO.inc()
+
+        async def send_con_estado(message):
+            if message["type"] == "http.response.start":
+                estado[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            duracion = time.perf_counter() - inicio
+            HTTP_EN_CURSO.dec()
+            estadisticas_request.reset(token)
+            metodo = scope["method"]
+            ruta = plantilla_ruta(scope)
+            HTTP_PETICIONES.inc(metodo, ruta, str(estado[0]))
+            HTTP_LATENCIA.observar(duracion, metodo, ruta)
+            DB_CONSULTAS_POR_REQUEST.observar(stats.consultas, metodo, ruta)
+            DB_TIEMPO_POR_REQUEST.observar(stats.tiempo, metodo, ruta)
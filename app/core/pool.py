@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+from typing import Dict, Sequence
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Límites (en segundos) de los buckets del histograma de espera
+BUCKETS_ESPERA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Histograma acumulativo thread-safe con buckets fijos."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self._conteos = [0] * (len(self.buckets) + 1)
+        self._suma = 0.0
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float) -> None:
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            self._conteos[indice] += 1
+            self._suma += valor
+            self._total += 1
+
+    def acumulados(self):
+        """Devuelve ([(limite, conteo_acumulado)], suma, total)."""
+        with self._lock:
+            conteos = list(self._conteos)
+            suma, total = self._suma, self._total
+        acumulado = 0
+        buckets = []
+        for limite, conteo in zip(self.buckets, conteos):
+            acumulado += conteo
+            buckets.append((limite, acumulado))
+        return buckets, suma, total
+
+    def snapshot(self) -> Dict:
+        buckets, suma, total = self.acumulados()
+        resultado = {str(limite): conteo for limite, conteo in buckets}
+        resultado["+Inf"] = total
+        return {"buckets": resultado, "suma": suma, "total": total}
+
+
+class _PoolInstrumentado:
+    """
+    Mide cuánto espera cada checkout por una conexión, cuántos checkouts están
+    bloqueados esperando una conexión libre en un momento dado y cuántos
+    vencieron por pool_timeout.
+
+    Un checkout cuenta como esperando si al pedirlo no había conexiones libres
+    ni lugar para abrir otra por overflow (sin esa condición el pool entrega
+    o abre una conexión sin bloquearse).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.espera = Histograma(BUCKETS_ESPERA)
+        self.esperando = 0
+        self.timeouts = 0
+        self._lock_esperando = threading.Lock()
+
+    def _agotado(self) -> bool:
+        return self.checkedin() == 0 and -1 < self._max_overflow <= self.overflow()
+
+    def _do_get(self):
+        bloqueado = self._agotado()
+        if bloqueado:
+            with self._lock_esperando:
+                self.esperando += 1
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._lock_esperando:
+                self.timeouts += 1
+            raise
+        finally:
+            self.espera.observar(time.perf_counter() - inicio)
+            if bloqueado:
+                with self._lock_esperando:
+                    self.esperando -= 1
+
+    def recreate(self):
+        # Conservar las métricas cuando SQLAlchemy recrea el pool (p. ej. tras dispose())
+        nuevo = super().recreate()
+        nuevo.espera = self.espera
+        with self._lock_esperando:
+            nuevo.timeouts = self.timeouts
+        return nuevo
+
+
+class InstrumentedQueuePool(_PoolInstrumentado, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_PoolInstrumentado, AsyncAdaptedQueuePool):
+    pass
+
+
+def estadisticas_pool(pool) -> Dict:
+    """Estadísticas en vivo de un pool de conexiones."""
+    stats = {
+        "tamanio": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, _PoolInstrumentado):
+        stats["esperando"] = pool.esperando
+        stats["timeouts"] = pool.timeouts
+        stats["espera_checkout_segundos"] = pool.espera.snapshot()
+    return stats
@@ -0,0 +1,28 @@
+from typing import Callable
+
+
+def presupuesto_sql(consultas: int) -> Callable:
+    """
+    Declara la cantidad máxima de sentencias SQL que puede ejecutar un endpoint.
+
+    Se usa debajo del decorador del router y lo verifica la auditoría de
+    benchmarks/auditoria_sql.py:
+
+        @router.get("/agentes")
+        @presupuesto_sql(1)
+        async def obtener_agentes(...):
+    """
+    def decorador(endpoint: Callable) -> Callable:
+        endpoint.presupuesto_sql = consultas
+        return endpoint
+    return decorador
+
+
+def flujo_continuo(endpoint: Callable) -> Callable:
+    """
+    Marca un endpoint que transmite sin terminar (Server-Sent Events). La
+    auditoría de benchmarks/auditoria_sql.py no puede esperar su respuesta y
+    lo informa como omitido.
+    """
+    endpoint.flujo_continuo = True
+    return endpoint
@@ -0,0 +1,254 @@
+"""
+Profiling opcional por request.
+
+Se activa enviando un token firmado en el header `X-Profile-Token` o en el
+parámetro `_profile`. Mientras dura el request, un hilo muestrea la pila del
+hilo que lo atiende y al terminar se guarda el perfil (formato collapsed stacks
+para flamegraph.pl o JSON de speedscope), más un resumen con la duración, las
+consultas y el tiempo en SQL medidos con los hooks de app.core.metrics.
+
+Limitaciones: en los endpoints async el hilo muestreado es el del event loop,
+que atiende a la vez todos los requests en curso del worker, así que el perfil
+incluye lo que el loop ejecutó para otros requests mientras tanto. Conviene
+perfilar con poca carga concurrente. Las muestras con el loop inactivo
+(esperando en el selector, p. ej. a la base) se descartan y sólo se cuentan en
+el resumen: la espera de SQL con asyncpg no aparece en la pila de Python y se
+ve en tiempo_sql_segundos.
+
+Generar un token:
+    PROFILING_SECRET=... python -m app.core.profiling
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import (
+    PROFILING_SECRET,
+    PROFILING_MAX_PER_MINUTE,
+    PROFILING_INTERVAL_MS,
+    PROFILING_DIR,
+)
+from app.core.metrics import EstadisticasDB, estadisticas_request
+
+HEADER_TOKEN = b"x-profile-token"
+HEADER_FORMATO = b"x-profile-format"
+PARAM_TOKEN = "_profile"
+# Validez de un token firmado
+VIGENCIA_TOKEN_SEGUNDOS = 300
+
+
+def generar_token(secreto: str, ahora: Optional[float] = None) -> str:
+    marca = str(int(ahora if ahora is not None else time.time()))
+    firma = hmac.new(secreto.encode(), marca.encode(), hashlib.sha256).hexdigest()
+    return f"{marca}.{firma}"
+
+
+def token_valido(token: str, secreto: str) -> bool:
+    if not secreto or not token or "." not in token:
+        return False
+    marca, firma = token.split(".", 1)
+    try:
+        emitido = int(marca)
+    except ValueError:
+        return False
+    if abs(time.time() - emitido) > VIGENCIA_TOKEN_SEGUNDOS:
+        return False
+    esperado = hmac.new(secreto.encode(), marca.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(esperado, firma)
+
+
+class LimitadorTasa:
+    """Token bucket: como máximo `por_minuto` perfiles por minuto en este worker."""
+
+    def __init__(self, por_minuto: int):
+        self.capacidad = max(por_minuto, 0)
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            ahora = time.monotonic()
+            self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.capacidad / 60)
+            self.ultimo = ahora
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Muestreador:
+    """
+    Muestrea periódicamente la pila de un hilo y acumula las pilas vistas.
+    Las muestras con el hilo bloqueado en el selector del event loop sólo se
+    cuentan en `inactivas`.
+    """
+
+    def __init__(self, thread_id: int, intervalo: float):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.muestras: Counter = Counter()
+        self.inactivas = 0
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, name="profiler", daemon=True)
+
+    def _correr(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None and os.path.basename(frame.f_code.co_filename) == "selectors.py":
+                self.inactivas += 1
+                continue
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if pila:
+                self.muestras[tuple(reversed(pila))] += 1
+
+    def iniciar(self) -> None:
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        self._hilo.join()
+
+
+def a_collapsed(muestras: Counter) -> str:
+    return "\n".join(f"{';'.join(pila)} {n}" for pila, n in muestras.most_common()) + "\n"
+
+
+def a_speedscope(muestras: Counter, nombre: str, intervalo_ms: float) -> str:
+    frames, indices = [], {}
+    samples, weights = [], []
+    for pila, n in muestras.items():
+        fila = []
+        for frame in pila:
+            if frame not in indices:
+                indices[frame] = len(frames)
+                frames.append({"name": frame})
+            fila.append(indices[frame])
+        samples.append(fila)
+        weights.append(n * intervalo_ms)
+    return json.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": nombre,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    })
+
+
+def _token_del_request(scope) -> Tuple[Optional[str], str]:
+    token, formato = None, "collapsed"
+    for clave, valor in scope.get("headers", []):
+        if clave == HEADER_TOKEN:
+            token = valor.decode("latin-1")
+        elif clave == HEADER_FORMATO:
+            formato = valor.decode("latin-1")
+    if token is None and PARAM_TOKEN.encode() in scope.get("query_string", b""):
+        valores = parse_qs(scope["query_string"].decode("latin-1")).get(PARAM_TOKEN)
+        token = valores[0] if valores else None
+    return token, formato
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila el request si trae un token válido y el
+    limitador lo permite. Solo un request por worker se perfila a la vez.
+    El nombre del perfil guardado se devuelve en el header `X-Profile-Id`.
+    """
+
+    def __init__(self, app, secreto: str = PROFILING_SECRET, directorio: str = PROFILING_DIR):
+        self.app = app
+        self.secreto = secreto
+        self.directorio = directorio
+        self.intervalo = PROFILING_INTERVAL_MS / 1000
+        self.limitador = LimitadorTasa(PROFILING_MAX_PER_MINUTE)
+        self._en_curso = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.secreto:
+            await self.app(scope, receive, send)
+            return
+
+        token, formato = _token_del_request(scope)
+        if not token or not token_valido(token, self.secreto) or not self.limitador.permitir():
+            await self.app(scope, receive, send)
+            return
+        if not self._en_curso.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        perfil_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        extension = "speedscope.json" if formato == "speedscope" else "collapsed.txt"
+        nombre_archivo = f"{perfil_id}.{extension}"
+
+        async def send_con_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", nombre_archivo.encode())]
+            await send(message)
+
+        # Si MetricsMiddleware ya lleva la cuenta de SQL del request, se reutiliza
+        stats = estadisticas_request.get()
+        token_stats = None
+        if stats is None:
+            stats = EstadisticasDB()
+            token_stats = estadisticas_request.set(stats)
+        consultas_inicio, tiempo_sql_inicio = stats.consultas, stats.tiempo
+
+        muestreador = Muestreador(threading.get_ident(), self.intervalo)
+        inicio = time.perf_counter()
+        muestreador.iniciar()
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            duracion = time.perf_counter() - inicio
+            # join() y la escritura del archivo fuera del event loop
+            await run_in_threadpool(muestreador.detener)
+            if token_stats is not None:
+                estadisticas_request.reset(token_stats)
+            self._en_curso.release()
+            muestras = muestreador.muestras
+            ruta = f"{scope['method']} {scope['path']}"
+            await run_in_threadpool(self._guardar, nombre_archivo, formato, ruta, muestras, {
+                "ruta": ruta,
+                "duracion_segundos": duracion,
+                "consultas_sql": stats.consultas - consultas_inicio,
+                "tiempo_sql_segundos": stats.tiempo - tiempo_sql_inicio,
+                "muestras": sum(muestras.values()),
+                "muestras_inactivas": muestreador.inactivas,
+            })
+
+    def _guardar(self, nombre_archivo, formato, ruta, muestras, resumen) -> None:
+        os.makedirs(self.directorio, exist_ok=True)
+        if formato == "speedscope":
+            contenido = a_speedscope(muestras, ruta, self.intervalo * 1000)
+        else:
+            contenido = a_collapsed(muestras)
+        with open(os.path.join(self.directorio, nombre_archivo), "w") as f:
+            f.write(contenido)
+        with open(os.path.join(self.directorio, nombre_archivo.split(".")[0] + ".resumen.json"), "w") as f:
+            json.dump(resumen, f, indent=2)
+
+
+if __name__ == "__main__":
+    if not PROFILING_SECRET:
+        sys.exit("PROFILING_SECRET no está configurado")
+    print(generar_token(PROFILING_SECRET))
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Cookie con el instante (epoch) hasta el cual el cliente debe leer del primario
+COOKIE_PIN_PRIMARIO = "db_primario_hasta"
+METODOS_ESCRITURA = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Lag de replicación en segundos; 0 si la réplica ya aplicó todo lo recibido
+CONSULTA_LAG = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.saludable = False
+        self.lag: Optional[float] = None
+        self.ultimo_error: Optional[str] = None
+
+    @property
+    def nombre(self) -> str:
+        url = self.engine.url
+        return f"{url.host}:{url.port or 5432}/{url.database}"
+
+
+class ReplicaRouter:
+    """
+    Elige el motor para las lecturas: una réplica sana con lag aceptable
+    (round-robin), o el primario si no hay ninguna disponible o si el cliente
+    escribió hace poco.
+    """
+
+    def __init__(self, primario: AsyncEngine, replicas: List[AsyncEngine], max_lag: float, intervalo: float):
+        self.primario = primario
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.max_lag = max_lag
+        self.intervalo = intervalo
+        self._turno = itertools.count()
+        self._tarea: Optional[asyncio.Task] = None
+
+    def elegir(self, pin_primario_hasta: Optional[float] = None) -> AsyncEngine:
+        if pin_primario_hasta and pin_primario_hasta > time.time():
+            return self.primario
+        disponibles = [r for r in self.replicas if r.saludable]
+        if not disponibles:
+            return self.primario
+        return disponibles[next(self._turno) % len(disponibles)].engine
+
+    async def _verificar_replica(self, replica: Replica) -> None:
+        try:
+            # Una réplica colgada no puede demorar más que un intervalo (ni a las demás)
+            replica.lag = await asyncio.wait_for(self._consultar_lag(replica), timeout=self.intervalo)
+            replica.saludable = replica.lag <= self.max_lag
+            replica.ultimo_error = None
+        except Exception as e:
+            error = f"sin respuesta en {self.intervalo}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            if replica.saludable:
+                logger.warning(f"Réplica {replica.nombre} fuera de rotación: {error}")
+            replica.saludable = False
+            replica.ultimo_error = error
+
+    async def _consultar_lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as conn:
+            return float((await conn.execute(CONSULTA_LAG)).scalar() or 0)
+
+    async def verificar(self) -> None:
+        """Actualiza la salud y el lag de todas las réplicas en paralelo."""
+        await asyncio.gather(*(self._verificar_replica(replica) for replica in self.replicas))
+
+    async def _monitorear(self) -> None:
+        while True:
+            await self.verificar()
+            await asyncio.sleep(self.intervalo)
+
+    def iniciar(self) -> None:
+        if self.replicas and self._tarea is None:
+            self._tarea = asyncio.create_task(self._monitorear())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def estado(self) -> List[dict]:
+        return [
+            {
+                "replica": r.nombre,
+                "saludable": r.saludable,
+                "lag_segundos": r.lag,
+                "error": r.ultimo_error,
+            }
+            for r in self.replicas
+        ]
+
+
+def pin_primario_desde_cookie(valor: Optional[str]) -> Optional[float]:
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Después de una escritura exitosa marca al cliente con una cookie para que
+    sus lecturas vayan al primario durante `ventana` segundos.
+    """
+
+    def __init__(self, app, ventana: float):
+        self.app = app
+        self.ventana = ventana
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS_ESCRITURA:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_con_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                hasta = time.time() + self.ventana
+                cookie = f"{COOKIE_PIN_PRIMARIO}={hasta:.3f}; Max-Age={int(self.ventana) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_con_pin)
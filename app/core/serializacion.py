@@ -0,0 +1,256 @@
+"""
+Serialización rápida para los endpoints de listado.
+
+Por defecto los listados devuelven objetos ORM que FastAPI valida contra el
+response_model (from_attributes) y después codifica con json. En páginas grandes
+con objetos anidados ese doble paso domina el tiempo de CPU.
+
+Proyeccion arma, a partir del esquema de salida, un SELECT con sólo las columnas
+que el esquema expone (con OUTER JOIN por cada objeto anidado) y serializa las
+filas con un TypeAdapter precompilado sobre TypedDicts equivalentes al esquema.
+No se crean objetos ORM ni se valida nada, y como el serializador es el mismo
+que usa FastAPI la salida es idéntica byte a byte a la de response_model.
+
+Con los parámetros `fields`/`include` (ver parametros_campos) la proyección se
+arma sobre un esquema derivado con sólo los campos pedidos, de modo que las
+columnas y los JOIN que no se piden no llegan a la consulta.
+"""
+import csv
+import enum
+import io
+import types
+from datetime import date, datetime
+from functools import cached_property, lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Type, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel, TypeAdapter, create_model
+from sqlalchemy import Select, inspect, select
+from sqlalchemy.orm import aliased
+from typing_extensions import TypedDict
+
+SIMPLE, FECHA, ANIDADO = range(3)
+
+
+def _alternativas(anotacion) -> tuple:
+    if get_origin(anotacion) in (Union, types.UnionType):
+        return get_args(anotacion)
+    return (anotacion,)
+
+
+def _esquema_anidado(anotacion) -> Optional[Type[BaseModel]]:
+    """Esquema de un campo `Esquema` u `Optional[Esquema]`; None si es un campo simple."""
+    for alternativa in _alternativas(anotacion):
+        if isinstance(alternativa, type) and issubclass(alternativa, BaseModel):
+            return alternativa
+    return None
+
+
+@lru_cache(maxsize=None)
+def fila_tipada(esquema: Type[BaseModel]) -> type:
+    """TypedDict con los mismos campos, tipos y orden que `esquema`."""
+    campos = {}
+    for nombre, campo in esquema.model_fields.items():
+        anidado = _esquema_anidado(campo.annotation)
+        campos[nombre] = Optional[fila_tipada(anidado)] if anidado else campo.annotation
+    return TypedDict(f"{esquema.__name__}Fila", campos)
+
+
+class _Plan(NamedTuple):
+    columnas: List[Any]
+    joins: List[Any]
+    armar: Callable[[Sequence], Dict]
+    adaptador: TypeAdapter
+    adaptador_lista: TypeAdapter
+    # Posiciones y encabezados de las columnas planas (sin las PK de control) para CSV
+    indices_csv: List[int]
+    encabezado_csv: List[str]
+
+
+def _valor_csv(valor: Any) -> Any:
+    if valor is None:
+        return ""
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+class Proyeccion:
+    """
+    Consulta por columnas y serializador precompilado para un esquema de salida.
+
+    Los campos del esquema se buscan con el mismo nombre en el modelo; los campos
+    cuyo tipo es otro esquema se resuelven siguiendo la relación homónima.
+
+        CLIENTES_JSON = Proyeccion(ClienteOut, Cliente)
+
+        result = await db.execute(CLIENTES_JSON.select().offset(skip).limit(limit))
+        return CLIENTES_JSON.respuesta(result.all())
+    """
+
+    def __init__(self, esquema: Type[BaseModel], modelo: type):
+        self.esquema = esquema
+        self.modelo = modelo
+
+    @cached_property
+    def _plan(self) -> _Plan:
+        # Se arma en el primer uso: las relaciones se resuelven recién cuando
+        # todos los modelos están importados
+        columnas: List[Any] = []
+        joins: List[Any] = []
+        armar = self._planificar(self.esquema, self.modelo, self.modelo, "", columnas, joins)
+        planas = [(i, c.name) for i, c in enumerate(columnas) if not c.name.endswith("__pk")]
+        return _Plan(
+            columnas=columnas,
+            joins=joins,
+            armar=armar,
+            adaptador=TypeAdapter(fila_tipada(self.esquema)),
+            adaptador_lista=TypeAdapter(List[fila_tipada(self.esquema)]),
+            indices_csv=[i for i, _ in planas],
+            encabezado_csv=[nombre.replace("__", ".") for _, nombre in planas],
+        )
+
+    def _planificar(self, esquema, modelo, entidad, prefijo, columnas, joins) -> Callable[[Sequence], Dict]:
+        campos = []
+        for nombre, campo in esquema.model_fields.items():
+            anidado = _esquema_anidado(campo.annotation)
+            if anidado is not None:
+                destino = getattr(modelo, nombre).property.mapper.class_
+                alias = aliased(destino)
+                joins.append(getattr(entidad, nombre).of_type(alias))
+                # La PK de la relación indica si el objeto anidado existe (OUTER JOIN)
+                clave = inspect(destino).primary_key[0].key
+                indice = len(columnas)
+                columnas.append(getattr(alias, clave).label(f"{prefijo}{nombre}__pk"))
+                armar = self._planificar(anidado, destino, alias, f"{prefijo}{nombre}__", columnas, joins)
+                campos.append((nombre, ANIDADO, (indice, armar)))
+            else:
+                indice = len(columnas)
+                columnas.append(getattr(entidad, nombre).label(f"{prefijo}{nombre}"))
+                # Columnas DateTime expuestas como date: response_model las trunca
+                es_fecha = date in _alternativas(campo.annotation)
+                campos.append((nombre, FECHA if es_fecha else SIMPLE, indice))
+
+        def armar(fila: Sequence) -> Dict:
+            datos = {}
+            for nombre, tipo, posicion in campos:
+                if tipo == SIMPLE:
+                    datos[nombre] = fila[posicion]
+                elif tipo == FECHA:
+                    valor = fila[posicion]
+                    datos[nombre] = valor.date() if isinstance(valor, datetime) else valor
+                else:
+                    indice, armar_anidado = posicion
+                    datos[nombre] = armar_anidado(fila) if fila[indice] is not None else None
+            return datos
+
+        return armar
+
+    def select(self) -> Select:
+        """SELECT de las columnas del esquema sobre el modelo (sin alias, admite filtros sobre él)."""
+        plan = self._plan
+        stmt = select(*plan.columnas).select_from(self.modelo)
+        for destino in plan.joins:
+            stmt = stmt.outerjoin(destino)
+        return stmt
+
+    def serializar(self, filas: Sequence[Sequence]) -> bytes:
+        plan = self._plan
+        return plan.adaptador_lista.dump_json([plan.armar(fila) for fila in filas])
+
+    def serializar_uno(self, fila: Sequence) -> bytes:
+        """Serializa una sola fila; las columnas extra agregadas al final del SELECT se ignoran."""
+        plan = self._plan
+        return plan.adaptador.dump_json(plan.armar(fila))
+
+    def serializar_ndjson(self, filas: Sequence[Sequence]) -> bytes:
+        """Un objeto JSON por línea, con el mismo formato que serializar_uno."""
+        plan = self._plan
+        return b"".join(plan.adaptador.dump_json(plan.armar(fila)) + b"\n" for fila in filas)
+
+    def encabezado_csv(self) -> bytes:
+        """Encabezado CSV; los campos anidados se aplanan como `direccion.calle`."""
+        salida = io.StringIO()
+        csv.writer(salida, lineterminator="\n").writerow(self._plan.encabezado_csv)
+        return salida.getvalue().encode()
+
+    def serializar_csv(self, filas: Sequence[Sequence]) -> bytes:
+        indices = self._plan.indices_csv
+        salida = io.StringIO()
+        csv.writer(salida, lineterminator="\n").writerows(
+            [_valor_csv(fila[i]) for i in indices] for fila in filas
+        )
+        return salida.getvalue().encode()
+
+    def respuesta(self, filas: Sequence[Sequence]) -> Response:
+        return respuesta_json(self.serializar(filas))
+
+
+def respuesta_json(contenido: bytes) -> Response:
+    """Respuesta con JSON ya serializado; FastAPI no la vuelve a validar ni a codificar."""
+    return Response(content=contenido, media_type="application/json")
+
+
+@lru_cache(maxsize=256)
+def esquema_parcial(esquema: Type[BaseModel], campos: FrozenSet[str]) -> Type[BaseModel]:
+    """Esquema derivado de `esquema` con sólo `campos`, en el orden original."""
+    definiciones = {
+        nombre: (campo.annotation, campo)
+        for nombre, campo in esquema.model_fields.items()
+        if nombre in campos
+    }
+    return create_model(f"{esquema.__name__}Parcial", **definiciones)
+
+
+@lru_cache(maxsize=256)
+def proyeccion_parcial(esquema: Type[BaseModel], modelo: type, campos: Optional[FrozenSet[str]] = None) -> Proyeccion:
+    """Proyección (cacheada) para un conjunto de campos; None equivale al esquema completo."""
+    if campos is None:
+        return Proyeccion(esquema, modelo)
+    return Proyeccion(esquema_parcial(esquema, campos), modelo)
+
+
+def _separar(valor: Optional[str]) -> List[str]:
+    return [parte.strip() for parte in (valor or "").split(",") if parte.strip()]
+
+
+def parametros_campos(esquema: Type[BaseModel]) -> Callable[..., Optional[FrozenSet[str]]]:
+    """
+    Dependencia que lee `fields` e `include` y devuelve el conjunto de campos pedidos.
+
+    - `fields`: campos de primer nivel a devolver (id siempre se incluye).
+    - `include`: objetos anidados a incluir. Sin `fields`, se suman a todos los
+      campos simples; con `fields` y sin `include` no se incluye ninguno.
+
+    Devuelve None si no se pidió ninguno de los dos (respuesta completa).
+    """
+    anidados = {n for n, c in esquema.model_fields.items() if _esquema_anidado(c.annotation) is not None}
+    simples = {n for n in esquema.model_fields if n not in anidados}
+
+    def dependencia(
+        fields: Optional[str] = Query(None, description="Campos a devolver separados por coma, p. ej. id,nombre,precio_venta"),
+        include: Optional[str] = Query(
+            None,
+            description=f"Objetos anidados a incluir separados por coma: {', '.join(sorted(anidados)) or 'ninguno'}"
+        ),
+    ) -> Optional[FrozenSet[str]]:
+        if fields is None and include is None:
+            return None
+
+        pedidos = set(_separar(fields)) if fields is not None else set(simples)
+        incluidos = set(_separar(include))
+        desconocidos = (pedidos | incluidos) - set(esquema.model_fields)
+        if desconocidos:
+            raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(sorted(desconocidos))}")
+        if incluidos - anidados:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Solo se pueden incluir objetos anidados: {', '.join(sorted(anidados)) or 'ninguno'}"
+            )
+        return frozenset(pedidos | incluidos | {"id"})
+
+    return dependencia
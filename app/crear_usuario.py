@@ -0,0 +1,55 @@
+"""
+Alta de usuarios de la API y emisión de su token.
+
+El token se muestra una sola vez (en la base queda sólo su hash). Volver a
+correrlo con el mismo email emite un token nuevo e invalida el anterior.
+
+Uso:
+    python -m app.crear_usuario admin@inmobiliaria.com --admin
+    python -m app.crear_usuario ana@inmobiliaria.com --agente-id 3
+    python -m app.crear_usuario juan@mail.com --cliente-id 41
+"""
+import argparse
+import asyncio
+import secrets
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.dependencies import hash_token
+from app.models.users import User
+
+
+async def crear_usuario(args) -> int:
+    token = secrets.token_urlsafe(32)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User).filter(User.email == args.email))
+        usuario = result.scalars().first()
+        if usuario is None:
+            usuario = User(email=args.email)
+            db.add(usuario)
+        usuario.token_hash = hash_token(token)
+        usuario.is_admin = args.admin
+        usuario.is_agente = args.agente_id is not None
+        usuario.agente_id = args.agente_id
+        usuario.cliente_id = args.cliente_id
+        usuario.activo = True
+        await db.commit()
+        print(f"Usuario {usuario.id} ({usuario.email})")
+    print(f"Token: {token}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea un usuario de la API (o renueva su token)")
+    parser.add_argument("email")
+    parser.add_argument("--admin", action="store_true", help="Administrador: ve y modifica todo")
+    parser.add_argument("--agente-id", type=int, default=None, help="Agente al que corresponde el usuario")
+    parser.add_argument("--cliente-id", type=int, default=None, help="Cliente (propietario) al que corresponde el usuario")
+    args = parser.parse_args()
+
+    raise SystemExit(asyncio.run(crear_usuario(args)))
+
+
+if __name__ == "__main__":
+    main()
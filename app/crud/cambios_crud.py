@@ -0,0 +1,197 @@
+"""
+Sincronización incremental de propiedades a partir de cambios_propiedades.
+
+Un cliente guarda el cursor de la última respuesta y pide sólo lo que cambió
+después: el costo es proporcional a la cantidad de cambios, no al catálogo.
+Por cada propiedad se entrega su último estado ("upsert", con la propiedad
+serializada) o una lápida ("delete"). Sin cursor se empieza desde el
+principio del registro, que incluye una entrada por cada propiedad existente.
+
+El cursor es "xid-id" de la última entrada entregada. Sólo se entregan
+entradas de transacciones anteriores al xmin del snapshot actual: todas las
+que puedan aparecer más tarde tienen un xid mayor y quedan delante del cursor.
+"""
+import json
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Select, Text, cast, delete, exists, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.serializacion import proyeccion_parcial
+from app.crud.propiedad_crud import ESTADO_PUBLICADA
+from app.models.cambio import CambioPropiedad, CompactacionCambios, UPSERT, DELETE
+from app.models.propiedad import Propiedad
+from app.schemas.propiedad import PropiedadOut
+
+Cursor = Tuple[int, int]
+
+INICIO: Cursor = (0, 0)
+
+
+def xmin_actual():
+    """xmin del snapshot actual (xid8) como bigint, comparable con CambioPropiedad.xid."""
+    return cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+
+def leer_cursor(valor: Optional[str]) -> Optional[Cursor]:
+    """Cursor "xid-id" recibido del cliente; None si no es válido."""
+    if not valor:
+        return INICIO
+    xid, _, id_ = valor.partition("-")
+    try:
+        return int(xid), int(id_)
+    except ValueError:
+        return None
+
+
+def escribir_cursor(cursor: Cursor) -> str:
+    return f"{cursor[0]}-{cursor[1]}"
+
+
+def consulta_ultimo_cursor() -> Select:
+    """(xid, id) de la última entrada ya visible; la comparten la API y el job de snapshots."""
+    return (
+        select(CambioPropiedad.xid, CambioPropiedad.id)
+        .filter(CambioPropiedad.xid < xmin_actual())
+        .order_by(CambioPropiedad.xid.desc(), CambioPropiedad.id.desc())
+        .limit(1)
+    )
+
+
+async def get_ultimo_cursor(db: AsyncSession) -> Cursor:
+    """Cursor de la última entrada ya visible: lo que se escriba después queda delante."""
+    result = await db.execute(consulta_ultimo_cursor())
+    ultima = result.first()
+    return (ultima.xid, ultima.id) if ultima is not None else INICIO
+
+
+async def cursor_vencido(db: AsyncSession, cursor: Cursor) -> bool:
+    """Si la compactación ya borró lápidas posteriores al cursor."""
+    if cursor == INICIO:
+        # Un cliente sin datos no necesita las lápidas
+        return False
+    result = await db.execute(
+        select(CompactacionCambios.xid, CompactacionCambios.cambio_id)
+        .order_by(CompactacionCambios.id.desc())
+        .limit(1)
+    )
+    horizonte = result.first()
+    return horizonte is not None and cursor < (horizonte.xid, horizonte.cambio_id)
+
+
+async def get_cambios_json(
+    db: AsyncSession,
+    desde: Cursor,
+    limit: int = 500,
+    campos: Optional[FrozenSet[str]] = None,
+    solo_publicadas: bool = True
+) -> bytes:
+    """
+    Cambios posteriores a `desde`, ya serializados:
+
+        {"cursor": "...", "mas": false, "cambios": [
+            {"id": 7, "op": "upsert", "propiedad": {...}},
+            {"id": 9, "op": "delete"}
+        ]}
+
+    Args:
+        limit: Entradas del registro a leer (la respuesta puede tener menos
+            cambios si una propiedad cambió varias veces)
+        solo_publicadas: Las propiedades que no están publicadas se informan
+            como "delete" (salieron del catálogo público)
+    """
+    result = await db.execute(
+        select(CambioPropiedad.id, CambioPropiedad.propiedad_id, CambioPropiedad.operacion, CambioPropiedad.xid)
+        .filter(
+            tuple_(CambioPropiedad.xid, CambioPropiedad.id) > tuple_(*desde),
+            CambioPropiedad.xid < xmin_actual()
+        )
+        .order_by(CambioPropiedad.xid, CambioPropiedad.id)
+        .limit(limit + 1)
+    )
+    entradas = result.all()
+    mas = len(entradas) > limit
+    entradas = entradas[:limit]
+    cursor = (entradas[-1].xid, entradas[-1].id) if entradas else desde
+
+    # Sólo el último cambio de cada propiedad, en el orden en que ocurrió
+    ultimos: Dict[int, str] = {}
+    for entrada in entradas:
+        ultimos.pop(entrada.propiedad_id, None)
+        ultimos[entrada.propiedad_id] = entrada.operacion
+
+    proyeccion = proyeccion_parcial(PropiedadOut, Propiedad, campos)
+    ids = [id_ for id_, operacion in ultimos.items() if operacion == UPSERT]
+    filas = {}
+    if ids:
+        result = await db.execute(
+            proyeccion.select().add_columns(Propiedad.estado, Propiedad.id).filter(Propiedad.id.in_(ids))
+        )
+        filas = {fila[-1]: fila for fila in result.all()}
+
+    cambios: List[bytes] = []
+    for id_, operacion in ultimos.items():
+        fila = filas.get(id_) if operacion == UPSERT else None
+        if fila is None or (solo_publicadas and fila[-2] != ESTADO_PUBLICADA):
+            cambios.append(b'{"id":%d,"op":"%s"}' % (id_, DELETE.encode()))
+        else:
+            cambios.append(b'{"id":%d,"op":"%s","propiedad":' % (id_, UPSERT.encode()) + proyeccion.serializar_uno(fila) + b"}")
+    return (
+        b'{"cursor":' + json.dumps(escribir_cursor(cursor)).encode()
+        + b',"mas":' + (b"true" if mas else b"false")
+        + b',"cambios":[' + b",".join(cambios) + b"]}"
+    )
+
+
+async def compactar_cambios(
+    db: AsyncSession,
+    compactar_antes: datetime,
+    lapidas_antes: datetime
+) -> Tuple[int, int]:
+    """
+    Compactar el registro de cambios:
+
+    1. Borra las entradas anteriores a `compactar_antes` que tienen otra
+       posterior de la misma propiedad: quien tenga un cursor previo recibe
+       igual la más nueva.
+    2. Borra las lápidas anteriores a `lapidas_antes` y registra el horizonte:
+       los cursores anteriores reciben 410 y deben resincronizar todo.
+
+    El registro queda acotado a una entrada por propiedad más los cambios
+    recientes.
+
+    Returns:
+        (entradas reemplazadas borradas, lápidas borradas)
+    """
+    posterior = aliased(CambioPropiedad)
+    result = await db.execute(
+        delete(CambioPropiedad)
+        .where(
+            CambioPropiedad.fecha < compactar_antes,
+            exists().where(
+                posterior.propiedad_id == CambioPropiedad.propiedad_id,
+                tuple_(posterior.xid, posterior.id) > tuple_(CambioPropiedad.xid, CambioPropiedad.id)
+            )
+        )
+    )
+    reemplazadas = result.rowcount
+
+    result = await db.execute(
+        delete(CambioPropiedad)
+        .where(
+            CambioPropiedad.operacion == DELETE,
+            CambioPropiedad.fecha < lapidas_antes,
+            CambioPropiedad.xid < xmin_actual()
+        )
+        .returning(CambioPropiedad.xid, CambioPropiedad.id)
+    )
+    borradas = result.all()
+    if borradas:
+        xid, id_ = max((fila.xid, fila.id) for fila in borradas)
+        await db.execute(
+            insert(CompactacionCambios).values(xid=xid, cambio_id=id_, fecha=datetime.utcnow())
+        )
+    await db.commit()
+    return reemplazadas, len(borradas)
@@ -0,0 +1,261 @@
+"""
+Contadores de vistas y contactos por propiedad (write-behind).
+
+Incrementar una fila por cada vista castigaría la tabla con UPDATEs sobre las
+mismas filas calientes. Cada worker acumula los incrementos en memoria, por
+propiedad y hora, y cada CONTADORES_FLUSH_SECONDS los escribe con upserts
+multi-fila en contadores_propiedad, en dos granularidades (hora y día):
+
+    INSERT ... VALUES (...), (...) ON CONFLICT (propiedad_id, granularidad, inicio)
+    DO UPDATE SET vistas = contadores_propiedad.vistas + EXCLUDED.vistas, ...
+
+Si el proceso se cae se pierde como mucho un intervalo. Si la escritura falla,
+los acumulados vuelven a la memoria y se reintentan en el próximo intervalo.
+Los pares (propiedad, hora) pendientes tienen un tope (CONTADORES_MAX_PENDIENTES):
+con la base caída varios intervalos, o ante IDs inventados, los pares nuevos
+se descartan y se cuentan en contadores_descartados_total en lugar de crecer
+sin límite.
+Los contadores por hora se purgan pasados CONTADORES_RETENCION_HORAS_DIAS.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Row
+
+from app.core import metrics
+from app.core.config import CONTADORES_FLUSH_SECONDS, CONTADORES_MAX_PENDIENTES, CONTADORES_RETENCION_HORAS_DIAS
+from app.core.database import AsyncSessionLocal
+from app.models.contador import ContadorPropiedad, HORA, DIA
+from app.models.propiedad import Propiedad
+
+logger = logging.getLogger(__name__)
+
+# Filas por sentencia INSERT ... ON CONFLICT
+TAMANIO_LOTE = 1000
+# Cada cuánto se purgan los contadores por hora vencidos
+INTERVALO_PURGA = timedelta(hours=1)
+
+CONTADORES_DESCARTADOS = metrics.Contador(
+    "contadores_descartados_total", "Vistas y contactos descartados por el tope de pendientes.", ("tipo",)
+)
+
+
+def inicio_hora(momento: datetime) -> datetime:
+    return momento.replace(minute=0, second=0, microsecond=0)
+
+
+def inicio_dia(momento: datetime) -> datetime:
+    return momento.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class AcumuladorContadores:
+    def __init__(self, intervalo: float, retencion_horas: timedelta, max_pendientes: int):
+        self.intervalo = intervalo
+        self.retencion_horas = retencion_horas
+        self.max_pendientes = max_pendientes
+        # (propiedad_id, hora) -> [vistas, contactos]
+        self._pendientes: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0])
+        self._al_guardar: List[Callable[[Dict[int, int]], None]] = []
+        self._ultima_purga: Optional[datetime] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    def _acumulado(self, clave: Tuple[int, datetime]) -> Optional[List[int]]:
+        """El acumulado de la clave, o None si es nueva y se llegó al tope."""
+        if clave not in self._pendientes and len(self._pendientes) >= self.max_pendientes:
+            return None
+        return self._pendientes[clave]
+
+    def registrar_vista(self, propiedad_id: int, cantidad: int = 1) -> None:
+        acumulado = self._acumulado((propiedad_id, inicio_hora(datetime.utcnow())))
+        if acumulado is None:
+            CONTADORES_DESCARTADOS.inc("vistas", cantidad=cantidad)
+            return
+        acumulado[0] += cantidad
+
+    def registrar_contacto(self, propiedad_id: int, cantidad: int = 1) -> None:
+        acumulado = self._acumulado((propiedad_id, inicio_hora(datetime.utcnow())))
+        if acumulado is None:
+            CONTADORES_DESCARTADOS.inc("contactos", cantidad=cantidad)
+            return
+        acumulado[1] += cantidad
+
+    def al_guardar(self, manejador: Callable[[Dict[int, int]], None]) -> None:
+        """Recibe las vistas por propiedad de cada escritura (p. ej. el feed de destacadas)."""
+        self._al_guardar.append(manejador)
+
+    def _reintegrar(self, pendientes: Dict[Tuple[int, datetime], List[int]]) -> None:
+        descartados = [0, 0]
+        for clave, (vistas, contactos) in pendientes.items():
+            acumulado = self._acumulado(clave)
+            if acumulado is None:
+                descartados[0] += vistas
+                descartados[1] += contactos
+                continue
+            acumulado[0] += vistas
+            acumulado[1] += contactos
+        if descartados[0] or descartados[1]:
+            CONTADORES_DESCARTADOS.inc("vistas", cantidad=descartados[0])
+            CONTADORES_DESCARTADOS.inc("contactos", cantidad=descartados[1])
+            logger.warning(
+                "Tope de contadores pendientes alcanzado: se descartan %d vistas y %d contactos",
+                *descartados
+            )
+
+    async def guardar(self, db: AsyncSession) -> int:
+        """
+        Escribe lo acumulado hasta ahora.
+
+        Returns:
+            Cantidad de filas (propiedad, granularidad, período) escritas
+        """
+        if not self._pendientes:
+            return 0
+        pendientes, self._pendientes = self._pendientes, defaultdict(lambda: [0, 0])
+
+        filas: Dict[Tuple[int, str, datetime], List[int]] = defaultdict(lambda: [0, 0])
+        for (propiedad_id, hora), (vistas, contactos) in pendientes.items():
+            for clave in ((propiedad_id, HORA, hora), (propiedad_id, DIA, inicio_dia(hora))):
+                filas[clave][0] += vistas
+                filas[clave][1] += contactos
+        # Mismo orden en todos los workers: los upserts concurrentes no se bloquean en cruz
+        valores = [
+            {"propiedad_id": p, "granularidad": g, "inicio": i, "vistas": v, "contactos": c}
+            for (p, g, i), (v, c) in sorted(filas.items())
+        ]
+        try:
+            for desde in range(0, len(valores), TAMANIO_LOTE):
+                stmt = insert(ContadorPropiedad).values(valores[desde:desde + TAMANIO_LOTE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[ContadorPropiedad.propiedad_id, ContadorPropiedad.granularidad, ContadorPropiedad.inicio],
+                    set_={
+                        "vistas": ContadorPropiedad.vistas + stmt.excluded.vistas,
+                        "contactos": ContadorPropiedad.contactos + stmt.excluded.contactos,
+                    }
+                )
+                await db.execute(stmt)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            self._reintegrar(pendientes)
+            raise
+
+        vistas_por_propiedad: Dict[int, int] = defaultdict(int)
+        for (propiedad_id, _), (vistas, _) in pendientes.items():
+            if vistas:
+                vistas_por_propiedad[propiedad_id] += vistas
+        for manejador in self._al_guardar:
+            manejador(vistas_por_propiedad)
+        return len(valores)
+
+    async def purgar(self, db: AsyncSession) -> int:
+        """Borra los contadores por hora más viejos que la retención."""
+        limite = inicio_hora(datetime.utcnow() - self.retencion_horas)
+        result = await db.execute(
+            delete(ContadorPropiedad)
+            .where(ContadorPropiedad.granularidad == HORA, ContadorPropiedad.inicio < limite)
+        )
+        await db.commit()
+        return result.rowcount
+
+    async def _mantener(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.guardar(db)
+                    ahora = datetime.utcnow()
+                    if self._ultima_purga is None or ahora - self._ultima_purga >= INTERVALO_PURGA:
+                        await self.purgar(db)
+                        self._ultima_purga = ahora
+            except Exception:
+                logger.exception("Error al guardar los contadores de propiedades")
+
+    def iniciar(self) -> None:
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._mantener())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        # Lo acumulado desde el último intervalo no se pierde en un apagado ordenado
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.guardar(db)
+        except Exception:
+            logger.exception("Error al guardar los contadores de propiedades al detener")
+
+
+acumulador_contadores = AcumuladorContadores(
+    intervalo=CONTADORES_FLUSH_SECONDS,
+    retencion_horas=timedelta(days=CONTADORES_RETENCION_HORAS_DIAS),
+    max_pendientes=CONTADORES_MAX_PENDIENTES,
+)
+
+
+async def get_mas_vistas(
+    db: AsyncSession,
+    desde: datetime,
+    limit: int = 10,
+    agente_id: Optional[int] = None
+) -> List[Row]:
+    """
+    Propiedades más vistas desde `desde` (por día), con sus vistas y contactos.
+
+    Args:
+        agente_id: Sólo las propiedades a cargo de este agente
+    """
+    vistas = func.sum(ContadorPropiedad.vistas).label("vistas")
+    stmt = (
+        select(Propiedad.id.label("propiedad_id"), Propiedad.nombre, vistas, func.sum(ContadorPropiedad.contactos).label("contactos"))
+        .join(Propiedad, Propiedad.id == ContadorPropiedad.propiedad_id)
+        .filter(ContadorPropiedad.granularidad == DIA, ContadorPropiedad.inicio >= inicio_dia(desde))
+        .group_by(Propiedad.id, Propiedad.nombre)
+        .order_by(vistas.desc(), Propiedad.id)
+        .limit(limit)
+    )
+    if agente_id is not None:
+        stmt = stmt.filter(Propiedad.agente_id == agente_id)
+    result = await db.execute(stmt)
+    return list(result.all())
+
+
+async def get_serie_agente(db: AsyncSession, agente_id: int, desde: datetime) -> List[Row]:
+    """Vistas y contactos por día de todas las propiedades de un agente."""
+    stmt = (
+        select(
+            ContadorPropiedad.inicio.label("fecha"),
+            func.sum(ContadorPropiedad.vistas).label("vistas"),
+            func.sum(ContadorPropiedad.contactos).label("contactos")
+        )
+        .join(Propiedad, Propiedad.id == ContadorPropiedad.propiedad_id)
+        .filter(
+            Propiedad.agente_id == agente_id,
+            ContadorPropiedad.granularidad == DIA,
+            ContadorPropiedad.inicio >= inicio_dia(desde)
+        )
+        .group_by(ContadorPropiedad.inicio)
+        .order_by(ContadorPropiedad.inicio)
+    )
+    result = await db.execute(stmt)
+    return list(result.all())
+
+
+async def get_vistas_por_propiedad(db: AsyncSession, desde: datetime) -> Dict[int, int]:
+    """Vistas de cada propiedad desde `desde` (por día)."""
+    result = await db.execute(
+        select(ContadorPropiedad.propiedad_id, func.sum(ContadorPropiedad.vistas))
+        .filter(ContadorPropiedad.granularidad == DIA, ContadorPropiedad.inicio >= inicio_dia(desde))
+        .group_by(ContadorPropiedad.propiedad_id)
+    )
+    return {propiedad_id: int(vistas) for propiedad_id, vistas in result.all()}
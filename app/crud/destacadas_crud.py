@@ -0,0 +1,337 @@
+"""
+Feed precalculado de propiedades destacadas (portada).
+
+Cada worker mantiene en memoria las propiedades publicadas candidatas con los
+datos que usa el ranking, y el top DESTACADAS_TAMANIO ya serializado. El
+endpoint responde con esos bytes sin consultar la base.
+
+El puntaje combina:
+- antigüedad: decae a la mitad cada VIDA_MEDIA_DIAS;
+- popularidad: vistas de los últimos VENTANA_POPULARIDAD_DIAS (contadores de
+  la base al reconstruir, más las que escribe este worker), en escala
+  logarítmica relativa a la más vista;
+- cantidad de fotos (hasta FOTOS_MAX);
+- precio completo para el tipo de operación.
+
+Las actualizaciones son incrementales: el bus de invalidación marca las
+propiedades modificadas (o con imágenes nuevas/borradas) y la tarea de fondo
+relee sólo esas filas. El orden se mantiene sobre una preselección de
+tamanio * MARGEN_PRESELECCION candidatas: en cada refresco se vuelven a
+puntuar sólo la preselección y las propiedades con datos o vistas nuevas, y
+el top se vuelve a serializar si cambió. Puntuar todas las candidatas (que
+pueden ser más de un millón) se hace cada INTERVALO_REORDENAR en un thread,
+porque la antigüedad y la propiedad más vista mueven todos los puntajes.
+La lista completa se reconstruye cada DESTACADAS_RECONSTRUCCION_SECONDS y
+después de cada reconexión del bus, leyéndola de a lotes.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import DESTACADAS_TAMANIO, DESTACADAS_REFRESCO_SECONDS, DESTACADAS_RECONSTRUCCION_SECONDS
+from app.core.database import AsyncSessionLocal
+from app.core.invalidacion import Evento, bus_invalidacion
+from app.core.serializacion import proyeccion_parcial
+from app.crud.contadores_crud import acumulador_contadores, get_vistas_por_propiedad
+from app.crud.propiedad_crud import ESTADO_PUBLICADA, get_filas_por_ids
+from app.models.enums import TipoOperacionEnum
+from app.models.imagen import ImagenPropiedad
+from app.models.propiedad import Propiedad
+from app.schemas.propiedad import PropiedadOut
+
+logger = logging.getLogger(__name__)
+
+PESO_RECIENTE = 0.4
+PESO_POPULARIDAD = 0.3
+PESO_FOTOS = 0.2
+PESO_PRECIO = 0.1
+VIDA_MEDIA_DIAS = 14
+FOTOS_MAX = 10
+VENTANA_POPULARIDAD_DIAS = 7
+# La antigüedad cambia sola: se reordena cada tanto aunque no lleguen eventos
+INTERVALO_REORDENAR = 60
+# Candidatas que se reordenan en cada refresco, en múltiplos del top
+MARGEN_PRESELECCION = 4
+# Filas por lote al leer todas las candidatas
+LOTE_CANDIDATAS = 10_000
+
+
+class Candidata(NamedTuple):
+    id: int
+    fecha_creacion: Optional[datetime]
+    fotos: int
+    precio_completo: bool
+
+
+def precio_completo(tipo_operacion, precio_venta: Optional[int], precio_alquiler: Optional[int]) -> bool:
+    if tipo_operacion == TipoOperacionEnum.venta:
+        return precio_venta is not None
+    if tipo_operacion == TipoOperacionEnum.alquiler:
+        return precio_alquiler is not None
+    return precio_venta is not None and precio_alquiler is not None
+
+
+def puntaje(candidata: Candidata, vistas: int, max_vistas: int, ahora: datetime) -> float:
+    if candidata.fecha_creacion is not None:
+        edad_dias = max((ahora - candidata.fecha_creacion).total_seconds(), 0) / 86400
+        reciente = 0.5 ** (edad_dias / VIDA_MEDIA_DIAS)
+    else:
+        reciente = 0.0
+    popularidad = math.log1p(vistas) / math.log1p(max_vistas) if max_vistas else 0.0
+    fotos = min(candidata.fotos, FOTOS_MAX) / FOTOS_MAX
+    return (
+        PESO_RECIENTE * reciente
+        + PESO_POPULARIDAD * popularidad
+        + PESO_FOTOS * fotos
+        + PESO_PRECIO * candidata.precio_completo
+    )
+
+
+def _candidatas(filas: Sequence[Row]) -> Dict[int, Candidata]:
+    return {
+        fila.id: Candidata(
+            fila.id,
+            fila.fecha_creacion,
+            fila[-1],
+            precio_completo(fila.tipo_operacion, fila.precio_venta, fila.precio_alquiler)
+        )
+        for fila in filas
+    }
+
+
+async def get_candidatas(db: AsyncSession, ids: Optional[Sequence[int]] = None) -> Dict[int, Candidata]:
+    """
+    Propiedades publicadas con los datos del ranking (todas, o sólo `ids`),
+    por ID. Todas se leen con un cursor del lado del servidor de a
+    LOTE_CANDIDATAS filas, así armarlas no bloquea el loop de una sola vez.
+    """
+    fotos = (
+        select(func.count(ImagenPropiedad.id))
+        .where(ImagenPropiedad.propiedad_id == Propiedad.id)
+        .correlate(Propiedad)
+        .scalar_subquery()
+    )
+    stmt = select(
+        Propiedad.id,
+        Propiedad.fecha_creacion,
+        Propiedad.tipo_operacion,
+        Propiedad.precio_venta,
+        Propiedad.precio_alquiler,
+        fotos
+    ).filter(Propiedad.estado == ESTADO_PUBLICADA)
+    if ids is not None:
+        result = await db.execute(stmt.filter(Propiedad.id.in_(ids)))
+        return _candidatas(result.all())
+    candidatas: Dict[int, Candidata] = {}
+    result = await db.stream(stmt.execution_options(yield_per=LOTE_CANDIDATAS))
+    async for filas in result.partitions():
+        candidatas.update(_candidatas(filas))
+    return candidatas
+
+
+class FeedDestacadas:
+    def __init__(self, tamanio: int, refresco: float, reconstruccion: float):
+        self.tamanio = tamanio
+        self.refresco = refresco
+        self.reconstruccion = reconstruccion
+        self._candidatas: Dict[int, Candidata] = {}
+        self._vistas: Dict[int, int] = {}
+        self._max_vistas = 0
+        # Mejores candidatas del último orden con su puntaje, de mayor a menor
+        self._preseleccion: Dict[int, float] = {}
+        self._ids: List[int] = []
+        self._items: List[bytes] = []
+        self._cuerpos: Dict[int, bytes] = {}
+        # Cambios pendientes de aplicar en el próximo refresco
+        self._sucias: Set[int] = set()
+        self._con_vistas: Set[int] = set()
+        self._reconstruir = True
+        self._reserializar = False
+        self._ultima_reconstruccion = 0.0
+        self._ultimo_orden = 0.0
+        self._lock = asyncio.Lock()
+        self._tarea: Optional[asyncio.Task] = None
+        self.listo = False
+
+    # Eventos
+
+    def propiedad_modificada(self, propiedad_id: int) -> None:
+        self._sucias.add(propiedad_id)
+
+    def anidada_modificada(self) -> None:
+        """Cambió un agente, cliente o dirección: el top serializado puede incluirlo."""
+        self._reserializar = True
+
+    def registrar_vistas(self, propiedad_id: int, cantidad: int = 1) -> None:
+        if propiedad_id in self._candidatas:
+            vistas = self._vistas[propiedad_id] = self._vistas.get(propiedad_id, 0) + cantidad
+            self._max_vistas = max(self._max_vistas, vistas)
+            self._con_vistas.add(propiedad_id)
+
+    def registrar_vistas_lote(self, vistas: Dict[int, int]) -> None:
+        for propiedad_id, cantidad in vistas.items():
+            self.registrar_vistas(propiedad_id, cantidad)
+
+    def invalidar_todo(self) -> None:
+        self._reconstruir = True
+
+    # Lectura
+
+    def cuerpo(self, limit: int) -> bytes:
+        """JSON de las primeras `limit` destacadas, armado una vez por cada limit."""
+        cuerpo = self._cuerpos.get(limit)
+        if cuerpo is None:
+            cuerpo = self._cuerpos[limit] = b"[" + b",".join(self._items[:limit]) + b"]"
+        return cuerpo
+
+    def ids(self, limit: int) -> List[int]:
+        return self._ids[:limit]
+
+    async def asegurar(self, db: AsyncSession) -> None:
+        """Carga el feed con la sesión del request si la tarea de fondo todavía no lo hizo."""
+        if not self.listo:
+            async with self._lock:
+                if not self.listo:
+                    await self._refrescar(db)
+
+    # Refresco
+
+    def _mejores(self, ids, ahora: datetime) -> Dict[int, float]:
+        """Las tamanio * MARGEN_PRESELECCION candidatas de `ids` con mayor puntaje, en orden."""
+        puntajes = []
+        for id_ in ids:
+            candidata = self._candidatas.get(id_)
+            if candidata is not None:
+                puntajes.append((id_, puntaje(candidata, self._vistas.get(id_, 0), self._max_vistas, ahora)))
+        return dict(heapq.nlargest(self.tamanio * MARGEN_PRESELECCION, puntajes, key=itemgetter(1)))
+
+    def _ordenar_todas(self) -> Dict[int, float]:
+        """
+        Puntúa todas las candidatas. Corre en un thread: _candidatas sólo cambia
+        en _refrescar, que espera a que termine, y de _vistas sólo se leen
+        valores sueltos (las vistas que lleguen mientras tanto quedan en
+        _con_vistas para el refresco siguiente).
+        """
+        return self._mejores(list(self._candidatas), datetime.utcnow())
+
+    async def _refrescar(self, db: AsyncSession) -> None:
+        ahora = time.monotonic()
+        completo = ahora - self._ultimo_orden >= INTERVALO_REORDENAR
+        cambiadas, self._con_vistas = self._con_vistas, set()
+        if self._reconstruir or ahora - self._ultima_reconstruccion >= self.reconstruccion:
+            self._reconstruir = False
+            self._sucias.clear()
+            self._candidatas = await get_candidatas(db)
+            vistas = await get_vistas_por_propiedad(db, datetime.utcnow() - timedelta(days=VENTANA_POPULARIDAD_DIAS))
+            self._vistas = {id_: v for id_, v in vistas.items() if id_ in self._candidatas}
+            self._max_vistas = max(self._vistas.values(), default=0)
+            self._ultima_reconstruccion = ahora
+            completo = True
+        elif self._sucias:
+            sucias, self._sucias = self._sucias, set()
+            actualizadas = await get_candidatas(db, list(sucias))
+            for id_ in sucias:
+                self._candidatas.pop(id_, None)
+            self._candidatas.update(actualizadas)
+            # Una destacada modificada se vuelve a serializar aunque no cambie de lugar
+            if sucias.intersection(self._ids):
+                self._reserializar = True
+            cambiadas |= sucias
+
+        if completo:
+            self._ultimo_orden = ahora
+            self._preseleccion = await run_in_threadpool(self._ordenar_todas)
+        elif cambiadas:
+            # Sólo pueden entrar al top las que cambiaron; el resto conserva su
+            # lugar relativo hasta el próximo orden completo
+            self._preseleccion = self._mejores(cambiadas.union(self._preseleccion), datetime.utcnow())
+
+        ids = list(self._preseleccion)[:self.tamanio]
+        if ids != self._ids:
+            self._reserializar = True
+
+        if self._reserializar or not self.listo:
+            self._reserializar = False
+            proyeccion = proyeccion_parcial(PropiedadOut, Propiedad)
+            filas = await get_filas_por_ids(db, ids)
+            self._items = [proyeccion.serializar_uno(fila) for fila in filas]
+            self._ids = [fila[-1] for fila in filas]
+            self._cuerpos = {}
+        self.listo = True
+
+    async def _mantener(self) -> None:
+        while True:
+            try:
+                async with self._lock:
+                    async with AsyncSessionLocal() as db:
+                        await self._refrescar(db)
+            except Exception:
+                logger.exception("Error al refrescar las propiedades destacadas")
+            await asyncio.sleep(self.refresco)
+
+    def iniciar(self) -> None:
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._mantener())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def estado(self) -> dict:
+        return {
+            "listo": self.listo,
+            "candidatas": len(self._candidatas),
+            "preseleccion": len(self._preseleccion),
+            "destacadas": self._ids,
+            "pendientes": len(self._sucias) + len(self._con_vistas),
+        }
+
+
+feed_destacadas = FeedDestacadas(
+    tamanio=DESTACADAS_TAMANIO,
+    refresco=DESTACADAS_REFRESCO_SECONDS,
+    reconstruccion=DESTACADAS_RECONSTRUCCION_SECONDS,
+)
+
+
+def _propiedad_modificada(evento: Evento) -> None:
+    if evento.masivo:
+        feed_destacadas.invalidar_todo()
+    else:
+        feed_destacadas.propiedad_modificada(evento.id)
+
+
+def _imagen_modificada(evento: Evento) -> None:
+    if evento.masivo:
+        feed_destacadas.invalidar_todo()
+        return
+    for fila in (evento.fila, evento.anterior):
+        if fila and fila.get("propiedad_id") is not None:
+            feed_destacadas.propiedad_modificada(fila["propiedad_id"])
+
+
+def _anidada_modificada(evento: Evento) -> None:
+    if evento.operacion != "INSERT":
+        feed_destacadas.anidada_modificada()
+
+
+bus_invalidacion.suscribir("propiedades", _propiedad_modificada)
+bus_invalidacion.suscribir("imagenes_propiedad", _imagen_modificada)
+for _tabla in ("agentes", "clientes", "direcciones"):
+    bus_invalidacion.suscribir(_tabla, _anidada_modificada)
+bus_invalidacion.al_reconectar(feed_destacadas.invalidar_todo)
+acumulador_contadores.al_guardar(feed_destacadas.registrar_vistas_lote)
@@ -1,18 +1,18 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 import os
 from datetime import datetime
 import shutil
 import uuid
 from typing import Optional, List
 
-from app.models.imagen import Imagen, ImagenPropiedad, ImagenAgente
+from app.models.imagen import ImagenPropiedad, ImagenAgente
 from app.schemas.imagen import (
     ImagenPropiedadCreate, 
     ImagenAgenteCreate, 
-    ImagenPropiedadOut, 
-    ImagenAgenteOut,
     ImagenUploadResponse
 )
 
@@ -46,15 +46,16 @@ def save_upload_file(upload_file: UploadFile, folder: str) -> str:
 
 # CRUD para ImagenPropiedad
 
-def create_imagen_propiedad(
-    db: Session, 
+async def create_imagen_propiedad(
+    db: AsyncSession, 
     imagen_create: ImagenPropiedadCreate, 
     file: UploadFile
 ) -> ImagenUploadResponse:
     """Crea una nueva imagen para una propiedad"""
     try:
         # Guardar archivo físicamente
-        url = save_upload_file(file, "propiedades")
+        # La escritura en disco es bloqueante, se hace fuera del event loop
+        url = await run_in_threadpool(save_upload_file, file, "propiedades")
         
         # Crear registro en la base de datos
         db_imagen = ImagenPropiedad(
@@ -64,8 +65,8 @@ def create_imagen_propiedad(
             propiedad_id=imagen_create.propiedad_id
         )
         db.add(db_imagen)
-        db.commit()
-        db.refresh(db_imagen)
+        await db.commit()
+        await db.refresh(db_imagen)
         
         # Devolver respuesta
         return ImagenUploadResponse(
@@ -75,37 +76,41 @@ def create_imagen_propiedad(
             timestamp=datetime.now()
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear imagen: {str(e)}")
 
-def get_imagen_propiedad(db: Session, imagen_id: int) -> Optional[ImagenPropiedad]:
+async def get_imagen_propiedad(db: AsyncSession, imagen_id: int) -> Optional[ImagenPropiedad]:
     """Obtiene una imagen de propiedad por su ID"""
-    return db.query(ImagenPropiedad).filter(ImagenPropiedad.id == imagen_id).first()
+    result = await db.execute(select(ImagenPropiedad).filter(ImagenPropiedad.id == imagen_id))
+    return result.scalars().first()
 
-def get_imagenes_by_propiedad(db: Session, propiedad_id: int) -> List[ImagenPropiedad]:
+async def get_imagenes_by_propiedad(db: AsyncSession, propiedad_id: int) -> List[ImagenPropiedad]:
     """Obtiene todas las imágenes asociadas a una propiedad"""
-    return db.query(ImagenPropiedad).filter(ImagenPropiedad.propiedad_id == propiedad_id).all()
+    result = await db.execute(select(ImagenPropiedad).filter(ImagenPropiedad.propiedad_id == propiedad_id))
+    return list(result.scalars().all())
 
-def set_imagen_principal_propiedad(db: Session, propiedad_id: int, imagen_id: int) -> bool:
+async def set_imagen_principal_propiedad(db: AsyncSession, propiedad_id: int, imagen_id: int) -> bool:
     """Establece una imagen como principal para una propiedad"""
     try:
         # Primero, establecer todas las imágenes como no principales
-        imagenes = db.query(ImagenPropiedad).filter(
+        result = await db.execute(select(ImagenPropiedad).filter(
             ImagenPropiedad.propiedad_id == propiedad_id
-        ).all()
+        ))
+        imagenes = result.scalars().all()
         
         for img in imagenes:
             if img.tipo == "principal":
                 img.tipo = "secundaria"
         
         # Establecer la imagen seleccionada como principal
-        imagen = db.query(ImagenPropiedad).filter(
+        result = await db.execute(select(ImagenPropiedad).filter(
             ImagenPropiedad.id == imagen_id,
             ImagenPropiedad.propiedad_id == propiedad_id
-        ).first()
+        ))
+        imagen = result.scalars().first()
         
         if not imagen:
             raise HTTPException(
@@ -114,30 +119,30 @@ def set_imagen_principal_propiedad(db: Session, propiedad_id: int, imagen_id: in
             )
         
         imagen.tipo = "principal"
-        db.commit()
+        await db.commit()
         return True
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
-def update_imagen_propiedad(
-    db: Session, 
+async def update_imagen_propiedad(
+    db: AsyncSession, 
     imagen_id: int, 
     tipo: str
 ) -> Optional[ImagenPropiedad]:
     """Actualiza los datos de una imagen de propiedad"""
-    db_imagen = get_imagen_propiedad(db, imagen_id)
+    db_imagen = await get_imagen_propiedad(db, imagen_id)
     if not db_imagen:
         return None
     
     db_imagen.tipo = tipo
-    db.commit()
-    db.refresh(db_imagen)
+    await db.commit()
+    await db.refresh(db_imagen)
     return db_imagen
 
-def delete_imagen_propiedad(db: Session, imagen_id: int) -> bool:
+async def delete_imagen_propiedad(db: AsyncSession, imagen_id: int) -> bool:
     """Elimina una imagen de propiedad"""
-    db_imagen = get_imagen_propiedad(db, imagen_id)
+    db_imagen = await get_imagen_propiedad(db, imagen_id)
     if not db_imagen:
         return False
     
@@ -150,21 +155,22 @@ def delete_imagen_propiedad(db: Session, imagen_id: int) -> bool:
         # Si no se puede eliminar el archivo, continuamos de todas formas
         pass
     
-    db.delete(db_imagen)
-    db.commit()
+    await db.delete(db_imagen)
+    await db.commit()
     return True
 
 # CRUD para ImagenAgente
 
-def create_imagen_agente(
-    db: Session, 
+async def create_imagen_agente(
+    db: AsyncSession, 
     imagen_create: ImagenAgenteCreate, 
     file: UploadFile
 ) -> ImagenUploadResponse:
     """Crea una nueva imagen para un agente"""
     try:
         # Guardar archivo físicamente
-        url = save_upload_file(file, "agentes")
+        # La escritura en disco es bloqueante, se hace fuera del event loop
+        url = await run_in_threadpool(save_upload_file, file, "agentes")
         
         # Crear registro en la base de datos
         db_imagen = ImagenAgente(
@@ -174,8 +180,8 @@ def create_imagen_agente(
             agente_id=imagen_create.agente_id
         )
         db.add(db_imagen)
-        db.commit()
-        db.refresh(db_imagen)
+        await db.commit()
+        await db.refresh(db_imagen)
         
         # Devolver respuesta
         return ImagenUploadResponse(
@@ -185,37 +191,41 @@ def create_imagen_agente(
             timestamp=datetime.now()
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear imagen: {str(e)}")
 
-def get_imagen_agente(db: Session, imagen_id: int) -> Optional[ImagenAgente]:
+async def get_imagen_agente(db: AsyncSession, imagen_id: int) -> Optional[ImagenAgente]:
     """Obtiene una imagen de agente por su ID"""
-    return db.query(ImagenAgente).filter(ImagenAgente.id == imagen_id).first()
+    result = await db.execute(select(ImagenAgente).filter(ImagenAgente.id == imagen_id))
+    return result.scalars().first()
 
-def get_imagenes_by_agente(db: Session, agente_id: int) -> List[ImagenAgente]:
+async def get_imagenes_by_agente(db: AsyncSession, agente_id: int) -> List[ImagenAgente]:
     """Obtiene todas las imágenes asociadas a un agente"""
-    return db.query(ImagenAgente).filter(ImagenAgente.agente_id == agente_id).all()
+    result = await db.execute(select(ImagenAgente).filter(ImagenAgente.agente_id == agente_id))
+    return list(result.scalars().all())
 
-def set_imagen_principal_agente(db: Session, agente_id: int, imagen_id: int) -> bool:
+async def set_imagen_principal_agente(db: AsyncSession, agente_id: int, imagen_id: int) -> bool:
     """Establece una imagen como principal para un agente"""
     try:
         # Primero, establecer todas las imágenes como no principales
-        imagenes = db.query(ImagenAgente).filter(
+        result = await db.execute(select(ImagenAgente).filter(
             ImagenAgente.agente_id == agente_id
-        ).all()
+        ))
+        imagenes = result.scalars().all()
         
         for img in imagenes:
             if img.tipo == "principal":
                 img.tipo = "secundaria"
         
         # Establecer la imagen seleccionada como principal
-        imagen = db.query(ImagenAgente).filter(
+        result = await db.execute(select(ImagenAgente).filter(
             ImagenAgente.id == imagen_id,
             ImagenAgente.agente_id == agente_id
-        ).first()
+        ))
+        imagen = result.scalars().first()
         
         if not imagen:
             raise HTTPException(
@@ -224,30 +234,30 @@ def set_imagen_principal_agente(db: Session, agente_id: int, imagen_id: int) ->
             )
         
         imagen.tipo = "principal"
-        db.commit()
+        await db.commit()
         return True
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
-def update_imagen_agente(
-    db: Session, 
+async def update_imagen_agente(
+    db: AsyncSession, 
     imagen_id: int, 
     tipo: str
 ) -> Optional[ImagenAgente]:
     """Actualiza los datos de una imagen de agente"""
-    db_imagen = get_imagen_agente(db, imagen_id)
+    db_imagen = await get_imagen_agente(db, imagen_id)
     if not db_imagen:
         return None
     
     db_imagen.tipo = tipo
-    db.commit()
-    db.refresh(db_imagen)
+    await db.commit()
+    await db.refresh(db_imagen)
     return db_imagen
 
-def delete_imagen_agente(db: Session, imagen_id: int) -> bool:
+async def delete_imagen_agente(db: AsyncSession, imagen_id: int) -> bool:
     """Elimina una imagen de agente"""
-    db_imagen = get_imagen_agente(db, imagen_id)
+    db_imagen = await get_imagen_agente(db, imagen_id)
     if not db_imagen:
         return False
     
@@ -260,6 +270,6 @@ def delete_imagen_agente(db: Session, imagen_id: int) -> bool:
         # Si no se puede eliminar el archivo, continuamos de todas formas
         pass
     
-    db.delete(db_imagen)
-    db.commit()
+    await db.delete(db_imagen)
+    await db.commit()
     return True
\ No newline at end of file
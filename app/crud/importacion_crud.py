@@ -0,0 +1,288 @@
+import csv
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache_busquedas import cache_busquedas
+from app.core.cache_entidades import cache_propiedades
+from app.core.config import IMPORTACIONES_DIR
+from app.core.database import AsyncSessionLocal
+from app.core.invalidacion import notificar_masivo, silenciar
+from app.models.direccion import Direccion
+from app.models.importacion import Importacion, ImportacionError, PENDIENTE, EN_CURSO, COMPLETADA, FALLIDA
+from app.models.propiedad import Propiedad
+from app.schemas.propiedad import PropiedadCreate
+
+logger = logging.getLogger(__name__)
+
+# Filas por transacción: validación, INSERT de direcciones y propiedades y avance del job
+TAMANIO_LOTE = 1000
+EXTENSIONES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+Fila = Tuple[int, Any]  # (número de fila de datos, dict o mensaje de error de lectura)
+
+def formato_de_archivo(nombre: Optional[str]) -> Optional[str]:
+    """Deducir el formato (csv o ndjson) por la extensión del archivo."""
+    return EXTENSIONES.get(os.path.splitext(nombre or "")[1].lower())
+
+def guardar_archivo(upload_file: UploadFile) -> str:
+    """Guarda el archivo subido; queda en disco para poder reanudar la importación."""
+    os.makedirs(IMPORTACIONES_DIR, exist_ok=True)
+    ruta = os.path.join(IMPORTACIONES_DIR, f"{uuid.uuid4()}{os.path.splitext(upload_file.filename or '')[1]}")
+    try:
+        with open(ruta, "wb") as destino:
+            shutil.copyfileobj(upload_file.file, destino)
+    finally:
+        upload_file.file.close()
+    return os.path.abspath(ruta)
+
+def _desaplanar(fila: Dict[Optional[str], str]) -> Dict[str, Any]:
+    """Fila CSV a dict: celdas vacías omitidas y columnas `direccion.calle` anidadas."""
+    datos: Dict[str, Any] = {}
+    for columna, valor in fila.items():
+        if columna is None or valor is None or valor == "":
+            continue
+        destino = datos
+        *padres, campo = columna.strip().split(".")
+        for padre in padres:
+            destino = destino.setdefault(padre, {})
+        destino[campo] = valor
+    return datos
+
+def leer_filas(ruta: str, formato: str) -> Iterator[Fila]:
+    """
+    Recorrer el archivo fila por fila sin cargarlo entero en memoria.
+
+    El CSV usa los mismos encabezados que la exportación (campos anidados como
+    `direccion.calle`); el NDJSON, un objeto PropiedadCreate por línea.
+    """
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        if formato == "csv":
+            for numero, fila in enumerate(csv.DictReader(f), start=1):
+                yield numero, _desaplanar(fila)
+            return
+
+        numero = 0
+        for linea in f:
+            if not linea.strip():
+                continue
+            numero += 1
+            try:
+                datos = json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, f"JSON inválido: {e.msg}"
+                continue
+            yield numero, datos if isinstance(datos, dict) else "Se esperaba un objeto JSON"
+
+def _siguiente_lote(filas: Iterator[Fila], tamanio: int) -> List[Fila]:
+    return list(islice(filas, tamanio))
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc']) or 'fila'}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+def validar_lote(lote: List[Fila]) -> Tuple[List[Tuple[int, PropiedadCreate]], List[Tuple[int, str]]]:
+    """
+    Validar un lote de filas con PropiedadCreate.
+
+    Returns:
+        (filas válidas, errores) como listas de (número de fila, propiedad/mensaje)
+    """
+    validas, errores = [], []
+    for numero, datos in lote:
+        if isinstance(datos, str):
+            errores.append((numero, datos))
+            continue
+        if "direccion" in datos and "direccion_id" not in datos:
+            # direccion_id es obligatorio en el esquema: se completa con la dirección que se crea
+            datos["direccion_id"] = 0
+        try:
+            validas.append((numero, PropiedadCreate.model_validate(datos)))
+        except ValidationError as e:
+            errores.append((numero, _mensaje_validacion(e)))
+    return validas, errores
+
+async def _insertar(db: AsyncSession, validas: List[Tuple[int, PropiedadCreate]], agente_id: Optional[int]) -> int:
+    """
+    Insertar las direcciones anidadas y las propiedades con un INSERT por tabla.
+    """
+    con_direccion = [i for i, (_, propiedad) in enumerate(validas) if propiedad.direccion is not None]
+    direccion_ids: Dict[int, int] = {}
+    if con_direccion:
+        result = await db.execute(
+            insert(Direccion).returning(Direccion.id, sort_by_parameter_order=True),
+            [validas[i][1].direccion.model_dump() for i in con_direccion]
+        )
+        direccion_ids = dict(zip(con_direccion, result.scalars().all()))
+
+    filas = []
+    for i, (_, propiedad) in enumerate(validas):
+        datos = propiedad.model_dump(exclude={"direccion"})
+        datos["superficie_total"] = propiedad.superficie_total
+        if i in direccion_ids:
+            datos["direccion_id"] = direccion_ids[i]
+        if agente_id and not datos.get("agente_id"):
+            datos["agente_id"] = agente_id
+        filas.append(datos)
+
+    result = await db.execute(insert(Propiedad).returning(Propiedad.id, sort_by_parameter_order=True), filas)
+    return len(result.scalars().all())
+
+async def _insertar_aislando_errores(
+    db: AsyncSession,
+    validas: List[Tuple[int, PropiedadCreate]],
+    agente_id: Optional[int]
+) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    Insertar el lote entero; si la base rechaza alguna fila (FK inexistente,
+    etc.) se reintenta fila por fila para reportar sólo las que fallan.
+    """
+    try:
+        async with db.begin_nested():
+            return await _insertar(db, validas, agente_id), []
+    except DBAPIError:
+        pass
+
+    creadas, errores = 0, []
+    for numero, propiedad in validas:
+        try:
+            async with db.begin_nested():
+                creadas += await _insertar(db, [(numero, propiedad)], agente_id)
+        except DBAPIError as e:
+            errores.append((numero, str(e.orig).strip().splitlines()[0]))
+    return creadas, errores
+
+async def _bloquear(db: AsyncSession, importacion_id: int) -> Optional[Importacion]:
+    stmt = (
+        select(Importacion)
+        .filter(Importacion.id == importacion_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def crear_importacion(
+    db: AsyncSession,
+    archivo: str,
+    formato: str,
+    nombre_original: Optional[str] = None,
+    agente_id: Optional[int] = None
+) -> Importacion:
+    """
+    Registrar una importación pendiente sobre un archivo ya guardado en disco.
+    """
+    importacion = Importacion(
+        archivo=archivo,
+        nombre_original=nombre_original,
+        formato=formato,
+        estado=PENDIENTE,
+        agente_id=agente_id,
+        filas_procesadas=0,
+        filas_creadas=0,
+        filas_con_error=0
+    )
+    db.add(importacion)
+    await db.commit()
+    return importacion
+
+async def get_importacion(db: AsyncSession, importacion_id: int) -> Optional[Importacion]:
+    return await db.get(Importacion, importacion_id)
+
+async def get_errores_importacion(db: AsyncSession, importacion_id: int, skip: int = 0, limit: int = 100) -> List[ImportacionError]:
+    result = await db.execute(
+        select(ImportacionError)
+        .filter(ImportacionError.importacion_id == importacion_id)
+        .order_by(ImportacionError.fila)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+async def procesar_importacion(importacion_id: int, tamanio_lote: int = TAMANIO_LOTE) -> Optional[Importacion]:
+    """
+    Procesar (o reanudar) una importación.
+
+    Cada lote se valida, se inserta y registra su avance y sus errores en una
+    sola transacción, así que al reanudar se saltean exactamente las filas ya
+    procesadas. La fila de la importación se bloquea en cada lote: si otro
+    proceso la avanzó mientras tanto, este se retira.
+    """
+    async with AsyncSessionLocal() as db:
+        importacion = await _bloquear(db, importacion_id)
+        if importacion is None or importacion.estado == COMPLETADA:
+            return importacion
+        importacion.estado = EN_CURSO
+        importacion.ultimo_error = None
+        importacion.fecha_modificacion = datetime.utcnow()
+        procesadas = importacion.filas_procesadas
+        await db.commit()
+
+        filas = leer_filas(importacion.archivo, importacion.formato)
+        try:
+            # Saltear lo ya importado en una corrida anterior
+            await run_in_threadpool(_siguiente_lote, filas, procesadas)
+            while True:
+                lote = await run_in_threadpool(_siguiente_lote, filas, tamanio_lote)
+                if not lote:
+                    break
+                validas, errores = await run_in_threadpool(validar_lote, lote)
+
+                importacion = await _bloquear(db, importacion_id)
+                if importacion.filas_procesadas != procesadas:
+                    await db.rollback()
+                    logger.warning("La importación %s está siendo procesada por otro proceso", importacion_id)
+                    return importacion
+
+                creadas = 0
+                if validas:
+                    # Un solo aviso por lote en lugar de uno por fila insertada
+                    await silenciar(db)
+                    await notificar_masivo(db, "propiedades", "INSERT")
+                    creadas, errores_db = await _insertar_aislando_errores(db, validas, importacion.agente_id)
+                    errores += errores_db
+                db.add_all([
+                    ImportacionError(importacion_id=importacion_id, fila=numero, error=mensaje)
+                    for numero, mensaje in errores
+                ])
+                importacion.filas_procesadas += len(lote)
+                importacion.filas_creadas += creadas
+                importacion.filas_con_error += len(errores)
+                importacion.fecha_modificacion = datetime.utcnow()
+                await db.commit()
+                procesadas = importacion.filas_procesadas
+                if creadas:
+                    # Evaluar cada fila contra cada búsqueda cacheada no compensa en lotes grandes
+                    cache_busquedas.limpiar()
+                    # Descarta los 404 cacheados de los IDs recién creados
+                    await cache_propiedades.invalidar_todo()
+
+            importacion = await _bloquear(db, importacion_id)
+            importacion.estado = COMPLETADA
+            importacion.fecha_modificacion = datetime.utcnow()
+            await db.commit()
+        except Exception as e:
+            logger.exception("Error procesando la importación %s", importacion_id)
+            await db.rollback()
+            importacion = await _bloquear(db, importacion_id)
+            importacion.estado = FALLIDA
+            importacion.ultimo_error = str(e)[:500]
+            importacion.fecha_modificacion = datetime.utcnow()
+            await db.commit()
+        finally:
+            filas.close()
+        return importacion
@@ -0,0 +1,359 @@
+"""
+Novedades de propiedades en vivo (Server-Sent Events) para los paneles de
+agentes y propietarios.
+
+En vez de consultar /propiedades/por-agente/{id} cada pocos segundos, el panel
+abre un stream y recibe cada alta, cambio de estado, edición, cambio de
+imágenes o de dirección y baja de sus propiedades:
+
+    id: 81234-5567
+    data: {"id":7,"op":"upsert","motivos":["estado"],"propiedad":{...}}
+
+La fuente es el registro de cambios (cambios_propiedades). Cada worker tiene
+una única tarea que lo lee desde su cursor cuando el bus de invalidación avisa
+que cambió una propiedad, una imagen o una dirección (y cada
+NOVEDADES_INTERVALO_SECONDS, por si el bus no avisa), arma cada evento una sola
+vez y lo reparte a las colas en memoria de los suscriptores interesados. Un
+suscriptor inactivo es una cola vacía y un keepalive cada
+NOVEDADES_KEEPALIVE_SECONDS: no ocupa conexiones a la base.
+
+El id de cada evento es el cursor del registro. Un cliente que se reconecta
+con Last-Event-ID recibe primero lo que se perdió (leído de la base) y después
+sigue en vivo. Si eso ya no se puede reconstruir (el registro se compactó o se
+perdieron demasiados cambios) recibe un evento "resync" y debe recargar la
+lista completa.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Collection, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import (
+    CAMBIOS_COMPACTAR_HORAS,
+    NOVEDADES_COLA_MAX,
+    NOVEDADES_INTERVALO_SECONDS,
+    NOVEDADES_KEEPALIVE_SECONDS,
+)
+from app.core.database import AsyncSessionLocal
+from app.core.invalidacion import Evento, bus_invalidacion
+from app.core.serializacion import proyeccion_parcial
+from app.crud.cambios_crud import Cursor, escribir_cursor, get_ultimo_cursor, xmin_actual
+from app.models.cambio import CambioPropiedad, UPSERT, DELETE
+from app.models.propiedad import Propiedad
+from app.schemas.propiedad import PropiedadOut
+
+logger = logging.getLogger(__name__)
+
+AGENTE = "agente"
+PROPIETARIO = "propietario"
+
+# A quién le interesa un cambio: ("agente", 12) o ("propietario", 40)
+Clave = Tuple[str, int]
+
+# Entradas del registro por lectura (y máximo a reconstruir al reanudar)
+LOTE = 500
+
+KEEPALIVE = b": keepalive\n\n"
+
+NOVEDADES_SUSCRIPTORES = metrics.Gauge(
+    "novedades_suscriptores", "Streams de novedades de propiedades abiertos en este worker."
+)
+NOVEDADES_EVENTOS = metrics.Contador(
+    "novedades_eventos_total", "Eventos de novedades encolados para los suscriptores."
+)
+NOVEDADES_DESBORDES = metrics.Contador(
+    "novedades_desbordes_total", "Streams cortados porque el cliente no consumía sus eventos."
+)
+
+
+def evento_sse(cursor: Cursor, datos: bytes, tipo: Optional[str] = None) -> bytes:
+    tipo = b"event: %s\n" % tipo.encode() if tipo else b""
+    return b"id: %s\n%sdata: %s\n\n" % (escribir_cursor(cursor).encode(), tipo, datos)
+
+
+def interesados(agentes: Optional[List[int]], propietarios: Optional[List[int]]) -> Set[Clave]:
+    return {(AGENTE, a) for a in agentes or ()} | {(PROPIETARIO, p) for p in propietarios or ()}
+
+
+async def cursor_reanudable(db: AsyncSession, cursor: Cursor) -> bool:
+    """
+    Si se puede retomar desde `cursor` sin perder eventos: su entrada sigue en
+    el registro y es más nueva que lo que compacta compactar_cambios.
+    """
+    result = await db.execute(
+        select(CambioPropiedad.fecha)
+        .filter(CambioPropiedad.xid == cursor[0], CambioPropiedad.id == cursor[1])
+    )
+    fecha = result.scalar()
+    return fecha is not None and fecha >= datetime.utcnow() - timedelta(hours=CAMBIOS_COMPACTAR_HORAS)
+
+
+async def get_novedades(
+    db: AsyncSession,
+    desde: Cursor,
+    claves: Collection[Clave],
+    hasta: Optional[Cursor] = None,
+    limit: int = LOTE
+) -> Tuple[Cursor, bool, List[Tuple[Clave, Cursor, bytes]]]:
+    """
+    Eventos SSE de las entradas del registro posteriores a `desde` (y hasta
+    `hasta` inclusive) para los suscriptores `claves`.
+
+    Las entradas de una misma propiedad se agrupan en un evento con la última.
+    A quien la propiedad ya no le corresponde (se reasignó o se borró) le
+    llega como "delete".
+
+    Returns:
+        (cursor de la última entrada leída, si quedan más, [(clave, cursor, evento)])
+    """
+    stmt = (
+        select(
+            CambioPropiedad.id,
+            CambioPropiedad.propiedad_id,
+            CambioPropiedad.operacion,
+            CambioPropiedad.motivo,
+            CambioPropiedad.agentes,
+            CambioPropiedad.propietarios,
+            CambioPropiedad.xid
+        )
+        .filter(
+            tuple_(CambioPropiedad.xid, CambioPropiedad.id) > tuple_(*desde),
+            CambioPropiedad.xid < xmin_actual()
+        )
+        .order_by(CambioPropiedad.xid, CambioPropiedad.id)
+        .limit(limit + 1)
+    )
+    if hasta is not None:
+        stmt = stmt.filter(tuple_(CambioPropiedad.xid, CambioPropiedad.id) <= tuple_(*hasta))
+    result = await db.execute(stmt)
+    entradas = result.all()
+    mas = len(entradas) > limit
+    entradas = entradas[:limit]
+    cursor = (entradas[-1].xid, entradas[-1].id) if entradas else desde
+
+    ultimas: Dict[int, Row] = {}
+    motivos: Dict[int, Set[str]] = defaultdict(set)
+    destinos: Dict[int, Set[Clave]] = defaultdict(set)
+    for entrada in entradas:
+        suscriptas = {c for c in interesados(entrada.agentes, entrada.propietarios) if c in claves}
+        if not suscriptas:
+            continue
+        ultimas.pop(entrada.propiedad_id, None)
+        ultimas[entrada.propiedad_id] = entrada
+        destinos[entrada.propiedad_id] |= suscriptas
+        if entrada.motivo:
+            motivos[entrada.propiedad_id].add(entrada.motivo)
+
+    proyeccion = proyeccion_parcial(PropiedadOut, Propiedad)
+    ids = [id_ for id_, entrada in ultimas.items() if entrada.operacion == UPSERT]
+    filas = {}
+    if ids:
+        result = await db.execute(
+            proyeccion.select()
+            .add_columns(Propiedad.agente_id, Propiedad.propietario_id, Propiedad.id)
+            .filter(Propiedad.id.in_(ids))
+        )
+        filas = {fila[-1]: fila for fila in result.all()}
+
+    eventos: List[Tuple[Clave, Cursor, bytes]] = []
+    for id_, entrada in ultimas.items():
+        cursor_entrada = (entrada.xid, entrada.id)
+        motivos_json = json.dumps(sorted(motivos[id_])).encode()
+        fila = filas.get(id_)
+        actuales = {(AGENTE, fila[-3]), (PROPIETARIO, fila[-2])} if fila is not None else set()
+        baja = alta = None
+        for clave in destinos[id_]:
+            if clave in actuales:
+                if alta is None:
+                    alta = evento_sse(
+                        cursor_entrada,
+                        b'{"id":%d,"op":"%s","motivos":%s,"propiedad":' % (id_, UPSERT.encode(), motivos_json)
+                        + proyeccion.serializar_uno(fila) + b"}"
+                    )
+                eventos.append((clave, cursor_entrada, alta))
+            else:
+                if baja is None:
+                    baja = evento_sse(
+                        cursor_entrada, b'{"id":%d,"op":"%s","motivos":%s}' % (id_, DELETE.encode(), motivos_json)
+                    )
+                eventos.append((clave, cursor_entrada, baja))
+    return cursor, mas, eventos
+
+
+class Suscripcion:
+    __slots__ = ("clave", "desde", "cola", "cerrada")
+
+    def __init__(self, clave: Clave, desde: Optional[Cursor], cola_max: int):
+        self.clave = clave
+        # Lo que el cliente ya recibió (Last-Event-ID), quizás de otro worker
+        self.desde = desde
+        self.cola: asyncio.Queue = asyncio.Queue(cola_max)
+        self.cerrada = False
+
+
+class DifusionNovedades:
+    def __init__(self, intervalo: float, keepalive: float, cola_max: int):
+        self.intervalo = intervalo
+        self.keepalive = keepalive
+        self.cola_max = cola_max
+        self._suscripciones: Dict[Clave, Set[Suscripcion]] = defaultdict(set)
+        # Última entrada del registro ya repartida; None si no hay suscriptores
+        self._cursor: Optional[Cursor] = None
+        self._aviso = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._tarea: Optional[asyncio.Task] = None
+
+    def avisar(self) -> None:
+        self._aviso.set()
+
+    # Suscriptores
+
+    async def suscribir(self, db: AsyncSession, clave: Clave, desde: Optional[Cursor]) -> Tuple[Suscripcion, List[bytes]]:
+        """
+        Registra un suscriptor y devuelve los eventos a entregarle antes que
+        los de su cola: "inicio" con el cursor actual si es nuevo, y si se
+        reconecta lo que se perdió desde `desde` (o "resync").
+        """
+        async with self._lock:
+            if self._cursor is None:
+                self._cursor = await get_ultimo_cursor(db)
+            hasta = self._cursor
+            suscripcion = Suscripcion(clave, desde, self.cola_max)
+            self._suscripciones[clave].add(suscripcion)
+        NOVEDADES_SUSCRIPTORES.inc()
+
+        if desde is None:
+            return suscripcion, [evento_sse(hasta, b"{}", "inicio")]
+        if desde >= hasta:
+            return suscripcion, []
+        try:
+            if await cursor_reanudable(db, desde):
+                _, mas, eventos = await get_novedades(db, desde, {clave}, hasta=hasta)
+                if not mas:
+                    return suscripcion, [evento for _, _, evento in eventos]
+        except BaseException:
+            self._quitar(suscripcion)
+            raise
+        return suscripcion, [evento_sse(hasta, b"{}", "resync")]
+
+    def _quitar(self, suscripcion: Suscripcion) -> None:
+        suscripciones = self._suscripciones.get(suscripcion.clave)
+        if suscripciones is None or suscripcion not in suscripciones:
+            return
+        suscripciones.discard(suscripcion)
+        if not suscripciones:
+            del self._suscripciones[suscripcion.clave]
+        NOVEDADES_SUSCRIPTORES.dec()
+
+    async def eventos(self, clave: Clave, desde: Optional[Cursor]) -> AsyncIterator[bytes]:
+        """
+        Contenido del stream SSE. La suscripción se registra al empezar a
+        transmitir y se quita cuando el cliente se desconecta.
+        """
+        # Sesión propia y cerrada antes de esperar eventos: un suscriptor no retiene conexiones
+        async with AsyncSessionLocal() as db:
+            suscripcion, previos = await self.suscribir(db, clave, desde)
+        try:
+            for evento in previos:
+                yield evento
+            while not (suscripcion.cerrada and suscripcion.cola.empty()):
+                try:
+                    evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    evento = KEEPALIVE
+                yield evento
+        finally:
+            self._quitar(suscripcion)
+
+    # Reparto
+
+    def _entregar(self, suscripcion: Suscripcion, cursor: Cursor, evento: bytes) -> None:
+        if suscripcion.desde is not None and cursor <= suscripcion.desde:
+            return
+        try:
+            suscripcion.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se corta su stream después de lo ya
+            # encolado y retoma desde ahí con Last-Event-ID
+            suscripcion.cerrada = True
+            self._quitar(suscripcion)
+            NOVEDADES_DESBORDES.inc()
+        else:
+            NOVEDADES_EVENTOS.inc()
+
+    async def _difundir(self, db: AsyncSession) -> None:
+        mas = True
+        while mas and self._suscripciones:
+            self._cursor, mas, eventos = await get_novedades(db, self._cursor, self._suscripciones.keys())
+            for clave, cursor, evento in eventos:
+                for suscripcion in list(self._suscripciones.get(clave, ())):
+                    self._entregar(suscripcion, cursor, evento)
+
+    async def _mantener(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._aviso.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._aviso.clear()
+            try:
+                async with self._lock:
+                    if not self._suscripciones:
+                        # Sin suscriptores no se lee el registro: el próximo empieza desde el final
+                        self._cursor = None
+                        continue
+                    async with AsyncSessionLocal() as db:
+                        await self._difundir(db)
+            except Exception:
+                logger.exception("Error al difundir las novedades de propiedades")
+
+    def iniciar(self) -> None:
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._mantener())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        # Los streams abiertos terminan; los clientes se reconectan a otro worker
+        for suscripciones in list(self._suscripciones.values()):
+            for suscripcion in suscripciones:
+                suscripcion.cerrada = True
+                try:
+                    suscripcion.cola.put_nowait(b"")
+                except asyncio.QueueFull:
+                    pass
+
+    def estado(self) -> dict:
+        return {
+            "suscriptores": sum(len(s) for s in self._suscripciones.values()),
+            "claves": len(self._suscripciones),
+            "cursor": escribir_cursor(self._cursor) if self._cursor is not None else None,
+        }
+
+
+difusion_novedades = DifusionNovedades(
+    intervalo=NOVEDADES_INTERVALO_SECONDS,
+    keepalive=NOVEDADES_KEEPALIVE_SECONDS,
+    cola_max=NOVEDADES_COLA_MAX,
+)
+
+
+def _avisar(evento: Evento) -> None:
+    difusion_novedades.avisar()
+
+
+for _tabla in ("propiedades", "imagenes_propiedad", "direcciones"):
+    bus_invalidacion.suscribir(_tabla, _avisar)
+bus_invalidacion.al_reconectar(difusion_novedades.avisar)
@@ -1,25 +1,194 @@
-from typing import Dict, List, Optional, Union, Any
+from typing import AsyncIterator, Dict, FrozenSet, List, Optional, Sequence, Tuple, Union, Any
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import or_, func, select, update, Select, Row
 
+from app.core.cache_busquedas import cache_busquedas
+from app.core.cache_entidades import cache_propiedades, empaquetar
+from app.core.concurrencia import actualizar_con_version
+from app.core.database import sesion_de_carga
+from app.core.serializacion import proyeccion_parcial
+from app.models.agente import Agente
+from app.models.cliente import Cliente
+from app.models.direccion import Direccion
+from app.models.enums import EstadoEnum
 from app.models.propiedad import Propiedad
-from app.schemas.propiedad import PropiedadCreate, PropiedadBase
+from app.schemas.propiedad import PropiedadCreate, PropiedadBase, PropiedadOut
 
-def get_propiedad(db: Session, propiedad_id: int) -> Optional[Propiedad]:
+# Relaciones que serializa PropiedadOut. En modo asíncrono no hay carga perezosa,
+# así que se cargan junto con la propiedad en la misma consulta.
+PROPIEDAD_RELACIONES = (
+    joinedload(Propiedad.direccion),
+    joinedload(Propiedad.propietario),
+    joinedload(Propiedad.agente),
+)
+
+# Estado de las propiedades visibles para el público (portada, sincronización)
+ESTADO_PUBLICADA = EstadoEnum.activo
+
+# Columnas que necesitan los controles de acceso aunque no se pidan en `fields`
+PROPIEDAD_ACCESO = (Propiedad.estado, Propiedad.agente_id, Propiedad.propietario_id)
+
+def _version_de(modelo, fk):
+    return select(modelo.version).where(modelo.id == fk).correlate(Propiedad).scalar_subquery()
+
+# Validadores para GET condicionales: la versión de la propiedad y la de cada
+# objeto anidado en PropiedadOut (el ETag cambia si cambia cualquiera). No hay
+# Last-Modified: clientes y direcciones no registran su fecha de modificación,
+# y con sólo la de la propiedad un If-Modified-Since daría 304 después de
+# cambiar un objeto anidado.
+PROPIEDAD_VALIDACION = (
+    Propiedad.version,
+    _version_de(Direccion, Propiedad.direccion_id),
+    _version_de(Cliente, Propiedad.propietario_id),
+    _version_de(Agente, Propiedad.agente_id),
+)
+
+def versiones_propiedad(propiedad: Propiedad) -> List[int]:
+    """
+    Las mismas versiones que PROPIEDAD_VALIDACION, de una propiedad con sus
+    relaciones cargadas: el PUT responde el mismo ETag que el GET del detalle.
+    """
+    anidadas = (propiedad.direccion, propiedad.propietario, propiedad.agente)
+    return [propiedad.version] + [(anidada.version or 0) if anidada is not None else 0 for anidada in anidadas]
+
+async def get_propiedad(db: AsyncSession, propiedad_id: int) -> Optional[Propiedad]:
     """
     Obtener una propiedad por su ID.
     """
-    return db.query(Propiedad).filter(Propiedad.id == propiedad_id).first()
+    stmt = (
+        select(Propiedad)
+        .options(*PROPIEDAD_RELACIONES)
+        .filter(Propiedad.id == propiedad_id)
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_propiedad_fila(db: AsyncSession, propiedad_id: int, campos: Optional[FrozenSet[str]] = None) -> Optional[Row]:
+    """
+    Obtener una propiedad como fila de columnas para serializarla con proyeccion_parcial.
+
+    Sólo se leen las columnas (y JOIN) de los campos pedidos, más las de
+    PROPIEDAD_ACCESO y PROPIEDAD_VALIDACION, que quedan al final de la fila.
+    """
+    stmt = (
+        proyeccion_parcial(PropiedadOut, Propiedad, campos).select()
+        .add_columns(*PROPIEDAD_ACCESO, *PROPIEDAD_VALIDACION)
+        .filter(Propiedad.id == propiedad_id)
+    )
+    result = await db.execute(stmt)
+    return result.first()
+
+async def get_propiedad_detalle(db: AsyncSession, propiedad_id: int, campos: Optional[FrozenSet[str]] = None) -> Optional[bytes]:
+    """
+    Detalle de una propiedad para la caché de entidades (ver empaquetar): el
+    JSON de PropiedadOut con los campos pedidos, más los controles de acceso
+    y los validadores para GET condicionales.
+    """
+    fila = await get_propiedad_fila(db, propiedad_id=propiedad_id, campos=campos)
+    if not fila:
+        return None
+    extras = fila[-(len(PROPIEDAD_ACCESO) + len(PROPIEDAD_VALIDACION)):]
+    estado, agente_id, propietario_id = extras[:len(PROPIEDAD_ACCESO)]
+    versiones = extras[len(PROPIEDAD_ACCESO):]
+    meta = {
+        "estado": estado,
+        "agente_id": agente_id,
+        "propietario_id": propietario_id,
+        "versiones": [version or 0 for version in versiones],
+    }
+    return empaquetar(meta, proyeccion_parcial(PropiedadOut, Propiedad, campos).serializar_uno(fila))
 
-def get_propiedades(db: Session, skip: int = 0, limit: int = 100) -> List[Propiedad]:
+async def get_propiedades(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Propiedad]:
     """
     Obtener todas las propiedades con paginación.
     """
-    return db.query(Propiedad).offset(skip).limit(limit).all()
+    stmt = select(Propiedad).options(*PROPIEDAD_RELACIONES).offset(skip).limit(limit)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+def aplicar_filtros(stmt: Select, filters: Optional[Dict[str, Any]]) -> Select:
+    """
+    Aplicar los filtros de búsqueda de propiedades a una consulta.
+
+    Args:
+        stmt: Consulta sobre Propiedad
+        filters: Diccionario con los filtros a aplicar
+    """
+    if not filters:
+        return stmt
+
+    # Filtro por tipo de propiedad
+    if filters.get("tipo_propiedad"):
+        stmt = stmt.filter(Propiedad.tipo_propiedad == filters["tipo_propiedad"])
+
+    # Filtro por tipo de operación
+    if filters.get("tipo_operacion"):
+        stmt = stmt.filter(Propiedad.tipo_operacion == filters["tipo_operacion"])
+
+    # Filtro por rango de precios para venta
+    if filters.get("precio_min") or filters.get("precio_max"):
+        if filters.get("tipo_operacion") == "Venta" or not filters.get("tipo_operacion"):
+            if filters.get("precio_min"):
+                stmt = stmt.filter(Propiedad.precio_venta >= filters["precio_min"])
+            if filters.get("precio_max"):
+                stmt = stmt.filter(Propiedad.precio_venta <= filters["precio_max"])
+        elif filters.get("tipo_operacion") == "Alquiler":
+            if filters.get("precio_min"):
+                stmt = stmt.filter(Propiedad.precio_alquiler >= filters["precio_min"])
+            if filters.get("precio_max"):
+                stmt = stmt.filter(Propiedad.precio_alquiler <= filters["precio_max"])
+        else:  # VentaAlquiler u otro
+            if filters.get("precio_min"):
+                stmt = stmt.filter(
+                    or_(
+                        Propiedad.precio_venta >= filters["precio_min"],
+                        Propiedad.precio_alquiler >= filters["precio_min"]
+                    )
+                )
+            if filters.get("precio_max"):
+                stmt = stmt.filter(
+                    or_(
+                        Propiedad.precio_venta <= filters["precio_max"],
+                        Propiedad.precio_alquiler <= filters["precio_max"]
+                    )
+                )
+
+    # Filtro por número mínimo de dormitorios
+    if filters.get("dormitorios"):
+        stmt = stmt.filter(Propiedad.dormitorios >= filters["dormitorios"])
 
-def get_propiedades_by_filters(
-    db: Session,
+    # Filtro por número mínimo de baños
+    if filters.get("banios"):
+        stmt = stmt.filter(Propiedad.banios >= filters["banios"])
+
+    # Filtro por superficie mínima
+    if filters.get("superficie_min"):
+        # Superficie total es calculada, así que usamos superficie_cubierta + superficie_descubierta
+        stmt = stmt.filter(
+            func.coalesce(Propiedad.superficie_cubierta, 0) +
+            func.coalesce(Propiedad.superficie_descubierta, 0) >=
+            filters["superficie_min"]
+        )
+
+    # Filtro por estado
+    if filters.get("estado"):
+        stmt = stmt.filter(Propiedad.estado == filters["estado"])
+
+    # Filtro por propietario
+    if filters.get("propietario_id"):
+        stmt = stmt.filter(Propiedad.propietario_id == filters["propietario_id"])
+
+    # Filtro por agente
+    if filters.get("agente_id"):
+        stmt = stmt.filter(Propiedad.agente_id == filters["agente_id"])
+
+    return stmt
+
+async def get_propiedades_by_filters(
+    db: AsyncSession,
     skip: int = 0,
     limit: int = 100,
     filters: Optional[Dict[str, Any]] = None,
@@ -28,7 +197,7 @@ def get_propiedades_by_filters(
 ) -> List[Propiedad]:
     """
     Obtener propiedades con filtros y ordenamiento.
-    
+
     Args:
         db: Sesión de la base de datos
         skip: Número de registros a omitir (para paginación)
@@ -37,149 +206,315 @@ def get_propiedades_by_filters(
         order_by: Campo por el que ordenar los resultados
         order_desc: Si es True, el orden es descendente
     """
-    query = db.query(Propiedad)
-    
-    if filters:
-        # Filtro por tipo de propiedad
-        if filters.get("tipo_propiedad"):
-            query = query.filter(Propiedad.tipo_propiedad == filters["tipo_propiedad"])
-        
-        # Filtro por tipo de operación
-        if filters.get("tipo_operacion"):
-            query = query.filter(Propiedad.tipo_operacion == filters["tipo_operacion"])
-        
-        # Filtro por rango de precios para venta
-        if filters.get("precio_min") or filters.get("precio_max"):
-            if filters.get("tipo_operacion") == "Venta" or not filters.get("tipo_operacion"):
-                if filters.get("precio_min"):
-                    query = query.filter(Propiedad.precio_venta >= filters["precio_min"])
-                if filters.get("precio_max"):
-                    query = query.filter(Propiedad.precio_venta <= filters["precio_max"])
-            elif filters.get("tipo_operacion") == "Alquiler":
-                if filters.get("precio_min"):
-                    query = query.filter(Propiedad.precio_alquiler >= filters["precio_min"])
-                if filters.get("precio_max"):
-                    query = query.filter(Propiedad.precio_alquiler <= filters["precio_max"])
-            else:  # VentaAlquiler u otro
-                if filters.get("precio_min"):
-                    query = query.filter(
-                        or_(
-                            Propiedad.precio_venta >= filters["precio_min"],
-                            Propiedad.precio_alquiler >= filters["precio_min"]
-                        )
-                    )
-                if filters.get("precio_max"):
-                    query = query.filter(
-                        or_(
-                            Propiedad.precio_venta <= filters["precio_max"],
-                            Propiedad.precio_alquiler <= filters["precio_max"]
-                        )
-                    )
-        
-        # Filtro por número mínimo de dormitorios
-        if filters.get("dormitorios"):
-            query = query.filter(Propiedad.dormitorios >= filters["dormitorios"])
-        
-        # Filtro por número mínimo de baños
-        if filters.get("banios"):
-            query = query.filter(Propiedad.banios >= filters["banios"])
-        
-        # Filtro por superficie mínima
-        if filters.get("superficie_min"):
-            # Superficie total es calculada, así que usamos superficie_cubierta + superficie_descubierta
-            query = query.filter(
-                func.coalesce(Propiedad.superficie_cubierta, 0) + 
-                func.coalesce(Propiedad.superficie_descubierta, 0) >= 
-                filters["superficie_min"]
-            )
-        
-        # Filtro por estado
-        if filters.get("estado"):
-            query = query.filter(Propiedad.estado == filters["estado"])
-        
-        # Filtro por propietario
-        if filters.get("propietario_id"):
-            query = query.filter(Propiedad.propietario_id == filters["propietario_id"])
-        
-        # Filtro por agente
-        if filters.get("agente_id"):
-            query = query.filter(Propiedad.agente_id == filters["agente_id"])
-    
-    # Ordenamiento
+    stmt = aplicar_filtros(select(Propiedad).options(*PROPIEDAD_RELACIONES), filters)
+    stmt = ordenar(stmt, order_by, order_desc)
+
+    # Paginación
+    result = await db.execute(stmt.offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+async def get_filas_por_ids(
+    db: AsyncSession,
+    ids: Sequence[int],
+    campos: Optional[FrozenSet[str]] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Row]:
+    """
+    Filas de proyeccion_parcial para las propiedades `ids`, en ese orden, con
+    el ID como última columna. Las que ya no existen (o, con `filters`, ya no
+    cumplen los filtros) se omiten.
+    """
+    if not ids:
+        return []
+    proyeccion = proyeccion_parcial(PropiedadOut, Propiedad, campos)
+    stmt = aplicar_filtros(proyeccion.select().add_columns(Propiedad.id).filter(Propiedad.id.in_(ids)), filters)
+    result = await db.execute(stmt)
+    por_id = {fila[-1]: fila for fila in result.all()}
+    return [por_id[id_] for id_ in ids if id_ in por_id]
+
+async def get_propiedades_json_por_ids(db: AsyncSession, ids: Sequence[int], campos: Optional[FrozenSet[str]] = None) -> bytes:
+    """Lista JSON de PropiedadOut de las propiedades `ids`, en ese orden."""
+    return proyeccion_parcial(PropiedadOut, Propiedad, campos).serializar(await get_filas_por_ids(db, ids, campos))
+
+async def buscar_propiedades_json(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: str = "id",
+    order_desc: bool = False,
+    campos: Optional[FrozenSet[str]] = None
+) -> Tuple[bytes, Optional[int]]:
+    """
+    Buscar propiedades y devolver la página serializada como JSON de PropiedadOut
+    junto con el total de resultados (None si la página quedó fuera de rango).
+
+    Los IDs de cada página se guardan en cache_busquedas: en un hit sólo se leen
+    esas filas por PK; en un miss la búsqueda completa devuelve también el total
+    (count(*) OVER ()) y los IDs para guardar, en una sola consulta.
+
+    En un hit la lectura por PK vuelve a aplicar los filtros (incluido el
+    estado publicado): una propiedad que dejó de cumplirlos no se entrega
+    aunque la invalidación todavía no haya llegado, y la entrada se descarta.
+    Los misses que se guardan se calculan en el primario: una réplica atrasada
+    dejaría en la caché una lista vieja durante todo el TTL.
+    """
+    proyeccion = proyeccion_parcial(PropiedadOut, Propiedad, campos)
+    clave = cache_busquedas.clave(filters, order_by, order_desc, skip, limit)
+    epoca = cache_busquedas.epoca
+    entrada = cache_busquedas.obtener(clave)
+
+    if entrada is not None:
+        filas = await get_filas_por_ids(db, entrada.ids, campos, filters)
+        if len(filas) < len(entrada.ids):
+            cache_busquedas.descartar(clave)
+        return proyeccion.serializar(filas), entrada.total
+
+    stmt = ordenar(
+        aplicar_filtros(proyeccion.select().add_columns(Propiedad.id, func.count().over()), filters),
+        order_by,
+        order_desc
+    )
+    async with sesion_de_carga(db, primario=cache_busquedas.habilitada) as sesion:
+        filas = (await sesion.execute(stmt.offset(skip).limit(limit))).all()
+    if filas:
+        total = filas[0][-1]
+    else:
+        total = 0 if skip == 0 else None
+    cache_busquedas.guardar(clave, [fila[-2] for fila in filas], total, epoca)
+    return proyeccion.serializar(filas), total
+
+async def get_propiedades_by_filters_json(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: str = "id",
+    order_desc: bool = False,
+    campos: Optional[FrozenSet[str]] = None
+) -> bytes:
+    """
+    Igual que get_propiedades_by_filters, pero devuelve la lista ya serializada
+    como JSON de PropiedadOut, leyendo sólo columnas y sin crear objetos ORM.
+
+    Args:
+        campos: Campos de PropiedadOut a devolver (None para todos)
+    """
+    contenido, _ = await buscar_propiedades_json(db, skip, limit, filters, order_by, order_desc, campos)
+    return contenido
+
+def columnas_de(db_propiedad: Propiedad) -> Dict[str, Any]:
+    """Valores de las columnas de una propiedad, para invalidar la caché de búsquedas."""
+    return {columna.key: getattr(db_propiedad, columna.key) for columna in Propiedad.__table__.c}
+
+async def exportar_propiedades(
+    db: AsyncSession,
+    filters: Optional[Dict[str, Any]] = None,
+    formato: str = "ndjson",
+    campos: Optional[FrozenSet[str]] = None,
+    lote: int = 1000
+) -> AsyncIterator[bytes]:
+    """
+    Recorrer todas las propiedades que cumplen los filtros y devolverlas
+    serializadas, un bloque de bytes por cada `lote` filas.
+
+    Usa un cursor del lado del servidor (yield_per), así que la memoria queda
+    acotada al tamaño del lote sin importar cuántas filas haya.
+
+    Args:
+        formato: "ndjson" (un PropiedadOut por línea) o "csv" (campos anidados aplanados)
+    """
+    proyeccion = proyeccion_parcial(PropiedadOut, Propiedad, campos)
+    stmt = ordenar(aplicar_filtros(proyeccion.select(), filters)).execution_options(yield_per=lote)
+    result = await db.stream(stmt)
+
+    if formato == "csv":
+        yield proyeccion.encabezado_csv()
+    async for filas in result.partitions():
+        if formato == "csv":
+            yield proyeccion.serializar_csv(filas)
+        else:
+            yield proyeccion.serializar_ndjson(filas)
+
+def ordenar(stmt: Select, order_by: str = "id", order_desc: bool = False) -> Select:
+    """
+    Ordenar una consulta de propiedades por un campo de Propiedad (por defecto, id).
+    """
     column = getattr(Propiedad, order_by, Propiedad.id)
     if order_desc:
         column = column.desc()
-    
-    query = query.order_by(column)
-    
-    # Paginación
-    return query.offset(skip).limit(limit).all()
+    return stmt.order_by(column)
 
-def create_propiedad(db: Session, propiedad: PropiedadCreate, agente_id: Optional[int] = None) -> Propiedad:
+async def create_propiedad(db: AsyncSession, propiedad: PropiedadCreate, agente_id: Optional[int] = None) -> Propiedad:
     """
     Crear una nueva propiedad.
     """
-    # Crear un diccionario con los datos de la propiedad
-    propiedad_data = propiedad.model_dump()
-    
+    # Crear un diccionario con los datos de la propiedad; la dirección anidada
+    # es una relación, no una columna
+    propiedad_data = propiedad.model_dump(exclude={"direccion"})
+
     # Si se proporciona un agente_id, sobrescribir el valor
     if agente_id:
         propiedad_data["agente_id"] = agente_id
-    
+
+    # Como en la importación: el default de la columna no puede leer las otras columnas
+    propiedad_data["superficie_total"] = propiedad.superficie_total
+
     # Crear la instancia de Propiedad
     db_propiedad = Propiedad(**propiedad_data)
-    
+    if propiedad.direccion is not None:
+        db_propiedad.direccion = Direccion(**propiedad.direccion.model_dump())
+
     # Agregar a la sesión y guardar
     db.add(db_propiedad)
-    db.commit()
-    db.refresh(db_propiedad)
-    
-    return db_propiedad
+    await db.commit()
+    cache_busquedas.invalidar(nuevo=columnas_de(db_propiedad))
+    # Puede haber un 404 cacheado para este ID
+    await cache_propiedades.invalidar(db_propiedad.id)
 
-def update_propiedad(db: Session, propiedad_id: int, propiedad: Union[PropiedadBase, Dict[str, Any]]) -> Optional[Propiedad]:
+    # Recargar junto con sus relaciones para poder serializarla
+    return await get_propiedad(db, propiedad_id=db_propiedad.id)
+
+async def update_propiedad(
+    db: AsyncSession,
+    propiedad_id: int,
+    propiedad: Union[PropiedadBase, Dict[str, Any]],
+    version: Optional[int] = None,
+    condiciones: Sequence[Any] = ()
+) -> Optional[Propiedad]:
     """
-    Actualizar una propiedad existente.
-    
+    Actualizar una propiedad existente con un único UPDATE ... RETURNING.
+
     Args:
         db: Sesión de la base de datos
         propiedad_id: ID de la propiedad a actualizar
         propiedad: Schema o diccionario con los datos a actualizar
+        version: Versión esperada (If-Match); None actualiza sin verificarla
+        condiciones: Condiciones de acceso que debe cumplir la fila
+
+    Raises:
+        ConflictoVersion: si la propiedad cambió de versión o no cumple las condiciones
     """
-    db_propiedad = get_propiedad(db, propiedad_id=propiedad_id)
-    if not db_propiedad:
-        return None
-    
     # Convertir el schema a diccionario si es necesario
     if hasattr(propiedad, "model_dump"):
         propiedad_data = propiedad.model_dump(exclude_unset=True)
     else:
-        propiedad_data = propiedad
-    
+        propiedad_data = dict(propiedad)
+
+    # Sólo columnas de la tabla; la versión la incrementa actualizar_con_version
+    propiedad_data = {
+        k: v for k, v in propiedad_data.items()
+        if k in Propiedad.__table__.c and k not in ("id", "version")
+    }
+
     # Actualizar la fecha de modificación
     propiedad_data["fecha_modificacion"] = datetime.utcnow()
-    
-    # Actualizar los campos de la propiedad
-    for key, value in propiedad_data.items():
-        if hasattr(db_propiedad, key):
-            setattr(db_propiedad, key, value)
-    
-    db.commit()
-    db.refresh(db_propiedad)
-    
+
+    db_propiedad = await actualizar_con_version(
+        db,
+        Propiedad,
+        propiedad_id,
+        propiedad_data,
+        version=version,
+        condiciones=condiciones,
+        relaciones=("direccion", "propietario", "agente")
+    )
+    if db_propiedad is not None:
+        cache_busquedas.invalidar(nuevo=columnas_de(db_propiedad), cambiadas=propiedad_data.keys())
+        await cache_propiedades.invalidar(propiedad_id)
     return db_propiedad
 
-def delete_propiedad(db: Session, propiedad_id: int) -> bool:
+# Por encima de esta cantidad se invalida toda la caché de propiedades de una vez
+MAX_INVALIDACIONES_INDIVIDUALES = 100
+
+async def _invalidar_cambio_masivo(valores: Dict[str, Any], ids: List[int]) -> None:
+    cache_busquedas.invalidar(cambiadas=valores.keys())
+    if len(ids) > MAX_INVALIDACIONES_INDIVIDUALES:
+        await cache_propiedades.invalidar_todo()
+    else:
+        for propiedad_id in ids:
+            await cache_propiedades.invalidar(propiedad_id)
+
+async def actualizar_propiedades_masivo(
+    db: AsyncSession,
+    valores: Dict[str, Any],
+    ids: Optional[List[int]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    solo_agente_id: Optional[int] = None,
+    lote: int = 1000
+) -> Tuple[List[int], datetime]:
+    """
+    Aplicar los mismos `valores` a muchas propiedades con un UPDATE ... RETURNING por lote.
+
+    Args:
+        db: Sesión de la base de datos
+        valores: Columnas a actualizar (p. ej. estado y/o agente_id)
+        ids: Propiedades a actualizar
+        filters: Alternativa a `ids`: filtros de búsqueda (ver aplicar_filtros)
+        solo_agente_id: Si se indica, sólo se actualizan las propiedades de ese agente
+        lote: Filas por UPDATE; cada lote se confirma por separado para no
+            retener muchos bloqueos de fila a la vez
+
+    Returns:
+        (IDs actualizados, fecha_modificacion registrada en todos ellos)
+    """
+    fecha = datetime.utcnow()
+    valores = {**valores, "fecha_modificacion": fecha, "version": Propiedad.version + 1}
+    actualizadas: List[int] = []
+
+    def ejecutar(seleccion: Select):
+        stmt = (
+            update(Propiedad)
+            .where(Propiedad.id.in_(seleccion.scalar_subquery()))
+            .values(**valores)
+            .returning(Propiedad.id)
+            .execution_options(synchronize_session=False)
+        )
+        return db.execute(stmt)
+
+    base = select(Propiedad.id)
+    if solo_agente_id is not None:
+        base = base.filter(Propiedad.agente_id == solo_agente_id)
+
+    if ids is not None:
+        pendientes = sorted(set(ids))
+        for inicio in range(0, len(pendientes), lote):
+            result = await ejecutar(base.filter(Propiedad.id.in_(pendientes[inicio:inicio + lote])))
+            actualizadas.extend(result.scalars().all())
+            await db.commit()
+        await _invalidar_cambio_masivo(valores, actualizadas)
+        return actualizadas, fecha
+
+    # Con filtros se avanza por id: las propiedades ya actualizadas pueden dejar
+    # de cumplir el filtro (p. ej. el estado) y no deben cortar el recorrido
+    base = aplicar_filtros(base, filters)
+    ultimo_id = 0
+    while True:
+        result = await ejecutar(base.filter(Propiedad.id > ultimo_id).order_by(Propiedad.id).limit(lote))
+        lote_ids = result.scalars().all()
+        await db.commit()
+        if not lote_ids:
+            break
+        actualizadas.extend(lote_ids)
+        ultimo_id = max(lote_ids)
+    await _invalidar_cambio_masivo(valores, actualizadas)
+    return actualizadas, fecha
+
+async def delete_propiedad(db: AsyncSession, propiedad_id: int) -> bool:
     """
     Eliminar una propiedad.
-    
+
     Returns:
         bool: True si se eliminó correctamente, False si no se encontró la propiedad
     """
-    db_propiedad = get_propiedad(db, propiedad_id=propiedad_id)
+    db_propiedad = await get_propiedad(db, propiedad_id=propiedad_id)
     if not db_propiedad:
         return False
-    
-    db.delete(db_propiedad)
-    db.commit()
-    
-    return True
\ No newline at end of file
+
+    viejo = columnas_de(db_propiedad)
+    await db.delete(db_propiedad)
+    await db.commit()
+    cache_busquedas.invalidar(viejo=viejo)
+    await cache_propiedades.invalidar(propiedad_id)
+
+    return True
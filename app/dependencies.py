@@ -0,0 +1,60 @@
+"""
+Autenticación de la API.
+
+Cada request autenticado manda `Authorization: Bearer <token>`. El token se
+compara por su hash SHA-256 con el de la tabla usuarios (los tokens son
+aleatorios y largos: no hace falta un hash lento).
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_read_db
+from app.models.users import User
+
+# auto_error=False: sin encabezado se sigue como anónimo y decide el endpoint
+esquema_bearer = HTTPBearer(auto_error=False)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def get_current_user_opcional(
+    credenciales: Optional[HTTPAuthorizationCredentials] = Depends(esquema_bearer),
+    db: AsyncSession = Depends(get_read_db)
+) -> Optional[User]:
+    """
+    Usuario autenticado, o None si el request no trae token.
+
+    Un token inválido responde 401 aunque el endpoint admita anónimos: el
+    cliente cree estar autenticado y no debe recibir la vista pública.
+    """
+    if credenciales is None:
+        return None
+    result = await db.execute(
+        select(User).filter(User.token_hash == hash_token(credenciales.credentials), User.activo.is_(True))
+    )
+    usuario = result.scalars().first()
+    if usuario is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return usuario
+
+
+async def get_current_user(usuario: Optional[User] = Depends(get_current_user_opcional)) -> User:
+    """Usuario autenticado; 401 si el request no trae token."""
+    if usuario is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No autenticado",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return usuario
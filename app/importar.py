@@ -0,0 +1,72 @@
+"""
+Importación masiva de propiedades desde la línea de comandos.
+
+Usa el mismo proceso que POST /propiedades/importaciones: valida cada fila con
+PropiedadCreate, inserta por lotes y registra las filas con error. Si se corta,
+se reanuda desde la última fila confirmada con --reanudar.
+
+Uso:
+    python -m app.importar propiedades.csv --agente-id 3
+    python -m app.importar --reanudar 12
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from app.core.database import AsyncSessionLocal
+from app.crud.importacion_crud import TAMANIO_LOTE, crear_importacion, formato_de_archivo, procesar_importacion
+from app.models.importacion import COMPLETADA
+
+
+async def importar(args) -> int:
+    if args.reanudar is not None:
+        importacion_id = args.reanudar
+    else:
+        formato = args.formato or formato_de_archivo(args.archivo)
+        if formato is None:
+            print("Formato no soportado. Use un archivo .csv o .ndjson o indique --formato", file=sys.stderr)
+            return 2
+        async with AsyncSessionLocal() as db:
+            importacion = await crear_importacion(
+                db,
+                # El archivo se procesa en el lugar: debe seguir ahí para reanudar
+                archivo=os.path.abspath(args.archivo),
+                formato=formato,
+                nombre_original=os.path.basename(args.archivo),
+                agente_id=args.agente_id
+            )
+            importacion_id = importacion.id
+        print(f"Importación {importacion_id} creada")
+
+    importacion = await procesar_importacion(importacion_id, tamanio_lote=args.lote)
+    if importacion is None:
+        print(f"No existe la importación {importacion_id}", file=sys.stderr)
+        return 1
+
+    print(
+        f"Importación {importacion.id}: {importacion.estado} - "
+        f"{importacion.filas_procesadas} filas procesadas, "
+        f"{importacion.filas_creadas} creadas, {importacion.filas_con_error} con error"
+    )
+    if importacion.ultimo_error:
+        print(importacion.ultimo_error, file=sys.stderr)
+    return 0 if importacion.estado == COMPLETADA else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa propiedades desde un archivo CSV o NDJSON")
+    parser.add_argument("archivo", nargs="?", help="Archivo .csv o .ndjson")
+    parser.add_argument("--formato", choices=["csv", "ndjson"], default=None, help="Por defecto, según la extensión")
+    parser.add_argument("--agente-id", type=int, default=None, help="Agente asignado a las filas que no indiquen uno")
+    parser.add_argument("--reanudar", type=int, default=None, metavar="ID", help="Reanudar una importación existente")
+    parser.add_argument("--lote", type=int, default=TAMANIO_LOTE, help="Filas por transacción")
+    args = parser.parse_args()
+    if args.archivo is None and args.reanudar is None:
+        parser.error("indique un archivo o --reanudar ID")
+
+    sys.exit(asyncio.run(importar(args)))
+
+
+if __name__ == "__main__":
+    main()
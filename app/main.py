@@ -1,9 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from app.core.config import tags_metadata
+from app.core.config import tags_metadata, READ_YOUR_WRITES_SECONDS
+from app.core.database import replica_router
+from app.core.invalidacion import bus_invalidacion
+from app.crud.contadores_crud import acumulador_contadores
+from app.crud.destacadas_crud import feed_destacadas
+from app.crud.novedades_crud import difusion_novedades
+from app.core.replicas import ReadYourWritesMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
 from app.api.v1.routes import direccion
 from app.api.v1.routes import cliente
 from app.api.v1.routes import agente
+from app.api.v1.routes import propiedad
+from app.api.v1.routes import imagen
+from app.api.v1.routes import interno
+from app.api.v1.routes import metricas
+from app.api.v1.routes import analitica
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tareas en segundo plano de cada worker
+    replica_router.iniciar()
+    bus_invalidacion.iniciar()
+    feed_destacadas.iniciar()
+    acumulador_contadores.iniciar()
+    difusion_novedades.iniciar()
+    yield
+    await difusion_novedades.detener()
+    await acumulador_contadores.detener()
+    await feed_destacadas.detener()
+    await bus_invalidacion.detener()
+    await replica_router.detener()
 
 app = FastAPI(
     title="API de Gestion Inmobiliaria",
@@ -20,11 +49,22 @@ app = FastAPI(
     docs_url="/doc",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    lifespan=lifespan
 )
 
+app.add_middleware(ReadYourWritesMiddleware, ventana=READ_YOUR_WRITES_SECONDS)
+app.add_middleware(ProfilingMiddleware)
+# Agregado último para quedar más afuera y medir el request completo
+app.add_middleware(MetricsMiddleware)
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 app.include_router(direccion.router)
 app.include_router(cliente.router)
-app.include_router(agente.router)
\ No newline at end of file
+app.include_router(agente.router)
+app.include_router(propiedad.router)
+app.include_router(imagen.router)
+app.include_router(interno.router)
+app.include_router(metricas.router)
+app.include_router(analitica.router)
\ No newline at end of file
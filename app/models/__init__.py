@@ -3,11 +3,21 @@ from app.models.imagen import Imagen, ImagenPropiedad, ImagenAgente
 from app.models.agente import Agente
 from app.models.cliente import Cliente
 from app.models.propiedad import Propiedad
+from app.models.importacion import Importacion, ImportacionError
+from app.models.version_tabla import VersionTabla
+from app.models.contador import ContadorPropiedad
+from app.models.cambio import CambioPropiedad, CompactacionCambios
+from app.models.users import User
 
 __all__ = [
     'Pais', 'Provincia', 'Localidad', 'Direccion',
     'Imagen', 'ImagenPropiedad', 'ImagenAgente',
     'Agente',
     'Cliente',
-    'Propiedad'
+    'Propiedad',
+    'Importacion', 'ImportacionError',
+    'VersionTabla',
+    'ContadorPropiedad',
+    'CambioPropiedad', 'CompactacionCambios',
+    'User'
 ]
\ No newline at end of file
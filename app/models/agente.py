@@ -20,6 +20,9 @@ class Agente(Base):
     licencia = Column(String, nullable=False)
     fecha_alta = Column(DateTime, nullable=False, default=datetime.utcnow)
     fecha_modificacion = Column(DateTime, nullable=True)
+    # Control de concurrencia optimista (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
     # Relaciones
     direccion = relationship("Direccion", back_populates="agentes")
     propiedades = relationship("Propiedad", back_populates="agente")
@@ -0,0 +1,56 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.core.database import Base
+
+# Operaciones del registro de cambios (valores expuestos en GET /propiedades/changes)
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Motivo del cambio (novedades en vivo de los paneles)
+ALTA = "alta"
+ESTADO = "estado"
+EDICION = "edicion"
+IMAGENES = "imagenes"
+DIRECCION = "direccion"
+BAJA = "baja"
+
+class CambioPropiedad(Base):
+    """
+    Registro de cambios (outbox) de propiedades para la sincronización incremental.
+
+    Lo escriben los triggers de la migración a9d4e6b2f815 en la misma transacción
+    que la modificación: una fila por propiedad creada, modificada o borrada
+    (lápida), y también cuando cambian sus imágenes o su dirección.
+
+    `xid` es la transacción que escribió la fila. Los clientes avanzan por
+    (xid, id) y sólo se entregan filas de transacciones anteriores al xmin del
+    snapshot, así una transacción larga que confirma tarde no queda detrás del
+    cursor.
+
+    `agentes`/`propietarios` son a quiénes les interesa el cambio (migración
+    c5e1f7a3d926): los actuales de la propiedad y, si se reasignó, también los
+    anteriores. Las entradas previas a esa migración no los tienen. En SQLite
+    (base de benchmarks/microbench.py) se guardan como JSON.
+    """
+    __tablename__ = "cambios_propiedades"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    propiedad_id = Column(Integer, nullable=False, index=True)
+    operacion = Column(String(6), nullable=False)
+    motivo = Column(String(9), nullable=True)
+    agentes = Column(ARRAY(Integer).with_variant(JSON, "sqlite"), nullable=True)
+    propietarios = Column(ARRAY(Integer).with_variant(JSON, "sqlite"), nullable=True)
+    xid = Column(BigInteger, nullable=False)
+    fecha = Column(DateTime, nullable=False)
+
+class CompactacionCambios(Base):
+    """
+    Compactaciones del registro de cambios. Las lápidas anteriores a (xid,
+    cambio_id) se borraron: un cursor más viejo debe volver a sincronizar todo.
+    """
+    __tablename__ = "compactaciones_cambios"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    xid = Column(BigInteger, nullable=False)
+    cambio_id = Column(BigInteger, nullable=False)
+    fecha = Column(DateTime, nullable=False)
@@ -19,6 +19,9 @@ class Cliente (Base):
     fecha_alta = Column(DateTime, default=datetime.utcnow)
     genero = Column(genero_enum, nullable=True)
     situacion_fiscal = Column(situacion_fiscal_enum, nullable=True)
+    # Control de concurrencia optimista (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
     
     #Relaciones
     direccion_id = Column(Integer, ForeignKey("direcciones.id"), nullable=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+from app.core.database import Base
+
+# Granularidades de los contadores
+HORA = "hora"
+DIA = "dia"
+
+class ContadorPropiedad(Base):
+    """
+    Vistas y clics de contacto de una propiedad, agregados por hora y por día.
+
+    Se escribe en lotes desde el acumulador de cada worker (contadores_crud).
+    No tiene FK a propiedades: una vista registrada justo antes de borrar la
+    propiedad no debe hacer fallar el lote completo; las consultas hacen JOIN.
+    """
+    __tablename__ = "contadores_propiedad"
+
+    propiedad_id = Column(Integer, primary_key=True)
+    granularidad = Column(String(4), primary_key=True)
+    inicio = Column(DateTime, primary_key=True)
+    vistas = Column(BigInteger, nullable=False, default=0)
+    contactos = Column(BigInteger, nullable=False, default=0)
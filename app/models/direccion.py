@@ -44,6 +44,9 @@ class Direccion(Base):
     observaciones = Column(String, nullable=True)
     codigo_postal = Column(Integer, index=True)
     barrio = Column(String, index=True, nullable=True)
+    # Control de concurrencia optimista (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
     #Relaciones
     localidad_id = Column(Integer, ForeignKey("localidades.id"))
     localidad = relationship("Localidad", back_populates="direcciones")
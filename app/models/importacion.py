@@ -0,0 +1,39 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from datetime import datetime
+
+# Estados de una importación
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADA = "completada"
+FALLIDA = "fallida"
+
+class Importacion(Base):
+    __tablename__ = "importaciones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    archivo = Column(String, nullable=False)  # Ruta del archivo subido, se relee al reanudar
+    nombre_original = Column(String, nullable=True)
+    formato = Column(String(10), nullable=False)  # csv | ndjson
+    estado = Column(String(20), nullable=False, default=PENDIENTE, index=True)
+    agente_id = Column(Integer, ForeignKey("agentes.id"), nullable=True)  # Agente por defecto de las filas
+    # Progreso: se actualiza en la misma transacción que cada lote insertado
+    filas_procesadas = Column(Integer, nullable=False, default=0)
+    filas_creadas = Column(Integer, nullable=False, default=0)
+    filas_con_error = Column(Integer, nullable=False, default=0)
+    ultimo_error = Column(String, nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_modificacion = Column(DateTime, nullable=True)
+    # Relaciones
+    errores = relationship("ImportacionError", back_populates="importacion", cascade="all, delete-orphan")
+
+class ImportacionError(Base):
+    __tablename__ = "importacion_errores"
+
+    id = Column(Integer, primary_key=True)
+    importacion_id = Column(Integer, ForeignKey("importaciones.id", ondelete="CASCADE"), nullable=False, index=True)
+    fila = Column(Integer, nullable=False)  # Número de fila de datos (desde 1, sin contar el encabezado)
+    error = Column(String, nullable=False)
+    # Relaciones
+    importacion = relationship("Importacion", back_populates="errores")
@@ -31,6 +31,10 @@ class Propiedad (Base):
     agente_id = Column(Integer, ForeignKey("agentes.id"), nullable=True) # Agente FK
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
     fecha_modificacion = Column(DateTime, nullable=True)
+    # Control de concurrencia optimista (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Las actualizaciones hechas con la sesión también verifican e incrementan la versión
+    __mapper_args__ = {"version_id_col": version}
     # Relaciones
     direccion = relationship("Direccion", back_populates="propiedades")
     propietario = relationship("Cliente", back_populates="propiedades")
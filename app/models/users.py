@@ -0,0 +1,28 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from datetime import datetime
+
+class User(Base):
+    """
+    Usuario de la API. Se autentica con un token (Authorization: Bearer) del
+    que sólo se guarda el hash SHA-256; los tokens se emiten con
+    `python -m app.crear_usuario`.
+
+    Un agente ve y modifica las propiedades de `agente_id`; un cliente, las
+    propiedades de las que es propietario (`cliente_id`).
+    """
+    __tablename__ = "usuarios"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String(255), nullable=False, unique=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    is_admin = Column(Boolean, nullable=False, default=False)
+    is_agente = Column(Boolean, nullable=False, default=False)
+    agente_id = Column(Integer, ForeignKey("agentes.id"), nullable=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=True)
+    activo = Column(Boolean, nullable=False, default=True)
+    fecha_alta = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Relaciones
+    agente = relationship("Agente")
+    cliente = relationship("Cliente")
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, DateTime, String
+from app.core.database import Base
+
+# Tablas cuyo contador mantiene el trigger incrementar_version_tabla
+TABLAS_VERSIONADAS = ("paises", "provincias", "localidades")
+
+class VersionTabla(Base):
+    """
+    Contador de cambios por tabla. Lo incrementa un trigger a nivel de sentencia
+    en cada INSERT, UPDATE, DELETE o TRUNCATE (también los hechos fuera de la API),
+    y sirve como validador para los GET condicionales de los listados.
+    """
+    __tablename__ = "versiones_tablas"
+
+    tabla = Column(String(63), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    fecha_modificacion = Column(DateTime, nullable=False)
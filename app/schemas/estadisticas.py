@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import List
+from datetime import datetime
+
+
+class PropiedadPopularidad(BaseModel):
+    propiedad_id: int = Field(..., title="ID de la propiedad", description="Identificador de la propiedad")
+    nombre: str = Field(..., title="Nombre", description="Nombre de la propiedad")
+    vistas: int = Field(..., title="Vistas", description="Vistas del detalle en el período")
+    contactos: int = Field(..., title="Contactos", description="Clics de contacto en el período")
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class ContadoresDia(BaseModel):
+    fecha: datetime = Field(..., title="Fecha", description="Inicio del día (UTC)")
+    vistas: int = Field(..., title="Vistas", description="Vistas del día")
+    contactos: int = Field(..., title="Contactos", description="Clics de contacto del día")
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class EstadisticasAgente(BaseModel):
+    agente_id: int = Field(..., title="ID del agente", description="Identificador del agente")
+    desde: datetime = Field(..., title="Desde", description="Inicio del período (UTC)")
+    vistas: int = Field(..., title="Vistas", description="Vistas de todas sus propiedades en el período")
+    contactos: int = Field(..., title="Contactos", description="Clics de contacto de todas sus propiedades en el período")
+    por_dia: List[ContadoresDia] = Field(..., title="Por día", description="Vistas y contactos por día")
+    mas_vistas: List[PropiedadPopularidad] = Field(..., title="Más vistas", description="Sus propiedades más vistas en el período")
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel, HttpUrl, Field, validator
 from datetime import datetime
 
@@ -40,7 +40,7 @@ class ImagenPropiedadCreate(ImagenCreate):
     """Esquema para crear una nueva imagen de propiedad"""
     propiedad_id: int = Field(..., title="ID de la propiedad", 
                              description="ID de la propiedad a la que pertenece la imagen")
-    tipo_imagen: str = Field("propiedad", const=True, 
+    tipo_imagen: Literal["propiedad"] = Field("propiedad", 
                            description="Tipo de relación para la imagen (siempre 'propiedad')")
 
 class ImagenPropiedadOut(ImagenOut):
@@ -53,7 +53,7 @@ class ImagenAgenteCreate(ImagenCreate):
     """Esquema para crear una nueva imagen de agente"""
     agente_id: int = Field(..., title="ID del agente", 
                           description="ID del agente al que pertenece la imagen")
-    tipo_imagen: str = Field("agente", const=True, 
+    tipo_imagen: Literal["agente"] = Field("agente", 
                            description="Tipo de relación para la imagen (siempre 'agente')")
 
 class ImagenAgenteOut(ImagenOut):
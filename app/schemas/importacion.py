@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+class ImportacionOut(BaseModel):
+    id: int = Field(..., title="ID de la importación", description="Identificador único de la importación")
+    nombre_original: Optional[str] = Field(None, title="Archivo", description="Nombre del archivo subido")
+    formato: str = Field(..., title="Formato", description="Formato del archivo (csv o ndjson)")
+    estado: str = Field(..., title="Estado", description="pendiente, en_curso, completada o fallida")
+    agente_id: Optional[int] = Field(None, title="ID del agente", description="Agente asignado por defecto a las propiedades importadas")
+    filas_procesadas: int = Field(..., title="Filas procesadas", description="Filas leídas hasta el momento (también es el punto de reanudación)")
+    filas_creadas: int = Field(..., title="Filas creadas", description="Propiedades creadas")
+    filas_con_error: int = Field(..., title="Filas con error", description="Filas rechazadas, ver /errores")
+    ultimo_error: Optional[str] = Field(None, title="Último error", description="Error que interrumpió la importación, si lo hubo")
+    fecha_creacion: datetime = Field(..., title="Fecha de creación", description="Fecha de creación de la importación")
+    fecha_modificacion: Optional[datetime] = Field(None, title="Fecha de modificación", description="Fecha del último avance")
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class ImportacionErrorOut(BaseModel):
+    fila: int = Field(..., title="Fila", description="Número de fila de datos, desde 1 y sin contar el encabezado")
+    error: str = Field(..., title="Error", description="Motivo por el que se rechazó la fila")
+
+    model_config = {
+        "from_attributes": True
+    }
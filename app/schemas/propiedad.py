@@ -1,7 +1,7 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from pydantic import BaseModel, Field, ValidationInfo, field_validator, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
-from app.models.enums import TipoPropiedadEnum, TipoOperacionEnum, EstadoEnum
+from app.models.enums import TipoPropeidadEnum as TipoPropiedadEnum, TipoOperacionEnum, EstadoEnum
 from app.schemas.direccion import DireccionOut
 from app.schemas.cliente import ClienteOut
 from app.schemas.agente import AgenteOut
@@ -23,22 +23,22 @@ class PropiedadBase(BaseModel):
     amoblado: Optional[bool] = Field(None, title="Amoblado", description="Indica si la propiedad está amoblada o no")
     superficie_cubierta: Optional[int] = Field(None, title="Superficie cubierta", description="Superficie cubierta en m2")
     superficie_descubierta: Optional[int] = Field(None, title="Superficie descubierta", description="Superficie descubierta en m2")
-    estado: EstadoEnum = Field(EstadoEnum.BORRADOR, title="Estado", description="Estado de la propiedad (ej. 'Borrador', 'Publicada', etc.)")
+    estado: EstadoEnum = Field(EstadoEnum.borrador, title="Estado", description="Estado de la propiedad (ej. 'Borrador', 'Publicada', etc.)")
     direccion_id: int = Field(..., title="ID de la dirección", description="ID de la dirección de la propiedad")  # Cambio a obligatorio
     propietario_id: Optional[int] = Field(None, title="ID del propietario", description="ID del propietario de la propiedad")
     agente_id: Optional[int] = Field(None, title="ID del agente", description="ID del agente a cargo de la propiedad")
     portada_id: Optional[int] = Field(None, title="ID de la portada", description="ID de la imagen de portada de la propiedad")
 
     @field_validator('precio_venta')
-    def validate_precio_venta(cls, v, values):
-        tipo_operacion = values.get('tipo_operacion')
+    def validate_precio_venta(cls, v, info: ValidationInfo):
+        tipo_operacion = info.data.get('tipo_operacion')
         if tipo_operacion in ['Venta', 'VentaAlquiler'] and v is None:
             raise ValueError('El precio de venta es obligatorio para propiedades en venta')
         return v
 
     @field_validator('precio_alquiler')
-    def validate_precio_alquiler(cls, v, values):
-        tipo_operacion = values.get('tipo_operacion')
+    def validate_precio_alquiler(cls, v, info: ValidationInfo):
+        tipo_operacion = info.data.get('tipo_operacion')
         if tipo_operacion in ['Alquiler', 'VentaAlquiler'] and v is None:
             raise ValueError('El precio de alquiler es obligatorio para propiedades en alquiler')
         return v
@@ -81,4 +81,49 @@ class PropiedadOut(PropiedadBase):
 
     model_config = {
         "from_attributes": True
-    }
\ No newline at end of file
+    }
+
+class FiltrosPropiedad(BaseModel):
+    """Los mismos filtros que acepta la búsqueda de propiedades"""
+    tipo_propiedad: Optional[TipoPropiedadEnum] = Field(None, title="Tipo de propiedad", description="Filtrar por tipo de propiedad")
+    tipo_operacion: Optional[TipoOperacionEnum] = Field(None, title="Tipo de operación", description="Filtrar por tipo de operación")
+    precio_min: Optional[int] = Field(None, title="Precio mínimo", description="Precio mínimo")
+    precio_max: Optional[int] = Field(None, title="Precio máximo", description="Precio máximo")
+    dormitorios: Optional[int] = Field(None, title="Dormitorios", description="Número mínimo de dormitorios")
+    banios: Optional[int] = Field(None, title="Baños", description="Número mínimo de baños")
+    superficie_min: Optional[int] = Field(None, title="Superficie mínima", description="Superficie mínima total en m2")
+    estado: Optional[EstadoEnum] = Field(None, title="Estado", description="Estado actual de la propiedad")
+    propietario_id: Optional[int] = Field(None, title="ID del propietario", description="ID del propietario")
+    agente_id: Optional[int] = Field(None, title="ID del agente", description="ID del agente")
+
+class PropiedadesCambioMasivo(BaseModel):
+    """Esquema para cambiar el estado o el agente de muchas propiedades a la vez"""
+    ids: Optional[List[int]] = Field(None, max_length=10000, title="IDs", description="Propiedades a actualizar")
+    filtros: Optional[FiltrosPropiedad] = Field(None, title="Filtros", description="Actualizar todas las propiedades que cumplan estos filtros")
+    estado: Optional[EstadoEnum] = Field(None, title="Estado", description="Nuevo estado")
+    agente_id: Optional[int] = Field(None, title="ID del agente", description="Nuevo agente a cargo (null para desasignar)")
+
+    @model_validator(mode="after")
+    def validate_seleccion(self):
+        if (self.ids is None) == (self.filtros is None):
+            raise ValueError("Indique ids o filtros (solo uno de los dos)")
+        if self.filtros is not None and not self.filtros.model_dump(exclude_none=True):
+            raise ValueError("Indique al menos un filtro")
+        if self.estado is None and "agente_id" not in self.model_fields_set:
+            raise ValueError("Indique el nuevo estado y/o agente_id")
+        return self
+
+class CambioMasivoResultado(BaseModel):
+    actualizadas: List[int] = Field(..., title="Actualizadas", description="IDs de las propiedades actualizadas")
+    omitidas: List[int] = Field(..., title="Omitidas", description="IDs pedidos que no existen o que el usuario no puede modificar")
+    fecha_modificacion: datetime = Field(..., title="Fecha de modificación", description="Fecha registrada en todas las propiedades actualizadas")
+
+class CambioPropiedadOut(BaseModel):
+    id: int = Field(..., title="ID de la propiedad", description="Propiedad que cambió")
+    op: Literal["upsert", "delete"] = Field(..., title="Operación", description="upsert: creada o modificada; delete: borrada o ya no visible")
+    propiedad: Optional[PropiedadOut] = Field(None, title="Propiedad", description="Estado actual (sólo en upsert)")
+
+class CambiosPropiedadesOut(BaseModel):
+    cursor: str = Field(..., title="Cursor", description="Valor de `since` para pedir los cambios siguientes")
+    mas: bool = Field(..., title="Hay más", description="Si quedan cambios por leer con el nuevo cursor")
+    cambios: List[CambioPropiedadOut] = Field(..., title="Cambios", description="Último cambio de cada propiedad, en orden")
@@ -1,86 +1,499 @@
-from sqlalchemy.orm import Session
-from datetime import date, datetime
-from app.core.database import SessionLocal
-from app.models.direccion import Direccion, Localidad, Provincia, Pais
-from app.models.cliente import Cliente
-from app.models.agente import Agente
-
-# Enums
-from app.models.enums import tipo_documento_enum, genero_enum, situacion_fiscal_enum
-
-def seed_data(db: Session):
-    # Crear país
-    argentina = Pais(nombre="Argentina")
-    db.add(argentina)
-    db.commit()
-    db.refresh(argentina)
-
-    # Crear provincia
-    buenos_aires = Provincia(nombre="Buenos Aires", pais_id=argentina.id)
-    db.add(buenos_aires)
-    db.commit()
-    db.refresh(buenos_aires)
-
-    # Crear localidad
-    lanus = Localidad(nombre="Lanús", provincia_id=buenos_aires.id)
-    db.add(lanus)
-    db.commit()
-    db.refresh(lanus)
-
-    # Crear dirección
-    direccion_1 = Direccion(
-        calle="Av. Hipólito Yrigoyen",
-        altura=1234,
-        piso="1",
-        dpto="A",
-        entre_calles="25 de Mayo y Belgrano",
-        observaciones="Frente a la plaza",
-        codigo_postal=1824,
-        barrio="Centro",
-        localidad_id=lanus.id,
-        provincia_id=buenos_aires.id,
-        pais_id=argentina.id
-    )
-    db.add(direccion_1)
-    db.commit()
-    db.refresh(direccion_1)
-
-    # Crear cliente
-    cliente_1 = Cliente(
-        nombre="Lucía",
-        apellido="González",
-        tipo_documento="DNI",
-        numero_documento="30111222",
-        email="lucia.gonzalez@example.com",
-        telefono="1122334455",
-        celular="1199887766",
-        fecha_nacimiento=date(1990, 4, 15),
-        genero="FEMENINO",
-        situacion_fiscal="MONOTRIBUTO",
-        direccion_id=direccion_1.id
-    )
-    db.add(cliente_1)
-
-    # Crear agente
-    agente_1 = Agente(
-        nombre="Carlos",
-        apellido="Pérez",
-        tipo_documento="DNI",
-        numero_documento="27123456",
-        telefono="1133445566",
-        email="carlos.perez@example.com",
-        fecha_nacimiento=datetime(1985, 6, 20),
-        activo=True,
-        licencia="AG123456",
-        fecha_alta=datetime.utcnow(),
-        direccion_id=direccion_1.id
+"""
+Generador de datos sintéticos para desarrollo y pruebas de carga.
+
+Genera geografía, direcciones, clientes, agentes, propiedades e imágenes con
+distribuciones realistas y los carga con COPY en lotes repartidos entre varios
+procesos. El resultado es determinístico para una misma semilla, sin importar
+la cantidad de workers: cada lote usa su propio generador aleatorio derivado
+de la semilla, la tabla y el número de lote.
+
+La carga corre con los triggers de usuario apagados (session_replication_role
+= replica): el registro de cambios y las notificaciones de invalidación se
+dispararían por cada fila del COPY. Al final se escribe de una vez una entrada
+de alta por propiedad en cambios_propiedades y se avisa a los workers con un
+único mensaje masivo por tabla. Hace falta un rol que pueda cambiar
+session_replication_role (superusuario, o GRANT SET en PostgreSQL 15+).
+
+Uso:
+    python -m app.seed --propiedades 2_000_000 --clientes 400_000 --agentes 5_000 --workers 8 --limpiar
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+from typing import Callable, Dict, List, Tuple
+
+import psycopg2
+
+from app.core.config import DATABASE_URL
+from app.core.invalidacion import CANAL
+
+# Cantidad máxima de imágenes por propiedad. Cada propiedad reserva este rango
+# de ids, así los ids de imágenes no dependen de los lotes anteriores.
+MAX_IMAGENES_POR_PROPIEDAD = 12
+# Instante de referencia fijo para que las fechas sean reproducibles
+FECHA_REFERENCIA = datetime(2026, 1, 1)
+# Tablas con triggers de invalidación que carga el generador
+TABLAS_NOTIFICADAS = ("direcciones", "clientes", "agentes", "propiedades", "imagenes_propiedad")
+
+# (provincia, peso, [(localidad, codigo_postal, peso, [barrios])])
+GEOGRAFIA = [
+    ("Buenos Aires", 38, [
+        ("Lanús", 1824, 8, ["Centro", "Lanús Este", "Monte Chingolo", "Valentín Alsina"]),
+        ("La Plata", 1900, 10, ["Casco Urbano", "City Bell", "Tolosa", "Los Hornos"]),
+        ("Mar del Plata", 7600, 10, ["Centro", "La Perla", "Playa Grande", "Los Troncos"]),
+        ("Quilmes", 1878, 6, ["Centro", "Bernal", "Ezpeleta"]),
+        ("San Isidro", 1642, 6, ["Centro", "Martínez", "Beccar", "Boulogne"]),
+        ("Bahía Blanca", 8000, 5, ["Centro", "Universitario", "Palihue"]),
+        ("Pilar", 1629, 5, ["Centro", "Del Viso", "Manzanares"]),
+    ]),
+    ("Ciudad Autónoma de Buenos Aires", 22, [
+        ("Palermo", 1425, 10, ["Palermo Soho", "Palermo Hollywood", "Palermo Chico"]),
+        ("Belgrano", 1428, 8, ["Belgrano R", "Belgrano C", "Barrio Chino"]),
+        ("Caballito", 1405, 7, ["Primera Junta", "Parque Centenario"]),
+        ("Recoleta", 1113, 7, ["Barrio Norte", "Recoleta"]),
+        ("San Telmo", 1098, 4, ["San Telmo"]),
+        ("Villa Urquiza", 1431, 5, ["Villa Urquiza"]),
+    ]),
+    ("Córdoba", 10, [
+        ("Córdoba", 5000, 12, ["Nueva Córdoba", "General Paz", "Cerro de las Rosas", "Centro"]),
+        ("Villa Carlos Paz", 5152, 4, ["Centro", "Playas de Oro"]),
+        ("Río Cuarto", 5800, 3, ["Centro", "Banda Norte"]),
+    ]),
+    ("Santa Fe", 9, [
+        ("Rosario", 2000, 12, ["Centro", "Fisherton", "Pichincha", "Echesortu"]),
+        ("Santa Fe", 3000, 6, ["Centro", "Candioti", "Guadalupe"]),
+    ]),
+    ("Mendoza", 6, [
+        ("Mendoza", 5500, 8, ["Centro", "Quinta Sección", "Sexta Sección"]),
+        ("Godoy Cruz", 5501, 4, ["Centro", "Villa Hipódromo"]),
+    ]),
+    ("Tucumán", 4, [
+        ("San Miguel de Tucumán", 4000, 8, ["Centro", "Barrio Norte", "Yerba Buena"]),
+    ]),
+    ("Neuquén", 4, [
+        ("Neuquén", 8300, 6, ["Centro", "Santa Genoveva"]),
+        ("San Martín de los Andes", 8370, 2, ["Centro", "Vega Maipú"]),
+    ]),
+    ("Río Negro", 3, [
+        ("San Carlos de Bariloche", 8400, 5, ["Centro", "Melipal", "Llao Llao"]),
+    ]),
+    ("Salta", 3, [
+        ("Salta", 4400, 6, ["Centro", "Tres Cerritos", "Grand Bourg"]),
+    ]),
+    ("Chubut", 1, [
+        ("Puerto Madryn", 9120, 3, ["Centro", "Barrio Sur"]),
+    ]),
+]
+
+CALLES = [
+    "San Martín", "Belgrano", "Rivadavia", "Sarmiento", "Mitre", "Moreno", "25 de Mayo",
+    "9 de Julio", "Av. Corrientes", "Av. Santa Fe", "Av. Córdoba", "Urquiza", "Alsina",
+    "Güemes", "Pellegrini", "Italia", "España", "Lavalle", "Tucumán", "Av. Libertador",
+]
+NOMBRES = [
+    "Lucía", "Martina", "Sofía", "Valentina", "Camila", "Julieta", "Florencia", "Agustina",
+    "Carlos", "Juan", "Mateo", "Santiago", "Martín", "Lucas", "Nicolás", "Federico", "Diego",
+    "María", "Ana", "Laura", "Pablo", "Tomás", "Franco", "Gabriela", "Paula",
+]
+APELLIDOS = [
+    "González", "Rodríguez", "Gómez", "Fernández", "López", "Díaz", "Martínez", "Pérez",
+    "García", "Sánchez", "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez", "Flores",
+    "Benítez", "Acosta", "Medina", "Herrera", "Suárez", "Aguirre", "Giménez", "Gutiérrez",
+]
+
+# Valores tal como los persiste SQLAlchemy (nombre del miembro del enum)
+TIPOS_PROPIEDAD = {
+    # tipo: (peso, (sup. cubierta min, max), dormitorios max, precio venta base USD)
+    "departamento": (45, (30, 160), 4, 110_000),
+    "casa": (28, (70, 350), 6, 190_000),
+    "oficina": (6, (25, 400), 0, 140_000),
+    "local_comercial": (6, (20, 500), 0, 160_000),
+    "terreno": (7, (0, 0), 0, 60_000),
+    "cochera": (5, (10, 20), 0, 20_000),
+    "galpon": (2, (200, 2_000), 0, 300_000),
+    "otro": (1, (20, 200), 2, 80_000),
+}
+TIPOS_OPERACION = [("alquiler", 48), ("venta", 42), ("ambos", 10)]
+ESTADOS = [
+    ("activo", 60), ("borrador", 8), ("inactivo", 6), ("reservado", 5), ("vendido", 11), ("alquilado", 10),
+]
+SITUACIONES_FISCALES = [
+    ("CONSUMIDOR_FINAL", 55), ("MONOTRIBUTO", 25), ("RESPONSABLE_INSCRIPTO", 12), ("EXENTO", 4),
+    ("RESPONSABLE_NO_INSCRIPTO", 2), ("NO_RESPONSABLE", 1), ("OTRO", 1),
+]
+
+
+def _elegir(rng: random.Random, opciones: List[Tuple]) -> str:
+    return rng.choices([o[0] for o in opciones], weights=[o[1] for o in opciones])[0]
+
+
+def _fecha(rng: random.Random, dias_atras: int) -> datetime:
+    return FECHA_REFERENCIA - timedelta(seconds=rng.randint(0, dias_atras * 86_400))
+
+
+class Geografia:
+    """Ids y pesos de las localidades cargadas, para elegir direcciones."""
+
+    def __init__(self, localidades: List[Tuple[int, int, int, int, int, List[str]]]):
+        # (localidad_id, provincia_id, pais_id, codigo_postal, peso, barrios)
+        self.localidades = localidades
+        self.pesos_acumulados = []
+        total = 0
+        for loc in localidades:
+            total += loc[4]
+            self.pesos_acumulados.append(total)
+
+    def elegir(self, rng: random.Random):
+        return rng.choices(self.localidades, cum_weights=self.pesos_acumulados)[0]
+
+
+def cargar_geografia(conn) -> Geografia:
+    """Crea (o reutiliza) el país, las provincias y las localidades."""
+    cur = conn.cursor()
+    cur.execute("INSERT INTO paises (nombre) VALUES ('Argentina') ON CONFLICT (nombre) DO NOTHING")
+    cur.execute("SELECT id FROM paises WHERE nombre = 'Argentina'")
+    pais_id = cur.fetchone()[0]
+
+    localidades = []
+    for provincia, peso_provincia, locs in GEOGRAFIA:
+        cur.execute(
+            "INSERT INTO provincias (nombre, pais_id) VALUES (%s, %s) ON CONFLICT (nombre) DO NOTHING",
+            (provincia, pais_id)
+        )
+        cur.execute("SELECT id FROM provincias WHERE nombre = %s", (provincia,))
+        provincia_id = cur.fetchone()[0]
+        peso_total = sum(l[2] for l in locs)
+        for nombre, codigo_postal, peso, barrios in locs:
+            # Los nombres de localidad son únicos en el modelo
+            nombre_unico = nombre if nombre != provincia else f"{nombre} Capital"
+            cur.execute(
+                "INSERT INTO localidades (nombre, provincia_id) VALUES (%s, %s) ON CONFLICT (nombre) DO NOTHING",
+                (nombre_unico, provincia_id)
+            )
+            cur.execute("SELECT id FROM localidades WHERE nombre = %s", (nombre_unico,))
+            localidad_id = cur.fetchone()[0]
+            peso_relativo = max(1, round(1000 * peso_provincia * peso / peso_total))
+            localidades.append((localidad_id, provincia_id, pais_id, codigo_postal, peso_relativo, barrios))
+    conn.commit()
+    return Geografia(localidades)
+
+
+# Generadores de filas por tabla. Cada uno recibe el rng del lote y el id de la fila.
+
+def fila_direccion(rng: random.Random, id: int, geo: Geografia) -> List:
+    localidad_id, provincia_id, pais_id, codigo_postal, _, barrios = geo.elegir(rng)
+    en_edificio = rng.random() < 0.55
+    return [
+        id,
+        rng.choice(CALLES),
+        rng.randint(1, 9_000),
+        str(rng.randint(1, 20)) if en_edificio else None,
+        rng.choice("ABCDEFGH") if en_edificio else None,
+        f"{rng.choice(CALLES)} y {rng.choice(CALLES)}" if rng.random() < 0.3 else None,
+        None,
+        codigo_postal,
+        rng.choice(barrios),
+        localidad_id,
+        provincia_id,
+        pais_id,
+    ]
+
+
+def fila_cliente(rng: random.Random, id: int, direccion_id: int) -> List:
+    nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+    return [
+        id, nombre, apellido, "DNI", str(20_000_000 + id),
+        f"{nombre.lower()}.{apellido.lower()}.{id}@example.com",
+        f"11{rng.randint(10_000_000, 99_999_999)}" if rng.random() < 0.4 else None,
+        f"11{rng.randint(10_000_000, 99_999_999)}",
+        date(1950, 1, 1) + timedelta(days=rng.randint(0, 365 * 55)),
+        _fecha(rng, 3 * 365),
+        _elegir(rng, [("FEMENINO", 49), ("MASCULINO", 49), ("OTRO", 2)]),
+        _elegir(rng, SITUACIONES_FISCALES),
+        direccion_id,
+    ]
+
+
+def fila_agente(rng: random.Random, id: int, direccion_id: int) -> List:
+    nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+    return [
+        id, nombre, apellido, "DNI", str(10_000_000 + id),
+        f"11{rng.randint(10_000_000, 99_999_999)}",
+        f"{nombre.lower()}.{apellido.lower()}.{id}@inmobiliaria.example.com",
+        datetime(1960, 1, 1) + timedelta(days=rng.randint(0, 365 * 40)),
+        rng.random() < 0.9,
+        direccion_id,
+        f"AG{id:06d}",
+        _fecha(rng, 5 * 365),
+        None,
+    ]
+
+
+def fila_propiedad(rng: random.Random, id: int, direccion_id: int, clientes: int, agentes: int) -> List:
+    tipo = _elegir(rng, [(t, v[0]) for t, v in TIPOS_PROPIEDAD.items()])
+    _, (sup_min, sup_max), dormitorios_max, precio_base = TIPOS_PROPIEDAD[tipo]
+    operacion = _elegir(rng, TIPOS_OPERACION)
+
+    cubierta = rng.randint(sup_min, sup_max) if sup_max else 0
+    descubierta = rng.randint(0, cubierta // 2) if tipo in ("casa", "departamento") else 0
+    if tipo == "terreno":
+        descubierta = rng.randint(200, 2_000)
+    dormitorios = rng.randint(0, dormitorios_max) if dormitorios_max else 0
+
+    # Precio log-normal alrededor del precio base, escalado por superficie
+    escala = math.sqrt(max(cubierta + descubierta, 20) / max(sup_min + 40, 40))
+    precio_venta = int(precio_base * escala * rng.lognormvariate(0, 0.35) / 1000) * 1000
+    precio_alquiler = int(precio_venta * rng.uniform(0.003, 0.006) / 10) * 10
+
+    fecha_creacion = _fecha(rng, 3 * 365)
+    modificada = rng.random() < 0.4
+    fecha_modificacion = fecha_creacion + timedelta(days=rng.randint(1, 200)) if modificada else None
+    if fecha_modificacion and fecha_modificacion > FECHA_REFERENCIA:
+        fecha_modificacion = FECHA_REFERENCIA
+
+    return [
+        id,
+        f"{tipo.replace('_', ' ').capitalize()} {dormitorios} dorm. en {rng.choice(CALLES)}",
+        None,  # portada_id: se completa al final, cuando existen las imágenes
+        direccion_id,
+        tipo,
+        operacion,
+        precio_venta if operacion in ("venta", "ambos") else None,
+        precio_alquiler if operacion in ("alquiler", "ambos") else None,
+        rng.randint(1, clientes) if clientes and rng.random() < 0.95 else None,
+        _elegir(rng, ESTADOS),
+        "Propiedad generada para pruebas de carga." if rng.random() < 0.7 else None,
+        rng.randint(1950, 2025) if tipo != "terreno" else None,
+        max(1, dormitorios // 2 + rng.randint(0, 1)) if tipo in ("casa", "departamento") else rng.randint(0, 2),
+        dormitorios,
+        dormitorios + 1 if tipo in ("casa", "departamento") else rng.randint(1, 6),
+        rng.randint(0, 2) if rng.random() < 0.5 else 0,
+        rng.random() < 0.15,
+        cubierta,
+        descubierta,
+        cubierta + descubierta,
+        rng.randint(1, agentes) if agentes else None,
+        fecha_creacion,
+        fecha_modificacion,
+    ]
+
+
+def filas_imagenes(rng: random.Random, propiedad_id: int) -> List[List]:
+    cantidad = min(MAX_IMAGENES_POR_PROPIEDAD, max(0, int(rng.gauss(6, 3))))
+    primer_id = (propiedad_id - 1) * MAX_IMAGENES_POR_PROPIEDAD + 1
+    return [
+        [primer_id + i, f"/static/uploads/propiedades/{propiedad_id}-{i}.jpg",
+         "principal" if i == 0 else "secundaria", "propiedad", propiedad_id]
+        for i in range(cantidad)
+    ]
+
+
+COLUMNAS = {
+    "direcciones": "id, calle, altura, piso, dpto, entre_calles, observaciones, codigo_postal, barrio, localidad_id, provincia_id, pais_id",
+    "clientes": "id, nombre, apellido, tipo_documento, numero_documento, email, telefono, celular, fecha_nacimiento, fecha_alta, genero, situacion_fiscal, direccion_id",
+    "agentes": "id, nombre, apellido, tipo_documento, numero_documento, telefono, email, fecha_nacimiento, activo, direccion_id, licencia, fecha_alta, fecha_modificacion",
+    "propiedades": "id, nombre, portada_id, direccion_id, tipo_propiedad, tipo_operacion, precio_venta, precio_alquiler, propietario_id, estado, descripcion, ano_construccion, banios, dormitorios, ambientes, cochera, amoblado, superficie_cubierta, superficie_descubierta, superficie_total, agente_id, fecha_creacion, fecha_modificacion",
+    "imagenes": "id, url, tipo, tipo_imagen",
+    "imagenes_propiedad": "id, propiedad_id",
+}
+
+
+def _copy(cur, tabla: str, filas: List[List]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for fila in filas:
+        writer.writerow(["" if v is None else v for v in fila])
+    buffer.seek(0)
+    # En CSV, un campo vacío sin comillas es NULL
+    cur.copy_expert(f"COPY {tabla} ({COLUMNAS[tabla]}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def sin_triggers(conn) -> None:
+    """
+    Apagar los triggers de usuario en la sesión. También se omiten las
+    verificaciones de FK: los datos generados las cumplen por construcción.
+    """
+    conn.cursor().execute("SET session_replication_role = replica")
+
+
+def registrar_carga(conn) -> int:
+    """
+    Lo que los triggers apagados no hicieron: una entrada de alta por propiedad
+    en el registro de cambios (como la línea base de la migración a9d4e6b2f815)
+    y un aviso masivo por tabla en el bus de invalidación, en una transacción.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO cambios_propiedades (propiedad_id, operacion, motivo, agentes, propietarios, xid, fecha)
+        SELECT
+            id, 'upsert', 'alta',
+            array_remove(ARRAY[agente_id], NULL), array_remove(ARRAY[propietario_id], NULL),
+            pg_current_xact_id()::text::bigint, timezone('utc', now())
+        FROM propiedades ORDER BY id
+    """)
+    registradas = cur.rowcount
+    for tabla in TABLAS_NOTIFICADAS:
+        cur.execute("SELECT pg_notify(%s, %s)", (CANAL, json.dumps({"tabla": tabla, "op": "UPDATE", "masivo": True})))
+    conn.commit()
+    return registradas
+
+
+def cargar_lote(tarea: Dict) -> Tuple[str, int]:
+    """Genera y carga un lote [inicio, fin] de una tabla. Se ejecuta en un proceso worker."""
+    tabla, inicio, fin, params = tarea["tabla"], tarea["inicio"], tarea["fin"], tarea["params"]
+    rng = random.Random(f"{params['semilla']}:{tabla}:{inicio}")
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        sin_triggers(conn)
+        cur = conn.cursor()
+        if tabla == "direcciones":
+            geo = Geografia(params["geografia"])
+            _copy(cur, tabla, [fila_direccion(rng, i, geo) for i in range(inicio, fin + 1)])
+        elif tabla == "clientes":
+            base = params["propiedades"]
+            _copy(cur, tabla, [fila_cliente(rng, i, base + i) for i in range(inicio, fin + 1)])
+        elif tabla == "agentes":
+            base = params["propiedades"] + params["clientes"]
+            _copy(cur, tabla, [fila_agente(rng, i, base + i) for i in range(inicio, fin + 1)])
+        elif tabla == "propiedades":
+            _copy(cur, tabla, [
+                fila_propiedad(rng, i, i, params["clientes"], params["agentes"]) for i in range(inicio, fin + 1)
+            ])
+        elif tabla == "imagenes":
+            imagenes = [img for i in range(inicio, fin + 1) for img in filas_imagenes(rng, i)]
+            _copy(cur, "imagenes", [img[:4] for img in imagenes])
+            _copy(cur, "imagenes_propiedad", [[img[0], img[4]] for img in imagenes])
+        conn.commit()
+    finally:
+        conn.close()
+    return tabla, fin - inicio + 1
+
+
+def _lotes(tabla: str, total: int, tamanio: int, params: Dict) -> List[Dict]:
+    return [
+        {"tabla": tabla, "inicio": inicio, "fin": min(inicio + tamanio - 1, total), "params": params}
+        for inicio in range(1, total + 1, tamanio)
+    ]
+
+
+def limpiar(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(
+        "TRUNCATE imagenes_propiedad, imagenes_agente, imagenes, propiedades, agentes, clientes, direcciones "
+        "RESTART IDENTITY CASCADE"
     )
-    db.add(agente_1)
+    conn.commit()
+
+
+def ajustar_secuencias(conn) -> None:
+    cur = conn.cursor()
+    for tabla in ("direcciones", "clientes", "agentes", "propiedades", "imagenes"):
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), COALESCE((SELECT max(id) FROM {tabla}), 0) + 1, false)"
+        )
+    conn.commit()
+
+
+def generar(
+    propiedades: int,
+    clientes: int,
+    agentes: int,
+    semilla: int = 42,
+    workers: int = 4,
+    lote: int = 50_000,
+    imagenes: bool = True,
+    limpiar_antes: bool = False,
+    log: Callable[[str], None] = print
+) -> None:
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        sin_triggers(conn)
+        if limpiar_antes:
+            limpiar(conn)
+        else:
+            cur = conn.cursor()
+            cur.execute("SELECT EXISTS (SELECT 1 FROM direcciones)")
+            if cur.fetchone()[0]:
+                # Los ids se asignan desde 1, así que la carga necesita las tablas vacías
+                raise SystemExit("Las tablas ya tienen datos: usar --limpiar para vaciarlas antes de generar")
+        geo = cargar_geografia(conn)
+        params = {
+            "semilla": semilla,
+            "propiedades": propiedades,
+            "clientes": clientes,
+            "agentes": agentes,
+            "geografia": geo.localidades,
+        }
+        # Una dirección por propiedad, cliente y agente (en ese orden de ids)
+        etapas = [
+            _lotes("direcciones", propiedades + clientes + agentes, lote, params),
+            _lotes("clientes", clientes, lote, params) + _lotes("agentes", agentes, lote, params),
+            _lotes("propiedades", propiedades, lote, params),
+        ]
+        if imagenes:
+            etapas.append(_lotes("imagenes", propiedades, max(1, lote // MAX_IMAGENES_POR_PROPIEDAD * 2), params))
 
-    db.commit()
+        with Pool(processes=workers) as pool:
+            for tareas in etapas:
+                inicio = time.perf_counter()
+                cargadas: Dict[str, int] = {}
+                for tabla, filas in pool.imap_unordered(cargar_lote, tareas):
+                    cargadas[tabla] = cargadas.get(tabla, 0) + filas
+                for tabla, filas in cargadas.items():
+                    log(f"{tabla}: {filas} filas en {time.perf_counter() - inicio:.1f}s")
+
+        cur = conn.cursor()
+        if imagenes:
+            inicio = time.perf_counter()
+            cur.execute(
+                "UPDATE propiedades p SET portada_id = ip.id FROM imagenes_propiedad ip "
+                "WHERE ip.id = (p.id - 1) * %s + 1",
+                (MAX_IMAGENES_POR_PROPIEDAD,)
+            )
+            conn.commit()
+            log(f"portadas: {cur.rowcount} en {time.perf_counter() - inicio:.1f}s")
+
+        inicio = time.perf_counter()
+        log(f"registro de cambios: {registrar_carga(conn)} altas en {time.perf_counter() - inicio:.1f}s")
+
+        ajustar_secuencias(conn)
+        conn.autocommit = True
+        conn.cursor().execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para pruebas de carga")
+    parser.add_argument("--propiedades", type=int, default=1_000)
+    parser.add_argument("--clientes", type=int, default=None, help="Por defecto, una quinta parte de las propiedades")
+    parser.add_argument("--agentes", type=int, default=None, help="Por defecto, uno cada 400 propiedades")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lote", type=int, default=50_000, help="Filas por COPY")
+    parser.add_argument("--sin-imagenes", action="store_true")
+    parser.add_argument("--limpiar", action="store_true", help="Vacía las tablas antes de cargar")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    generar(
+        propiedades=args.propiedades,
+        clientes=args.clientes if args.clientes is not None else max(1, args.propiedades // 5),
+        agentes=args.agentes if args.agentes is not None else max(1, args.propiedades // 400),
+        semilla=args.semilla,
+        workers=args.workers,
+        lote=args.lote,
+        imagenes=not args.sin_imagenes,
+        limpiar_antes=args.limpiar,
+    )
+    print(f"Carga completa en {time.perf_counter() - inicio:.1f}s")
 
 
 if __name__ == "__main__":
-    db = SessionLocal()
-    seed_data(db)
-    db.close()
\ No newline at end of file
+    main()
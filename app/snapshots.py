@@ -0,0 +1,317 @@
+"""
+Snapshots columnares del catálogo de propiedades para analítica.
+
+El job exporta las propiedades desnormalizadas (geografía y agente, sin datos
+personales del propietario) a Parquet, particionado al estilo Hive por fecha de
+última modificación y estado:
+
+    snapshots/propiedades/fecha=2026-10-19/estado=activo/<corrida>-<n>.parquet
+
+Es incremental: cada corrida exporta las propiedades con entradas en el
+registro de cambios (cambios_propiedades) posteriores al cursor de la corrida
+anterior, guardado en _estado.json, con el mismo criterio que
+GET /propiedades/changes: sólo entradas de transacciones anteriores al xmin, así
+una transacción que confirma tarde (con una fecha_modificacion anterior) no
+queda detrás del cursor. El registro cubre también los cambios de imágenes y de
+la dirección. Una propiedad modificada queda con varias versiones en distintas
+particiones; LectorSnapshot se queda con la de la corrida más reciente.
+
+Lo que no ve el incremental:
+
+- las bajas: siguen en el snapshot con su último estado;
+- las columnas desnormalizadas de otras tablas (agente, localidad, provincia,
+  pais): renombrar un agente o una localidad no escribe en el registro, y las
+  propiedades afectadas conservan el nombre viejo hasta que vuelvan a cambiar.
+
+`--completo` reconstruye (y compacta) el snapshot desde cero y corrige ambas
+cosas: conviene programarlo periódicamente (p. ej. una vez por noche) además
+de las corridas incrementales.
+
+Uso:
+    python -m app.snapshots              # incremental
+    python -m app.snapshots --completo   # reconstrucción completa
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from sqlalchemy import Select, func, select, tuple_
+
+from app.core.config import SNAPSHOTS_DIR
+from app.crud.cambios_crud import INICIO, Cursor, consulta_ultimo_cursor, escribir_cursor, leer_cursor
+from app.models.cambio import CambioPropiedad
+from app.models.agente import Agente
+from app.models.direccion import Direccion, Localidad, Pais, Provincia
+from app.models.propiedad import Propiedad
+
+ARCHIVO_ESTADO = "_estado.json"
+MODIFICADO = func.coalesce(Propiedad.fecha_modificacion, Propiedad.fecha_creacion)
+
+# (nombre, tipo Arrow, expresión SQL, es_enum)
+COLUMNAS = [
+    ("id", pa.int64(), Propiedad.id, False),
+    ("nombre", pa.string(), Propiedad.nombre, False),
+    ("tipo_propiedad", pa.string(), Propiedad.tipo_propiedad, True),
+    ("tipo_operacion", pa.string(), Propiedad.tipo_operacion, True),
+    ("estado", pa.string(), Propiedad.estado, True),
+    ("precio_venta", pa.int64(), Propiedad.precio_venta, False),
+    ("precio_alquiler", pa.int64(), Propiedad.precio_alquiler, False),
+    ("dormitorios", pa.int32(), Propiedad.dormitorios, False),
+    ("banios", pa.int32(), Propiedad.banios, False),
+    ("ambientes", pa.int32(), Propiedad.ambientes, False),
+    ("cochera", pa.int32(), Propiedad.cochera, False),
+    ("amoblado", pa.bool_(), Propiedad.amoblado, False),
+    ("superficie_cubierta", pa.int32(), Propiedad.superficie_cubierta, False),
+    ("superficie_descubierta", pa.int32(), Propiedad.superficie_descubierta, False),
+    ("superficie_total", pa.int32(), Propiedad.superficie_total, False),
+    ("ano_construccion", pa.int32(), Propiedad.ano_construccion, False),
+    ("fecha_creacion", pa.timestamp("us"), Propiedad.fecha_creacion, False),
+    ("modificado", pa.timestamp("us"), MODIFICADO, False),
+    ("barrio", pa.string(), Direccion.barrio, False),
+    ("codigo_postal", pa.int32(), Direccion.codigo_postal, False),
+    ("localidad", pa.string(), Localidad.nombre, False),
+    ("provincia", pa.string(), Provincia.nombre, False),
+    ("pais", pa.string(), Pais.nombre, False),
+    ("agente_id", pa.int64(), Propiedad.agente_id, False),
+    ("agente", pa.string(), Agente.nombre + " " + Agente.apellido, False),
+]
+COLUMNAS_INDICE_MODIFICADO = [nombre for nombre, _, _, _ in COLUMNAS].index("modificado")
+# `corrida` es el número de corrida que exportó la fila: desempata las versiones
+# de una propiedad cuya fecha de modificación no cambió (p. ej. cambió su dirección)
+ESQUEMA = pa.schema(
+    [(nombre, tipo) for nombre, tipo, _, _ in COLUMNAS] + [("corrida", pa.int64()), ("fecha", pa.string())]
+)
+PARTICIONADO = ds.partitioning(pa.schema([("fecha", pa.string()), ("estado", pa.string())]), flavor="hive")
+
+# Columnas por las que se puede agrupar/filtrar y métricas numéricas del resumen
+DIMENSIONES = {"estado", "tipo_propiedad", "tipo_operacion", "provincia", "localidad", "barrio", "agente", "fecha"}
+METRICAS = {
+    "precio_venta", "precio_alquiler", "dormitorios", "banios", "ambientes",
+    "superficie_cubierta", "superficie_total", "ano_construccion",
+}
+
+
+def directorio_propiedades(base: str = SNAPSHOTS_DIR) -> str:
+    return os.path.join(base, "propiedades")
+
+
+def leer_estado(directorio: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directorio, ARCHIVO_ESTADO)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def consulta(desde: Optional[Cursor] = None, hasta: Cursor = INICIO) -> Select:
+    """
+    Propiedades desnormalizadas con cambios registrados entre los cursores
+    `desde` (exclusivo) y `hasta` (inclusivo); todas si `desde` es None.
+    """
+    stmt = (
+        select(*[expresion.label(nombre) for nombre, _, expresion, _ in COLUMNAS])
+        .select_from(Propiedad)
+        .outerjoin(Direccion, Propiedad.direccion_id == Direccion.id)
+        .outerjoin(Localidad, Direccion.localidad_id == Localidad.id)
+        .outerjoin(Provincia, Direccion.provincia_id == Provincia.id)
+        .outerjoin(Pais, Direccion.pais_id == Pais.id)
+        .outerjoin(Agente, Propiedad.agente_id == Agente.id)
+    )
+    if desde is not None:
+        cursor = tuple_(CambioPropiedad.xid, CambioPropiedad.id)
+        stmt = stmt.filter(Propiedad.id.in_(
+            select(CambioPropiedad.propiedad_id).filter(cursor > tuple_(*desde), cursor <= tuple_(*hasta))
+        ))
+    return stmt.order_by(MODIFICADO, Propiedad.id)
+
+
+def tabla_desde_filas(filas: List[Any], corrida: int) -> pa.Table:
+    columnas = list(zip(*filas)) if filas else [() for _ in COLUMNAS]
+    datos = {}
+    for (nombre, tipo, _, es_enum), valores in zip(COLUMNAS, columnas):
+        if es_enum:
+            # Se guarda el nombre del miembro, como en la base
+            valores = [v.name if v is not None else None for v in valores]
+        datos[nombre] = pa.array(valores, type=tipo)
+    datos["corrida"] = pa.array([corrida] * len(filas), type=pa.int64())
+    datos["fecha"] = pa.array(
+        [m.date().isoformat() if m is not None else "sin_fecha" for m in columnas[COLUMNAS_INDICE_MODIFICADO]],
+        type=pa.string()
+    )
+    return pa.table(datos, schema=ESQUEMA)
+
+
+def exportar(engine, base: str = SNAPSHOTS_DIR, completo: bool = False, lote: int = 50_000, log=print) -> Dict[str, Any]:
+    """
+    Exporta las propiedades nuevas o modificadas al snapshot (o todas, con `completo`).
+
+    Lee con un cursor del lado del servidor y escribe un lote de archivos por
+    cada `lote` filas, así la memoria no depende del tamaño del catálogo.
+    """
+    destino = directorio_propiedades(base)
+    estado = None if completo else leer_estado(destino)
+    # Sin cursor (primera corrida, o un snapshot anterior al registro) se exporta todo
+    desde = leer_cursor(estado["cursor"]) if estado and estado.get("cursor") else None
+    numero_corrida = (estado or {}).get("corridas", 0) + 1
+    # La reconstrucción se escribe aparte y se intercambia al final
+    trabajo = f"{destino}.nuevo" if completo else destino
+    if completo:
+        shutil.rmtree(trabajo, ignore_errors=True)
+    os.makedirs(trabajo, exist_ok=True)
+
+    corrida = uuid.uuid4().hex[:12]
+    inicio = time.perf_counter()
+    filas_exportadas = 0
+    with engine.connect() as conn:
+        # Antes de leer las propiedades: lo que se registre después queda para la próxima corrida
+        ultima = conn.execute(consulta_ultimo_cursor()).first()
+        hasta = (ultima.xid, ultima.id) if ultima is not None else INICIO
+        if desde is not None and hasta < desde:
+            # Registro vacío o recreado: no hay nada posterior al cursor
+            hasta = desde
+        result = conn.execution_options(stream_results=True, yield_per=lote).execute(consulta(desde, hasta))
+        for numero, filas in enumerate(result.partitions()):
+            tabla = tabla_desde_filas(filas, numero_corrida)
+            ds.write_dataset(
+                tabla,
+                trabajo,
+                format="parquet",
+                partitioning=PARTICIONADO,
+                basename_template=f"{corrida}-{numero}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            filas_exportadas += tabla.num_rows
+            log(f"  lote {numero}: {tabla.num_rows} filas")
+
+    nuevo_estado = {
+        "cursor": escribir_cursor(hasta),
+        "ultima_corrida": corrida,
+        "actualizado": datetime.utcnow().isoformat(timespec="seconds"),
+        "filas_ultima_corrida": filas_exportadas,
+        "corridas": numero_corrida,
+    }
+    with open(os.path.join(trabajo, ARCHIVO_ESTADO), "w") as f:
+        json.dump(nuevo_estado, f, indent=2)
+
+    if completo:
+        anterior = f"{destino}.anterior"
+        shutil.rmtree(anterior, ignore_errors=True)
+        if os.path.exists(destino):
+            os.rename(destino, anterior)
+        os.rename(trabajo, destino)
+        shutil.rmtree(anterior, ignore_errors=True)
+
+    log(f"{filas_exportadas} filas exportadas en {time.perf_counter() - inicio:.1f}s")
+    return nuevo_estado
+
+
+def deduplicar(tabla: pa.Table) -> pa.Table:
+    """Se queda con la versión de la corrida más reciente de cada propiedad."""
+    if tabla.num_rows == 0:
+        return tabla
+    tabla = tabla.sort_by([("id", "ascending"), ("corrida", "descending"), ("modificado", "descending")])
+    ids = tabla["id"].combine_chunks()
+    primera = pa.concat_arrays([
+        pa.array([True]),
+        pc.not_equal(ids.slice(1), ids.slice(0, len(ids) - 1)),
+    ])
+    return tabla.filter(primera)
+
+
+class LectorSnapshot:
+    """
+    Lee el snapshot (ya deduplicado) y responde consultas agregadas.
+
+    La tabla se mantiene en memoria y se vuelve a leer cuando cambia
+    _estado.json, es decir, cuando terminó una nueva corrida del job.
+    """
+
+    def __init__(self, base: str = SNAPSHOTS_DIR):
+        self.directorio = directorio_propiedades(base)
+        self._tabla: Optional[pa.Table] = None
+        self._corrida: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def estado(self) -> Optional[Dict[str, Any]]:
+        return leer_estado(self.directorio)
+
+    def tabla(self) -> Optional[pa.Table]:
+        estado = self.estado()
+        if estado is None:
+            return None
+        with self._lock:
+            if self._corrida != estado["ultima_corrida"]:
+                # Con el esquema explícito, los archivos anteriores a `corrida` la leen como nula
+                dataset = ds.dataset(self.directorio, format="parquet", schema=ESQUEMA, partitioning=PARTICIONADO)
+                self._tabla = deduplicar(dataset.to_table())
+                self._corrida = estado["ultima_corrida"]
+            return self._tabla
+
+    def resumen(self, agrupar_por: List[str], metrica: str, filtros: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Cantidad de propiedades y estadísticas de `metrica` por grupo.
+
+        Args:
+            agrupar_por: Columnas de DIMENSIONES (vacío: un único total)
+            metrica: Columna de METRICAS
+            filtros: Igualdades sobre columnas de DIMENSIONES
+        """
+        tabla = self.tabla()
+        if tabla is None:
+            return []
+        for columna, valor in filtros.items():
+            tabla = tabla.filter(pc.equal(tabla[columna].cast(pa.string()), valor))
+
+        agregaciones = [
+            ("id", "count"),
+            (metrica, "count"),
+            (metrica, "mean"),
+            (metrica, "approximate_median"),
+            (metrica, "min"),
+            (metrica, "max"),
+        ]
+        if agrupar_por:
+            claves = list(agrupar_por)
+        else:
+            # group_by necesita al menos una clave: se agrupa por una columna constante
+            tabla = tabla.append_column("_total", pa.nulls(tabla.num_rows, pa.int8()))
+            claves = ["_total"]
+
+        resultado = tabla.group_by(claves).aggregate(agregaciones)
+        grupos = []
+        for fila in resultado.to_pylist():
+            grupo = {c: fila[c] for c in claves if c != "_total"}
+            grupo.update({
+                "cantidad": fila["id_count"],
+                "con_valor": fila[f"{metrica}_count"],
+                "promedio": fila[f"{metrica}_mean"],
+                "mediana": fila[f"{metrica}_approximate_median"],
+                "minimo": fila[f"{metrica}_min"],
+                "maximo": fila[f"{metrica}_max"],
+            })
+            grupos.append(grupo)
+        return sorted(grupos, key=lambda g: -g["cantidad"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta el catálogo de propiedades a Parquet")
+    parser.add_argument("--completo", action="store_true", help="Reconstruye el snapshot desde cero")
+    parser.add_argument("--directorio", default=SNAPSHOTS_DIR)
+    parser.add_argument("--lote", type=int, default=50_000, help="Filas por lote leído y escrito")
+    args = parser.parse_args()
+
+    from app.core.database import engine
+    exportar(engine, base=args.directorio, completo=args.completo, lote=args.lote)
+
+
+if __name__ == "__main__":
+    main()
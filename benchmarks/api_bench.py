@@ -0,0 +1,287 @@
+"""
+Benchmark end-to-end de los caminos calientes de la API.
+
+Levanta la app con uvicorn contra la base configurada en DATABASE_URL
+(opcionalmente la carga antes con app.seed), genera una carga mixta a la
+concurrencia indicada y reporta throughput y latencias p50/p95/p99 por endpoint.
+El resultado se guarda en JSON y puede compararse contra una corrida base.
+
+Las latencias son sólo de las respuestas exitosas. Si alguna ruta de la mezcla
+no existe en la instancia, o si algún escenario tuvo errores, el benchmark
+falla en vez de reportar percentiles (medirían el manejo del error, no el
+endpoint). Requiere el token de un administrador (ver app.crear_usuario) para
+leer propiedades no publicadas y actualizarlas.
+
+Uso:
+    python -m benchmarks.api_bench --generar 100000 --duracion 60 --concurrencia 64 \\
+        --salida bench_actual.json --baseline bench_base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+# Mezcla de la carga: (nombre, peso)
+MEZCLA = [
+    ("busqueda", 45),
+    ("detalle", 25),
+    ("destacadas", 15),
+    ("actualizacion", 10),
+    ("subida_imagen", 5),
+]
+# Rutas que usa cada escenario (como aparecen en /openapi.json)
+RUTAS_REQUERIDAS = [
+    ("get", "/propiedades/"),
+    ("get", "/propiedades/{propiedad_id}"),
+    ("get", "/propiedades/destacadas/"),
+    ("put", "/propiedades/{propiedad_id}"),
+    ("post", "/imagenes/propiedades/"),
+]
+TIPOS_PROPIEDAD = ["casa", "departamento", "oficina", "local_comercial", "terreno", "cochera"]
+TIPOS_OPERACION = ["venta", "alquiler", "ambos"]
+# JPEG mínimo para las subidas
+IMAGEN_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f"
+    "141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b0800010001010111"
+    "00ffc4001f0000010501010101010100000000000000000102030405060708090a0bffda0008010100003f00d2cf20ffd9"
+)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def filtros_aleatorios(rng: random.Random) -> Dict:
+    filtros = {}
+    if rng.random() < 0.7:
+        filtros["tipo_propiedad"] = rng.choice(TIPOS_PROPIEDAD)
+    if rng.random() < 0.6:
+        filtros["tipo_operacion"] = rng.choice(TIPOS_OPERACION)
+    if rng.random() < 0.4:
+        filtros["dormitorios"] = rng.randint(1, 4)
+    if rng.random() < 0.3:
+        filtros["precio_max"] = rng.choice([50_000, 100_000, 200_000, 400_000])
+    if rng.random() < 0.2:
+        filtros["superficie_min"] = rng.choice([40, 80, 150])
+    filtros["skip"] = rng.choice([0, 0, 0, 20, 40, 100])
+    filtros["limit"] = 20
+    return filtros
+
+
+class Carga:
+    def __init__(self, client: httpx.AsyncClient, propiedades: int, semilla: int):
+        self.client = client
+        self.propiedades = propiedades
+        self.rng = random.Random(semilla)
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.errores: Dict[str, int] = defaultdict(int)
+        self.estados_error: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _id(self) -> int:
+        # Sesgo hacia ids bajos: unas pocas publicaciones concentran las visitas
+        return min(self.propiedades, int(self.rng.paretovariate(1.2)))
+
+    async def _ejecutar(self, operacion: str) -> httpx.Response:
+        if operacion == "busqueda":
+            return await self.client.get("/propiedades/", params=filtros_aleatorios(self.rng))
+        if operacion == "detalle":
+            return await self.client.get(f"/propiedades/{self._id()}")
+        if operacion == "destacadas":
+            return await self.client.get("/propiedades/destacadas/")
+        if operacion == "actualizacion":
+            propiedad_id = self.rng.randint(1, self.propiedades)
+            actual = await self.client.get(f"/propiedades/{propiedad_id}")
+            if actual.status_code != 200:
+                return actual
+            datos = actual.json()
+            if datos.get("precio_venta"):
+                datos["precio_venta"] = int(datos["precio_venta"] * self.rng.uniform(0.95, 1.05))
+            return await self.client.put(f"/propiedades/{propiedad_id}", json=datos)
+        if operacion == "subida_imagen":
+            return await self.client.post(
+                "/imagenes/propiedades/",
+                data={"propiedad_id": str(self.rng.randint(1, self.propiedades)), "tipo": "secundaria"},
+                files={"file": ("bench.jpg", IMAGEN_JPEG, "image/jpeg")},
+            )
+        raise ValueError(operacion)
+
+    async def worker(self, fin: float) -> None:
+        nombres = [m[0] for m in MEZCLA]
+        pesos = [m[1] for m in MEZCLA]
+        while time.perf_counter() < fin:
+            operacion = self.rng.choices(nombres, weights=pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                respuesta = await self._ejecutar(operacion)
+            except httpx.HTTPError:
+                self.errores[operacion] += 1
+                continue
+            if respuesta.status_code >= 400:
+                self.errores[operacion] += 1
+                self.estados_error[operacion][respuesta.status_code] += 1
+                continue
+            self.latencias[operacion].append(time.perf_counter() - inicio)
+
+    def resumen(self, duracion: float) -> Dict:
+        endpoints = {}
+        for operacion in sorted(set(self.latencias) | set(self.errores)):
+            ms = [l * 1000 for l in self.latencias[operacion]]
+            errores = self.errores.get(operacion, 0)
+            endpoints[operacion] = {
+                "requests": len(ms) + errores,
+                "errores": errores,
+                "tasa_error": round(errores / (len(ms) + errores), 4),
+                "estados_error": {str(k): v for k, v in sorted(self.estados_error[operacion].items())},
+                "throughput_rps": round(len(ms) / duracion, 1),
+                "p50_ms": round(statistics.median(ms), 2) if ms else None,
+                "p95_ms": round(percentil(ms, 95), 2),
+                "p99_ms": round(percentil(ms, 99), 2),
+            }
+        total = sum(e["requests"] - e["errores"] for e in endpoints.values())
+        return {"duracion_s": round(duracion, 1), "throughput_rps": round(total / duracion, 1), "endpoints": endpoints}
+
+
+def rutas_faltantes(url: str) -> List[str]:
+    """Rutas de RUTAS_REQUERIDAS que la instancia no expone."""
+    esquema = httpx.get(f"{url}/openapi.json", timeout=10).json()
+    rutas = esquema.get("paths", {})
+    return [f"{metodo.upper()} {ruta}" for metodo, ruta in RUTAS_REQUERIDAS if metodo not in rutas.get(ruta, {})]
+
+
+async def correr(url: str, propiedades: int, concurrencia: int, duracion: float, calentamiento: float,
+                 semilla: int, token: Optional[str]) -> Dict:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limites, timeout=30) as client:
+        if calentamiento > 0:
+            carga = Carga(client, propiedades, semilla)
+            fin = time.perf_counter() + calentamiento
+            await asyncio.gather(*(carga.worker(fin) for _ in range(concurrencia)))
+
+        carga = Carga(client, propiedades, semilla + 1)
+        inicio = time.perf_counter()
+        fin = inicio + duracion
+        await asyncio.gather(*(carga.worker(fin) for _ in range(concurrencia)))
+        return carga.resumen(time.perf_counter() - inicio)
+
+
+def levantar_servidor(puerto: int, workers: int) -> subprocess.Popen:
+    proceso = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(puerto), "--workers", str(workers), "--log-level", "warning",
+    ])
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            if httpx.get(f"http://127.0.0.1:{puerto}/openapi.json", timeout=1).status_code == 200:
+                return proceso
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def comparar(actual: Dict, base: Dict, tolerancia: float) -> List[str]:
+    """Regresiones de p95 o throughput mayores a la tolerancia (fracción) respecto de la base."""
+    regresiones = []
+    for operacion, metricas in actual["endpoints"].items():
+        anterior = base.get("endpoints", {}).get(operacion)
+        if not anterior:
+            continue
+        if anterior["p95_ms"] and metricas["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{operacion}: p95 {anterior['p95_ms']}ms -> {metricas['p95_ms']}ms")
+        if anterior["throughput_rps"] and metricas["throughput_rps"] < anterior["throughput_rps"] * (1 - tolerancia):
+            regresiones.append(f"{operacion}: throughput {anterior['throughput_rps']} -> {metricas['throughput_rps']} req/s")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end de la API")
+    parser.add_argument("--url", help="URL de una instancia ya levantada; si se omite se levanta uvicorn")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn")
+    parser.add_argument("--generar", type=int, default=0, help="Regenera el dataset con esta cantidad de propiedades")
+    parser.add_argument("--propiedades", type=int, default=None, help="Cantidad de propiedades del dataset existente")
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--duracion", type=float, default=30)
+    parser.add_argument("--calentamiento", type=float, default=5)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--token", default=os.getenv("BENCH_TOKEN"), help="Token Bearer para los endpoints autenticados")
+    parser.add_argument("--salida", default="bench_resultado.json")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Regresión tolerada (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("falta --token (o BENCH_TOKEN): la mezcla incluye lecturas de propiedades no publicadas y actualizaciones")
+
+    propiedades = args.propiedades or args.generar or 1_000
+    if args.generar:
+        from app.seed import generar
+        generar(
+            propiedades=args.generar,
+            clientes=max(1, args.generar // 5),
+            agentes=max(1, args.generar // 400),
+            semilla=args.semilla,
+            limpiar_antes=True,
+        )
+
+    proceso = None
+    url = args.url
+    if not url:
+        proceso = levantar_servidor(args.puerto, args.workers)
+        url = f"http://127.0.0.1:{args.puerto}"
+    try:
+        faltantes = rutas_faltantes(url)
+        if faltantes:
+            print(f"La instancia no expone: {', '.join(faltantes)}", file=sys.stderr)
+            sys.exit(2)
+        resultado = asyncio.run(correr(
+            url, propiedades, args.concurrencia, args.duracion, args.calentamiento, args.semilla, args.token
+        ))
+    finally:
+        if proceso:
+            proceso.terminate()
+            proceso.wait()
+
+    resultado["configuracion"] = {
+        "concurrencia": args.concurrencia,
+        "workers": args.workers,
+        "propiedades": propiedades,
+        "semilla": args.semilla,
+    }
+    with open(args.salida, "w") as f:
+        json.dump(resultado, f, indent=2)
+    print(json.dumps(resultado, indent=2))
+
+    con_errores = {op: m for op, m in resultado["endpoints"].items() if m["errores"]}
+    if con_errores:
+        for operacion, metricas in con_errores.items():
+            print(f"ERRORES {operacion}: {metricas['errores']}/{metricas['requests']} {metricas['estados_error']}", file=sys.stderr)
+        print("Hubo errores: los percentiles no son comparables y no se compara contra la base", file=sys.stderr)
+        sys.exit(1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regresiones = comparar(resultado, json.load(f), args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
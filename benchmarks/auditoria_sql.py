@@ -0,0 +1,468 @@
+"""
+Auditoría de consultas SQL por endpoint.
+
+Recorre los endpoints de la app contra una base con datos (ver app/seed.py),
+como un administrador, cuenta las sentencias SQL que ejecuta cada uno y obtiene
+la forma del plan (EXPLAIN) de cada SELECT, UPDATE y DELETE. Falla (exit code 1)
+si:
+
+- alguno de los routers de ROUTERS no está incluido en la app,
+- un endpoint supera su presupuesto declarado con @presupuesto_sql,
+- algún plan hace un Seq Scan sobre una tabla grande,
+- un endpoint responde con error (5xx, o 4xx en las escrituras), o
+- un endpoint de escritura no tiene petición de ejemplo en PETICIONES ("no
+  auditado").
+
+Primero se recorren los GET y después las escrituras (POST, PUT, PATCH,
+DELETE), cada una con la petición de ejemplo de PETICIONES: los IDs salen de
+la base y los DELETE apuntan a una copia descartable de la fila. Los streams
+marcados con @flujo_continuo (SSE) se informan como omitidos.
+
+Todo corre dentro de una transacción que se descarta al final, y cada
+petición además en un savepoint propio, así una escritura no le borra los
+datos a la siguiente ni un error corta la auditoría. Los savepoints no cuentan como consultas (en producción los commits
+no lo son), ni las tareas de fondo que el endpoint deja encoladas. Los
+archivos que escriban (importaciones, imágenes) se borran después de cada
+petición.
+
+Uso:
+    python -m benchmarks.auditoria_sql --salida auditoria_sql.json --filas-tabla-grande 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from sqlalchemy import event, insert, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.main import app
+from app.api.v1.routes import agente, cliente, direccion, imagen, propiedad
+from app.core.concurrencia import etag
+from app.core.config import IMPORTACIONES_DIR
+from app.core.database import async_engine, get_async_db, get_read_db
+from app.crud.imagen_crud import UPLOAD_DIRECTORY
+from app.dependencies import get_current_user_opcional
+from app.models import Agente, Cliente, Direccion, ImagenAgente, ImagenPropiedad, Importacion, Localidad, Pais, Propiedad, Provincia
+from app.models.enums import EstadoEnum
+from app.models.importacion import FALLIDA
+from app.models.users import User
+from app.schemas.agente import AgenteCreate
+from app.schemas.cliente import ClienteCreate
+from app.schemas.direccion import DireccionCreate, LocalidadCreate, PaisCreate, ProvinciaCreate
+from app.schemas.propiedad import PropiedadBase, PropiedadCreate
+
+# Routers que la auditoría tiene que poder recorrer
+ROUTERS = {
+    "propiedad": propiedad.router,
+    "imagen": imagen.router,
+    "agente": agente.router,
+    "cliente": cliente.router,
+    "direccion": direccion.router,
+}
+
+# Consulta para obtener un id existente según el parámetro de ruta
+IDS_DE_EJEMPLO = {
+    "agente_id": "SELECT min(id) FROM agentes",
+    "cliente_id": "SELECT min(id) FROM clientes",
+    "propietario_id": "SELECT min(propietario_id) FROM propiedades",
+    "propiedad_id": "SELECT min(id) FROM propiedades",
+    "pais_id": "SELECT min(id) FROM paises",
+    "provincia_id": "SELECT min(id) FROM provincias",
+    "localidad_id": "SELECT min(id) FROM localidades",
+    "direccion_id": "SELECT min(id) FROM direcciones",
+    "imagen_id": "SELECT min(id) FROM imagenes_propiedad",
+    "importacion_id": "SELECT min(id) FROM importaciones",
+}
+IMAGEN_AGENTE = "SELECT min(id) FROM imagenes_agente"
+
+METODOS_ESCRITURA = ("POST", "PUT", "PATCH", "DELETE")
+# Control de transacción: en la auditoría los commits de los endpoints son
+# savepoints; en producción no son consultas
+CONTROL_TRANSACCION = re.compile(r"\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b", re.IGNORECASE)
+CON_PLAN = re.compile(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+# Donde escriben archivos los endpoints (importaciones, imágenes)
+DIRECTORIOS_DE_ARCHIVOS = (
+    IMPORTACIONES_DIR,
+    os.path.join(UPLOAD_DIRECTORY, "propiedades"),
+    os.path.join(UPLOAD_DIRECTORY, "agentes"),
+)
+# Nunca existe en disco: borrar la imagen no toca archivos reales
+URL_DESCARTABLE = "static/uploads/auditoria-inexistente.png"
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(16)
+
+
+def routers_faltantes() -> List[str]:
+    """Routers de ROUTERS con algún endpoint que no está en la app."""
+    incluidas = {(r.path_format, frozenset(r.methods)) for r in app.routes if isinstance(r, APIRoute)}
+    return [
+        nombre for nombre, router in ROUTERS.items()
+        if any(
+            (r.path_format, frozenset(r.methods)) not in incluidas
+            for r in router.routes if isinstance(r, APIRoute)
+        )
+    ]
+
+
+async def usuario_de_auditoria() -> User:
+    # Administrador sin fila en la base: ve todo y no agrega la consulta del token
+    return User(id=0, email="auditoria", is_admin=True, is_agente=False, activo=True)
+
+
+def forma_plan(nodo: Dict) -> str:
+    """Representación compacta del árbol del plan, p. ej. Limit(Index Scan[propiedades])."""
+    nombre = nodo["Node Type"]
+    if nodo.get("Relation Name"):
+        nombre += f"[{nodo['Relation Name']}]"
+    hijos = nodo.get("Plans", [])
+    if hijos:
+        nombre += "(" + ", ".join(forma_plan(h) for h in hijos) + ")"
+    return nombre
+
+
+def seq_scans(nodo: Dict) -> List[str]:
+    tablas = []
+    if nodo["Node Type"] == "Seq Scan":
+        tablas.append(nodo["Relation Name"])
+    for hijo in nodo.get("Plans", []):
+        tablas.extend(seq_scans(hijo))
+    return tablas
+
+
+async def id_de_ejemplo(conn, parametro: str, ruta: str = "") -> Optional[int]:
+    consulta = IDS_DE_EJEMPLO.get(parametro)
+    if parametro == "imagen_id" and "/agentes" in ruta:
+        consulta = IMAGEN_AGENTE
+    if consulta is None:
+        return None
+    return (await conn.execute(text(consulta))).scalar()
+
+
+# Peticiones de ejemplo de los endpoints de escritura
+
+class Peticion(NamedTuple):
+    # Parámetros de ruta propios; los que falten salen de IDS_DE_EJEMPLO
+    ruta: Dict[str, Any] = {}
+    # Argumentos de httpx (json, data, files, params, headers)
+    opciones: Dict[str, Any] = {}
+
+
+async def cuerpo(conn, modelo, id_: int, esquema: type[BaseModel], **cambios) -> Dict[str, Any]:
+    """JSON de `esquema` con los valores de la fila `id_` de `modelo`, más `cambios`."""
+    tabla = modelo.__table__
+    columnas = [tabla.c[campo] for campo in esquema.model_fields if campo in tabla.c]
+    fila = (await conn.execute(select(*columnas).where(tabla.c.id == id_))).mappings().one()
+    return jsonable_encoder({**fila, **cambios})
+
+
+async def copia(conn, modelo, id_: int, **cambios) -> int:
+    """Copia de la fila `id_` de `modelo` (con `cambios`), para borrarla sin tocar datos con dependencias."""
+    tabla = modelo.__table__
+    columnas = [c for c in tabla.columns if c.name != "id"]
+    origen = select(*[
+        literal(cambios[c.name], c.type).label(c.name) if c.name in cambios else c for c in columnas
+    ]).where(tabla.c.id == id_)
+    stmt = insert(tabla).from_select([c.name for c in columnas], origen).returning(tabla.c.id)
+    return (await conn.execute(stmt)).scalar_one()
+
+
+async def nueva(conn, entidad) -> int:
+    """Inserta una entidad del ORM (p. ej. con herencia, como las imágenes) y devuelve su id."""
+    async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False) as db:
+        db.add(entidad)
+        await db.commit()
+        return entidad.id
+
+
+def con_ejemplo(parametro: str, modelo, esquema: type[BaseModel], **cambios) -> Callable[[Any], Awaitable[Peticion]]:
+    """Cuerpo armado con la fila de ejemplo de `parametro` (POST, o PUT sobre esa misma fila)."""
+    async def peticion(conn) -> Peticion:
+        return Peticion(opciones={"json": await cuerpo(conn, modelo, await id_de_ejemplo(conn, parametro), esquema, **cambios)})
+    return peticion
+
+
+def sobre_copia(parametro: str, modelo, **cambios) -> Callable[[Any], Awaitable[Peticion]]:
+    """DELETE sobre una copia de la fila de ejemplo de `parametro`."""
+    async def peticion(conn) -> Peticion:
+        return Peticion(ruta={parametro: await copia(conn, modelo, await id_de_ejemplo(conn, parametro), **cambios)})
+    return peticion
+
+
+def sin_cuerpo(opciones: Optional[Dict[str, Any]] = None) -> Callable[[Any], Awaitable[Peticion]]:
+    async def peticion(conn) -> Peticion:
+        return Peticion(opciones=opciones or {})
+    return peticion
+
+
+def con_version(parametro: str, modelo, esquema: type[BaseModel]) -> Callable[[Any], Awaitable[Peticion]]:
+    """PUT sobre la fila de ejemplo de `parametro` con If-Match, como lo manda un cliente que la leyó."""
+    async def peticion(conn) -> Peticion:
+        id_ = await id_de_ejemplo(conn, parametro)
+        version = (await conn.execute(select(modelo.version).where(modelo.id == id_))).scalar_one()
+        return Peticion(opciones={
+            "json": await cuerpo(conn, modelo, id_, esquema),
+            "headers": {"If-Match": etag(version)},
+        })
+    return peticion
+
+
+async def _cambio_masivo(conn) -> Peticion:
+    # Por filtros, para auditar el plan del UPDATE que elige las filas
+    return Peticion(opciones={"json": {
+        "filtros": {"agente_id": await id_de_ejemplo(conn, "agente_id")},
+        "estado": EstadoEnum.activo.value,
+    }})
+
+
+async def _reanudar_importacion(conn) -> Peticion:
+    importacion = Importacion(
+        archivo="auditoria.csv", formato="csv", estado=FALLIDA,
+        filas_procesadas=0, filas_creadas=0, filas_con_error=0
+    )
+    return Peticion(ruta={"importacion_id": await nueva(conn, importacion)})
+
+
+def _subir_imagen(campo: str, parametro: str) -> Callable[[Any], Awaitable[Peticion]]:
+    async def peticion(conn) -> Peticion:
+        return Peticion(opciones={
+            "data": {campo: str(await id_de_ejemplo(conn, parametro)), "tipo": "secundaria"},
+            "files": {"file": ("auditoria.png", PNG, "image/png")},
+        })
+    return peticion
+
+
+def _imagen_principal(modelo, parametro: str) -> Callable[[Any], Awaitable[Peticion]]:
+    async def peticion(conn) -> Peticion:
+        dueno = getattr(modelo, parametro)
+        fila = (await conn.execute(select(modelo.id, dueno).order_by(modelo.id).limit(1))).first()
+        if fila is None:
+            return Peticion(ruta={parametro: None})
+        return Peticion(ruta={parametro: fila[1]}, opciones={"json": {"imagen_id": fila[0]}})
+    return peticion
+
+
+def _borrar_imagen(modelo, parametro: str) -> Callable[[Any], Awaitable[Peticion]]:
+    async def peticion(conn) -> Peticion:
+        imagen = modelo(url=URL_DESCARTABLE, tipo="secundaria", **{parametro: await id_de_ejemplo(conn, parametro)})
+        return Peticion(ruta={"imagen_id": await nueva(conn, imagen)})
+    return peticion
+
+
+CLIENTE_NUEVO = {"numero_documento": "99999999", "email": "auditoria-cliente@example.com"}
+AGENTE_NUEVO = {"numero_documento": "99999998", "email": "auditoria-agente@example.com", "licencia": "AUDITORIA"}
+
+# (método, ruta) -> petición de ejemplo. Un endpoint de escritura sin entrada
+# falla como "no auditado".
+PETICIONES: Dict[Tuple[str, str], Callable[[Any], Awaitable[Peticion]]] = {
+    ("POST", "/direccion/pais"): con_ejemplo("pais_id", Pais, PaisCreate, nombre="Auditoría"),
+    ("PUT", "/direccion/pais/{pais_id}"): con_ejemplo("pais_id", Pais, PaisCreate),
+    ("DELETE", "/direccion/pais/{pais_id}"): sobre_copia("pais_id", Pais, nombre="Auditoría"),
+    ("POST", "/direccion/provincia"): con_ejemplo("provincia_id", Provincia, ProvinciaCreate, nombre="Auditoría"),
+    ("PUT", "/direccion/provincia/{provincia_id}"): con_ejemplo("provincia_id", Provincia, ProvinciaCreate),
+    ("DELETE", "/direccion/provincia/{provincia_id}"): sobre_copia("provincia_id", Provincia, nombre="Auditoría"),
+    ("POST", "/direccion/localidad/"): con_ejemplo("localidad_id", Localidad, LocalidadCreate, nombre="Auditoría"),
+    ("PUT", "/direccion/localidad/{localidad_id}"): con_ejemplo("localidad_id", Localidad, LocalidadCreate),
+    ("DELETE", "/direccion/localidad/{localidad_id}"): sobre_copia("localidad_id", Localidad, nombre="Auditoría"),
+    ("POST", "/direccion/direccion"): con_ejemplo("direccion_id", Direccion, DireccionCreate),
+    ("PUT", "/direccion/direccion/{direccion_id}"): con_version("direccion_id", Direccion, DireccionCreate),
+    ("DELETE", "/direccion/direccion/{direccion_id}"): sobre_copia("direccion_id", Direccion),
+    ("POST", "/cliente/cliente"): con_ejemplo("cliente_id", Cliente, ClienteCreate, **CLIENTE_NUEVO),
+    ("PUT", "/cliente/cliente/{cliente_id}"): con_version("cliente_id", Cliente, ClienteCreate),
+    ("DELETE", "/cliente/cliente/{cliente_id}"): sobre_copia("cliente_id", Cliente, **CLIENTE_NUEVO),
+    ("POST", "/agente/agente"): con_ejemplo("agente_id", Agente, AgenteCreate, **AGENTE_NUEVO),
+    ("PUT", "/agente/agente/{agente_id}"): con_version("agente_id", Agente, AgenteCreate),
+    ("DELETE", "/agente/agente/{agente_id}"): sobre_copia("agente_id", Agente, **AGENTE_NUEVO),
+    ("POST", "/propiedades/"): con_ejemplo("propiedad_id", Propiedad, PropiedadCreate, nombre="Auditoría"),
+    ("PUT", "/propiedades/{propiedad_id}"): con_version("propiedad_id", Propiedad, PropiedadBase),
+    ("DELETE", "/propiedades/{propiedad_id}"): sobre_copia("propiedad_id", Propiedad),
+    ("PATCH", "/propiedades/{propiedad_id}/estado"): sin_cuerpo({"params": {"estado": EstadoEnum.activo.value}}),
+    ("PATCH", "/propiedades/masivo"): _cambio_masivo,
+    ("POST", "/propiedades/{propiedad_id}/contactos"): sin_cuerpo(),
+    ("POST", "/propiedades/importaciones"): sin_cuerpo({
+        "files": {"archivo": ("auditoria.csv", b"nombre,tipo_propiedad,tipo_operacion\n", "text/csv")},
+    }),
+    ("POST", "/propiedades/importaciones/{importacion_id}/reanudar"): _reanudar_importacion,
+    ("POST", "/imagenes/propiedades/"): _subir_imagen("propiedad_id", "propiedad_id"),
+    ("PUT", "/imagenes/propiedades/{propiedad_id}/set-principal"): _imagen_principal(ImagenPropiedad, "propiedad_id"),
+    ("DELETE", "/imagenes/propiedades/{imagen_id}"): _borrar_imagen(ImagenPropiedad, "propiedad_id"),
+    ("POST", "/imagenes/agentes/"): _subir_imagen("agente_id", "agente_id"),
+    ("PUT", "/imagenes/agentes/{agente_id}/set-principal"): _imagen_principal(ImagenAgente, "agente_id"),
+    ("DELETE", "/imagenes/agentes/{imagen_id}"): _borrar_imagen(ImagenAgente, "agente_id"),
+}
+
+
+def archivos() -> Set[str]:
+    return {
+        os.path.join(directorio, nombre)
+        for directorio in DIRECTORIOS_DE_ARCHIVOS if os.path.isdir(directorio)
+        for nombre in os.listdir(directorio)
+    }
+
+
+def hasta_la_respuesta(asgi, captura: Dict[str, bool]):
+    """
+    Deja de capturar cuando termina la respuesta: lo que sigue son las tareas
+    de fondo del endpoint (p. ej. procesar una importación), que no cuentan
+    para su presupuesto.
+    """
+    async def envolver(scope, receive, send):
+        async def enviar(mensaje):
+            await send(mensaje)
+            if mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                captura["activa"] = False
+        await asgi(scope, receive, enviar)
+    return envolver
+
+
+async def ejecutar(conn, client, metodo: str, route: APIRoute, resultado: Dict, sentencias: List, captura: Dict[str, bool]):
+    """Arma la petición de ejemplo, la ejecuta capturando sus sentencias y devuelve la respuesta."""
+    peticion = Peticion()
+    if metodo != "GET":
+        armar = PETICIONES.get((metodo, route.path_format))
+        if armar is None:
+            resultado["fallas"].append("no auditado: falta la petición de ejemplo en PETICIONES")
+            return None
+        peticion = await armar(conn)
+
+    ruta = route.path_format
+    for parametro in re.findall(r"{(\w+)}", route.path_format):
+        valor = peticion.ruta[parametro] if parametro in peticion.ruta else await id_de_ejemplo(conn, parametro, route.path_format)
+        if valor is None:
+            resultado["fallas"].append("sin datos de ejemplo para los parámetros de la ruta")
+            return None
+        ruta = ruta.replace("{" + parametro + "}", str(valor))
+
+    sentencias.clear()
+    captura["activa"] = True
+    try:
+        return await client.request(metodo, ruta, **peticion.opciones)
+    finally:
+        captura["activa"] = False
+
+
+async def auditar(filas_tabla_grande: int) -> List[Dict]:
+    resultados = []
+    captura = {"activa": False}
+    sentencias = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if captura["activa"] and not CONTROL_TRANSACCION.match(statement):
+            sentencias.append((statement, parameters))
+
+    async with async_engine.connect() as conn:
+        transaccion = await conn.begin()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", capturar)
+
+        async def db_de_auditoria():
+            # Los commits de los endpoints quedan como savepoints de la transacción externa
+            async with AsyncSession(
+                bind=conn,
+                join_transaction_mode="create_savepoint",
+                autoflush=False,
+                expire_on_commit=False
+            ) as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = db_de_auditoria
+        app.dependency_overrides[get_read_db] = db_de_auditoria
+        app.dependency_overrides[get_current_user_opcional] = usuario_de_auditoria
+
+        tablas_grandes = {
+            fila[0] for fila in await conn.execute(text(
+                "SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples >= :n"
+            ), {"n": filas_tabla_grande})
+        }
+
+        rutas = [r for r in app.routes if isinstance(r, APIRoute) and r.include_in_schema]
+        # Las lecturas primero, con los datos tal como los dejó el seed
+        endpoints = [(r, "GET") for r in rutas if "GET" in r.methods]
+        endpoints += [(r, m) for r in rutas for m in METODOS_ESCRITURA if m in r.methods]
+
+        # Un error del endpoint es una falla más del informe, no corta la auditoría
+        transport = httpx.ASGITransport(app=hasta_la_respuesta(app, captura), raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://auditoria") as client:
+            for route, metodo in endpoints:
+                presupuesto = getattr(route.endpoint, "presupuesto_sql", None)
+                resultado = {
+                    "metodo": metodo, "ruta": route.path_format, "endpoint": route.name,
+                    "presupuesto": presupuesto, "fallas": []
+                }
+                resultados.append(resultado)
+                if getattr(route.endpoint, "flujo_continuo", False):
+                    resultado["omitido"] = "stream continuo"
+                    continue
+
+                savepoint = await conn.begin_nested()
+                previos = archivos()
+                try:
+                    respuesta = await ejecutar(conn, client, metodo, route, resultado, sentencias, captura)
+                finally:
+                    # También recupera la transacción si el endpoint falló en la base
+                    await savepoint.rollback()
+                    for archivo in archivos() - previos:
+                        os.remove(archivo)
+                if respuesta is None:
+                    continue
+
+                resultado["status"] = respuesta.status_code
+                resultado["consultas"] = len(sentencias)
+                resultado["planes"] = []
+                if respuesta.status_code >= 500 or (metodo != "GET" and respuesta.status_code >= 400):
+                    resultado["fallas"].append(f"la petición de ejemplo no se aplicó ({respuesta.status_code}: {respuesta.text[:200]})")
+                if presupuesto is None:
+                    resultado["fallas"].append("el endpoint no declara @presupuesto_sql")
+                elif len(sentencias) > presupuesto:
+                    resultado["fallas"].append(f"{len(sentencias)} consultas, presupuesto {presupuesto}")
+
+                for sql, parametros in list(sentencias):
+                    if not CON_PLAN.match(sql):
+                        continue
+                    # Sin ANALYZE no ejecuta: sirve aunque el savepoint ya se descartó
+                    fila = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", parametros)).scalar()
+                    plan = (json.loads(fila) if isinstance(fila, str) else fila)[0]["Plan"]
+                    scans = [t for t in seq_scans(plan) if t in tablas_grandes]
+                    resultado["planes"].append({"sql": sql, "forma": forma_plan(plan), "seq_scans_tablas_grandes": scans})
+                    for tabla in scans:
+                        resultado["fallas"].append(f"Seq Scan sobre la tabla grande '{tabla}'")
+
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capturar)
+        app.dependency_overrides.clear()
+        await transaccion.rollback()
+    await async_engine.dispose()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoría de cantidad de consultas y planes SQL por endpoint")
+    parser.add_argument("--salida", default="auditoria_sql.json", help="Archivo JSON con el detalle por endpoint")
+    parser.add_argument("--filas-tabla-grande", type=int, default=10_000,
+                        help="Tablas con al menos estas filas (según pg_class.reltuples) no pueden tener Seq Scan")
+    args = parser.parse_args()
+
+    faltantes = routers_faltantes()
+    if faltantes:
+        print(f"Routers no incluidos en la app: {', '.join(faltantes)}", file=sys.stderr)
+        sys.exit(1)
+
+    resultados = asyncio.run(auditar(args.filas_tabla_grande))
+    with open(args.salida, "w") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+    fallas = [r for r in resultados if r["fallas"]]
+    for r in resultados:
+        estado = "FALLA" if r["fallas"] else "omitido" if r.get("omitido") else "ok"
+        print(f"[{estado}] {r['metodo']} {r['ruta']}: {r.get('consultas', '-')} consultas (presupuesto {r['presupuesto']})")
+        for falla in r["fallas"]:
+            print(f"    - {falla}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compara la sesión síncrona (SessionLocal dentro de un threadpool, como la
+ejecutaba FastAPI) contra la sesión asíncrona (AsyncSessionLocal sobre asyncpg)
+bajo alta concurrencia.
+
+Uso:
+    python -m benchmarks.db_sync_vs_async --requests 5000 --concurrency 200
+
+Cada "request" abre una sesión, ejecuta la consulta de detalle de una propiedad
+y la cierra. Se reporta throughput (req/s) y latencias p50/p95/p99 en ms.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+
+from app.core.database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from app.models.propiedad import Propiedad
+
+# Tamaño por defecto del threadpool de AnyIO que usa FastAPI para los endpoints síncronos
+THREADPOOL_SIZE = 40
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def resumen(nombre, latencias, duracion):
+    latencias_ms = [l * 1000 for l in latencias]
+    return {
+        "modo": nombre,
+        "requests": len(latencias),
+        "throughput_rps": round(len(latencias) / duracion, 1),
+        "p50_ms": round(statistics.median(latencias_ms), 2),
+        "p95_ms": round(percentil(latencias_ms, 95), 2),
+        "p99_ms": round(percentil(latencias_ms, 99), 2),
+    }
+
+
+def consulta_sync(propiedad_id):
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        db.execute(select(Propiedad).filter(Propiedad.id == propiedad_id)).scalars().first()
+    finally:
+        db.close()
+    return time.perf_counter() - inicio
+
+
+def benchmark_sync(total, concurrencia):
+    # La concurrencia real queda limitada por el tamaño del threadpool
+    workers = min(concurrencia, THREADPOOL_SIZE)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencias = list(pool.map(consulta_sync, [(i % 1000) + 1 for i in range(total)]))
+    return resumen("sync", latencias, time.perf_counter() - inicio)
+
+
+async def consulta_async(propiedad_id, semaforo, latencias):
+    async with semaforo:
+        inicio = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Propiedad).filter(Propiedad.id == propiedad_id))
+            result.scalars().first()
+        latencias.append(time.perf_counter() - inicio)
+
+
+async def benchmark_async(total, concurrencia):
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        consulta_async((i % 1000) + 1, semaforo, latencias) for i in range(total)
+    ))
+    duracion = time.perf_counter() - inicio
+    await async_engine.dispose()
+    return resumen("async", latencias, duracion)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de sesiones síncronas vs asíncronas")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    resultados = [
+        benchmark_sync(args.requests, args.concurrency),
+        asyncio.run(benchmark_async(args.requests, args.concurrency)),
+    ]
+    engine.dispose()
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()